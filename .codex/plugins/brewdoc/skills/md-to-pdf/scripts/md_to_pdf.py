@@ -10,25 +10,97 @@ Usage:
     python3 md_to_pdf.py <input.md> [output.pdf] [options]
     python3 md_to_pdf.py input.md --engine weasyprint --style custom.css
     python3 md_to_pdf.py input.md output.pdf --config my_config.json
+    generate | python3 md_to_pdf.py - - --base-dir docs/ > out.pdf   # status lines on stderr
+    generate | python3 md_to_pdf.py - out.pdf [--status-fd 3]
+
+Batch (one status block per document, then a summary; exit 1 if any failed):
+    python3 md_to_pdf.py a.md b.md c.md --out-dir build/ [--jobs N]
+    python3 md_to_pdf.py docs/ --out-dir pdf/ [--force]   # tree mirrored, up-to-date PDFs skipped
+    python3 md_to_pdf.py docs/ --out-dir pdf/ --shard 2/4 [--shard-balance size]   # one CI node's share
+
+Manifest (one NDJSON job per line in, one NDJSON result per job out):
+    python3 md_to_pdf.py --manifest jobs.ndjson [--jobs N]
+    {"input": "a.md", "output": "a.pdf", "engine": "weasyprint",
+     "overrides": {"page": {"size": "Letter"}}, "pygments_theme": "monokai"}
+
+Spool worker (any number of hosts sharing DIR; jobs are manifest records, one per file):
+    python3 md_to_pdf.py --spool DIR [--jobs N] [--spool-drain] [--lease-timeout 600]
+    DIR/incoming/<name>.json -> DIR/claimed/ (lease) -> DIR/done/<name>.{json,pdf} | DIR/failed/<name>.json
+
+HTTP endpoint (identical concurrent requests render once; --jobs renders, --queue-depth waiting):
+    python3 md_to_pdf.py --http 127.0.0.1:8750 [--jobs N] [--queue-depth 64] [--max-body-kb 4096]
+    curl -d '{"markdown": "# Hi", "config": {"page": {"size": "Letter"}}}' localhost:8750/render > hi.pdf
+
+Python API (no temp files; relative images resolve against base_dir):
+    from md_to_pdf import render
+    result = render(md_text, config={"page": {"size": "Letter"}}, engine="reportlab", base_dir="docs/")
+    result.pdf_bytes, result.pages, result.warnings, result.timings
+    result = await convert_async(md_text, ...)                      # same, in a killable child
+    renderer = AsyncRenderer(limit=4, mode="thread"); await renderer.render(md_text, ...)
+    profile = RenderProfile.of(load_config("my_config.json"))      # fonts/styles/CSS built once
+    render(md_text, profile); profile.save("profile.pickle"); RenderProfile.load("profile.pickle")
+
+Render cache (identical Markdown + config + engine + CSS + images -> no re-render):
+    python3 md_to_pdf.py input.md --cache-dir ~/.cache/md-to-pdf [--cache-max-mb 512]
+
+Warm daemon (skips the per-run import/font/config cost):
+    python3 md_to_pdf.py --serve [--socket PATH]
+    python3 md_to_pdf.py input.md --client [--socket PATH]   # falls back in-process
+
+Font and style caches (parsed TTF tables keyed on path/size/mtime, pygments theme CSS keyed on
+theme/version; $MD_TO_PDF_FONT_CACHE / $MD_TO_PDF_STYLE_CACHE, "off" disables):
+    python3 md_to_pdf.py --warm-cache   # e.g. at image build time
+    python3 md_to_pdf.py docs/ --out-dir pdf/ --jobs 8 --font-memory   # mmap-shared fonts, per-worker RSS/PSS
+
+Font index (config "fonts": {"body": "auto"|family, "heading": ..., "code": "monospace"|family,
+            "fallback": "auto"|[family, ...]} -- fallback families set the characters a font lacks):
+    MD_TO_PDF_FONT_DIRS=/opt/fonts python3 md_to_pdf.py input.md --config serif.json
+
+Code languages of unlabelled blocks (weasyprint): shebang/file-name hints, a signature table, then
+guess_lexer within config "code": {"guess_lang": true, "guess_budget_ms": 50} per document.
+
+Block cache (parsed chunks and highlighted code keyed by content hash, kept across renders in
+memory; set $MD_TO_PDF_BLOCK_CACHE=DIR to also persist it at process exit): an edit re-parses only
+the chunks it touches.
+Paragraph fragments (reportlab): parsed markup per (markup, style) in a process-wide LRU; timings
+report fragment_hits / fragment_misses, and so do --manifest and spool result records.
 
 Dependencies (installed at pinned versions by scripts/check_deps.sh):
     reportlab engine:   check_deps.sh install reportlab
     weasyprint engine:  check_deps.sh install weasyprint
 """
 
+import atexit
+import gc
+import hashlib
+import io
 import json
 import os
 import re
 import sys
+import signal
+import shutil
 import argparse
+import base64
 import platform
+import struct
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from contextvars import ContextVar
 from copy import deepcopy
+from functools import lru_cache, partial
 from importlib import import_module
 from pathlib import Path
+from typing import NamedTuple
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 DEFAULT_CONFIG_PATH = SCRIPT_DIR / ".." / "styles" / "default.json"
 DEFAULT_CSS_PATH = SCRIPT_DIR / ".." / "styles" / "default.css"
+ENGINES = ("reportlab", "weasyprint")
 
 
 # ---------------------------------------------------------------------------
@@ -39,19 +111,106 @@ def parse_args(argv=None):
     p = argparse.ArgumentParser(
         description="Convert Markdown to PDF (reportlab or weasyprint).",
     )
-    p.add_argument("input", help="Path to the Markdown file")
-    p.add_argument("output", nargs="?", default=None, help="Output PDF path (default: <input>.pdf)")
-    p.add_argument("--engine", choices=["reportlab", "weasyprint"], default="reportlab",
+    p.add_argument("paths", nargs="*", metavar="input [output]",
+                   help="Markdown file and optional output PDF (default: <input>.pdf); "
+                        'several Markdown files convert as a batch; "-" is stdin / stdout')
+    p.add_argument("--out-dir", default=None,
+                   help="Directory for the output PDFs (batch mode; mirrors input directories)")
+    p.add_argument("--manifest", default=None,
+                   help='NDJSON job file ("-" = stdin); prints one NDJSON result per job')
+    p.add_argument("--spool", default=None, metavar="DIR",
+                   help="Worker mode: claim job files from DIR/incoming, report to DIR/done|failed")
+    p.add_argument("--spool-drain", action="store_true",
+                   help="Spool mode: exit once no job is left to claim instead of polling")
+    p.add_argument("--lease-timeout", type=float, default=600,
+                   help="Spool mode: seconds before a dead worker's claimed job is requeued (default: 600)")
+    p.add_argument("--max-attempts", type=int, default=3,
+                   help="Spool mode: leases a job may lose before it is failed (default: 3)")
+    p.add_argument("--poll-interval", type=float, default=2,
+                   help="Spool mode: seconds between scans of an empty incoming/ (default: 2)")
+    p.add_argument("--cache-dir", default=None,
+                   help="Content-addressed PDF cache; identical requests skip rendering")
+    p.add_argument("--cache-max-mb", type=int, default=512,
+                   help="Cache size cap; least recently used entries are evicted (default: 512)")
+    p.add_argument("--shard", type=_shard_arg, default=None, metavar="K/N",
+                   help="Batch mode: convert only shard K of N (1-based), chosen by a stable "
+                        "hash of each document's relative path")
+    p.add_argument("--shard-balance", choices=["hash", "size"], default="hash",
+                   help="hash: path hash modulo N; size: size-weighted so shards finish together")
+    p.add_argument("--force", action="store_true",
+                   help="Batch mode: reconvert documents whose PDF is already up to date")
+    p.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                   help="Parallel conversions for batch and daemon modes (default: CPU count)")
+    p.add_argument("--base-dir", default=None,
+                   help="Directory relative image paths resolve against when reading stdin, "
+                        "and the only directory --http renders may read images from "
+                        "(default: the working directory)")
+    p.add_argument("--status-fd", type=int, default=None,
+                   help="File descriptor for the status lines (default: stdout, or stderr "
+                        "when the PDF goes to stdout)")
+    p.add_argument("--engine", choices=ENGINES, default="reportlab",
                    help="Rendering engine (default: reportlab)")
+    p.add_argument("--font-memory", action="store_true",
+                   help="Report each worker's resident font memory (FONT_MEMORY= lines, Linux)")
     p.add_argument("--config", default=None, help="JSON style config overrides")
     p.add_argument("--style", default=None, help="CSS file (weasyprint only)")
     p.add_argument("--pygments-theme", default="github", help="Code theme (weasyprint only, default: github)")
+    p.add_argument("--warm-cache", action="store_true",
+                   help="Parse every detected font into the font cache, then exit (for image builds)")
+    p.add_argument("--serve", action="store_true",
+                   help="Run a warm conversion daemon on --socket instead of converting")
+    p.add_argument("--client", action="store_true",
+                   help="Convert through the --serve daemon; in-process when none is listening")
+    p.add_argument("--http", type=_http_arg, default=None, metavar="HOST:PORT",
+                   help="Serve POST /render (JSON: markdown, config, engine) returning the PDF")
+    p.add_argument("--queue-depth", type=int, default=64,
+                   help="HTTP mode: renders that may wait for a worker before 503 (default: 64)")
+    p.add_argument("--max-body-kb", type=int, default=4096,
+                   help="HTTP mode: largest request body accepted, larger is a 413 (default: 4096)")
+    p.add_argument("--socket", default=None,
+                   help=f"Daemon Unix socket (default: {default_socket_path()})")
     args = p.parse_args(argv)
+    if args.socket is None:
+        args.socket = default_socket_path()
+    if args.jobs < 1:
+        p.error("--jobs must be at least 1")
+    if args.queue_depth < 1:
+        p.error("--queue-depth must be at least 1")
+    if args.max_body_kb < 1:
+        p.error("--max-body-kb must be at least 1")
+    args.input = args.output = None
+    if args.serve or args.manifest or args.spool or args.http or args.warm_cache:
+        return args
+    if not args.paths:
+        p.error("the following arguments are required: input")
+    # `in.md out` keeps its single-document meaning unless the second path is itself an input
+    # (a Markdown file or a directory) or --out-dir asks for a batch; longer lists are batches.
+    second = args.paths[1] if len(args.paths) == 2 else None
+    if second is not None and args.out_dir is None and not os.path.isdir(args.paths[0]) and not (
+            second.lower().endswith(MARKDOWN_SUFFIXES) or os.path.isdir(second)):
+        args.input, args.output = args.paths
+        args.paths = [args.input]
+    if len(args.paths) > 1 or os.path.isdir(args.paths[0]):
+        return args
+    args.input = args.paths[0]
     if args.output is None:
-        args.output = str(Path(args.input).with_suffix(".pdf"))
+        args.output = "-" if args.input == "-" else output_path_for(args.input, args.out_dir)
     return args
 
 
+def _shard_arg(text: str):
+    m = re.fullmatch(r"(\d+)/(\d+)", text.strip())
+    if not m or not 1 <= int(m.group(1)) <= int(m.group(2)):
+        raise argparse.ArgumentTypeError(f"expected K/N with 1 <= K <= N, got {text!r}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def output_path_for(input_path: str, out_dir=None) -> str:
+    """<input>.pdf next to the source, or <out_dir>/<stem>.pdf."""
+    pdf = Path(input_path).with_suffix(".pdf")
+    return str(Path(out_dir) / pdf.name) if out_dir else str(pdf)
+
+
 # ---------------------------------------------------------------------------
 # Config loading (deep merge)
 # ---------------------------------------------------------------------------
@@ -66,136 +225,967 @@ def _deep_merge(base: dict, override: dict) -> dict:
     return result
 
 
+@lru_cache(maxsize=16)
+def _read_json(path: str, mtime_ns: int) -> dict:
+    """Parse a JSON file once per (path, mtime) -- a warm daemon re-reads only edited files."""
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def _load_json(path) -> dict:
+    return _read_json(str(path), Path(path).stat().st_mtime_ns)
+
+
 def load_config(config_path=None) -> dict:
     """Load config from JSON, falling back to defaults."""
     defaults = {}
     if DEFAULT_CONFIG_PATH.exists():
-        defaults = json.loads(DEFAULT_CONFIG_PATH.read_text(encoding="utf-8"))
+        defaults = _load_json(DEFAULT_CONFIG_PATH)
     if config_path:
-        user_cfg = json.loads(Path(config_path).read_text(encoding="utf-8"))
-        return _deep_merge(defaults, user_cfg)
-    return defaults
+        return _deep_merge(defaults, _load_json(config_path))
+    return deepcopy(defaults)
 
 
 # ---------------------------------------------------------------------------
-# Cross-platform font detection (reportlab)
+# Bounded LRU -- the in-memory memo behind the process-wide caches
 # ---------------------------------------------------------------------------
 
-_FONT_SEARCH = {
-    "Darwin": [
-        ("/System/Library/Fonts/Supplemental/PTSans.ttc", {
-            "body": ("PTSans", 0), "bold": ("PTSans-Bold", 7),
-            "italic": ("PTSans-Italic", 1), "boldItalic": ("PTSans-BoldItalic", 6),
-        }),
-        ("/System/Library/Fonts/Supplemental/Arial.ttf", {
-            "body": ("Arial", None), "bold": ("Arial-Bold", None),
-            "italic": ("Arial-Italic", None), "boldItalic": ("Arial-BoldItalic", None),
-        }),
-    ],
-    "Linux": [
-        ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", {
-            "body": ("DejaVuSans", None), "bold": ("DejaVuSans-Bold", None),
-            "italic": ("DejaVuSans-Oblique", None), "boldItalic": ("DejaVuSans-BoldOblique", None),
-        }),
-    ],
-}
+class LRUCache:
+    """A dict of at most max_entries items, least recently used dropped first; thread-safe.
 
-# Linux bold/italic companion files
-_LINUX_COMPANIONS = {
-    "bold": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-    "italic": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Oblique.ttf",
-    "boldItalic": "/usr/share/fonts/truetype/dejavu/DejaVuSans-BoldOblique.ttf",
-}
+    entries is insertion-ordered, least recently used first: a hit re-inserts its key.
+    hits/misses count get() lookups.
+    """
 
+    _instances = weakref.WeakSet()  # every cache, for _reset_locks_in_child
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        LRUCache._instances.add(self)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.entries[key] = value  # re-inserted: most recently used last
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+
+
+# ---------------------------------------------------------------------------
+# Cross-platform font detection (reportlab)
+# ---------------------------------------------------------------------------
 
-def detect_fonts() -> dict:
-    """Detect available fonts, return name mapping dict.
+# Families tried, in order, for `fonts.body: "auto"`.
+_AUTO_BODY = {
+    "Darwin": ["PT Sans", "Arial", "Helvetica Neue"],
+    "Windows": ["Arial", "Segoe UI", "Calibri"],
+    "Linux": ["DejaVu Sans", "Liberation Sans", "Noto Sans", "Open Sans"],
+}
+# Families tried first for `fonts.fallback: "auto"`; every other indexed family follows,
+# widest coverage first.
+_AUTO_FALLBACK = ["DejaVu Sans", "Noto Sans", "Liberation Sans", "Arial Unicode MS",
+                  "Droid Sans Fallback", "WenQuanYi Zen Hei", "WenQuanYi Micro Hei",
+                  "Microsoft YaHei", "MS Gothic", "Malgun Gothic", "Segoe UI Symbol"]
+_BUILTIN_BODY = {"body": "Helvetica", "bold": "Helvetica-Bold",
+                 "italic": "Helvetica-Oblique", "boldItalic": "Helvetica-BoldOblique"}
+_BUILTIN_MONO = {"body": "Courier", "bold": "Courier-Bold"}
+_STYLE_SUFFIX = {"body": "", "bold": "-Bold", "italic": "-Italic", "boldItalic": "-BoldItalic"}
+_STYLE_CHAIN = {"boldItalic": ("boldItalic", "bold", "italic", "body"),
+                "bold": ("bold", "body"), "italic": ("italic", "body"), "body": ("body",)}
+
+
+def family_fonts(faces: dict, roles=tuple(_STYLE_SUFFIX)) -> tuple:
+    """({role: registered name}, entries) for one indexed family, falling back within it.
+
+    A stand-in face (e.g. the regular file for a missing italic) is registered again under
+    a role-specific name, so the family mapping stays one name per role.
+    """
+    names, entries = {}, []
+    for role in roles:
+        for style in _STYLE_CHAIN[role]:
+            entry = faces.get(style)
+            if entry:
+                name = entry["ps_name"] if style == role else faces["body"]["ps_name"] + _STYLE_SUFFIX[role]
+                names[role] = name
+                entries.append((name, entry["path"], entry["index"]))
+                break
+    return names, entries
+
+
+def detect_fonts(fonts_config=None) -> dict:
+    """Resolve the config's `fonts` section against the system font index.
+
+    body/heading: "auto" or a family name; code: "monospace" (the built-in Courier) or a
+    family name; fallback: "auto" or a list of family names tried, in order, for characters
+    the other faces lack (see FontFallback). A missing style falls back within the family
+    (bold italic -> bold -> regular); an unknown family falls back to the automatic choice,
+    and when no TrueType font is usable, to the PDF built-ins.
 
     Returns:
         {"body": "FontName", "bold": "FontName-Bold",
          "italic": "FontName-Italic", "boldItalic": "FontName-BoldItalic",
-         "family": "FontName", "_source": "path_or_builtin",
+         "family": "FontName", "heading": "FontName-Bold",
+         "code": "MonoName", "codeBold": "MonoName-Bold", "_source": "path_or_builtin",
+         "fallback": [family key, ...],
          "_entries": [(name, path, subfontIndex|None), ...]}
     """
-    system = platform.system()
-    candidates = _FONT_SEARCH.get(system, []) + _FONT_SEARCH.get("Linux", [])
+    fonts_config = fonts_config or {}
+    index = font_index()
+    auto_body = _AUTO_BODY.get(platform.system(), []) + _AUTO_BODY["Linux"]
+
+    entries = []
+
+    def add(faces, roles):
+        names, family_entries = family_fonts(faces, roles)
+        entries.extend(e for e in family_entries if e not in entries)
+        return names
+
+    body_faces = index.family(fonts_config.get("body", "auto"), auto_body)
+    if body_faces:
+        info = add(body_faces, tuple(_STYLE_SUFFIX))
+        info["_source"] = body_faces["body"]["path"]
+    else:
+        info = dict(_BUILTIN_BODY, _source="builtin")
+    info["family"] = info["body"]
+
+    heading_faces = index.family(fonts_config.get("heading", "auto"), [])
+    info["heading"] = add(heading_faces, ("bold",))["bold"] if heading_faces else info["bold"]
+
+    code = fonts_config.get("code", "monospace")
+    mono_faces = index.family(code, []) if code != "monospace" else None
+    if mono_faces:
+        names = add(mono_faces, ("body", "bold"))
+        info["code"], info["codeBold"] = names["body"], names["bold"]
+    else:
+        info["code"], info["codeBold"] = _BUILTIN_MONO["body"], _BUILTIN_MONO["bold"]
+
+    info["fallback"] = index.fallback_chain(fonts_config.get("fallback", "auto"),
+                                            exclude=body_faces["body"]["family"] if body_faces else None)
+    info["_entries"] = entries
+    return info
+
+
+# ---------------------------------------------------------------------------
+# Font index -- system font directories scanned once, families resolved by name
+# ---------------------------------------------------------------------------
+
+_FONT_INDEX_VERSION = 2
+_FONT_SUFFIXES = (".ttf", ".ttc", ".otf")
 
-    for font_path, mapping in candidates:
-        if not os.path.exists(font_path):
+
+def font_dirs() -> list:
+    """Directories scanned for fonts: $MD_TO_PDF_FONT_DIRS first, then the platform's own."""
+    home = os.path.expanduser("~")
+    system = platform.system()
+    if system == "Darwin":
+        dirs = ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    elif system == "Windows":
+        dirs = [os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+                os.path.join(os.environ.get("LOCALAPPDATA", home), "Microsoft", "Windows", "Fonts")]
+    else:
+        dirs = ["/usr/share/fonts", "/usr/local/share/fonts",
+                os.path.join(home, ".local", "share", "fonts"), os.path.join(home, ".fonts")]
+    extra = [d for d in os.environ.get("MD_TO_PDF_FONT_DIRS", "").split(os.pathsep) if d]
+    return extra + dirs
+
+
+def _family_key(name: str) -> str:
+    return re.sub(r"[\s_-]+", "", name).lower()
+
+
+def _sfnt_tables(fh, offset: int) -> dict:
+    fh.seek(offset)
+    _, num_tables = struct.unpack(">IH", fh.read(6))
+    fh.seek(offset + 12)
+    directory = fh.read(16 * num_tables)
+    tables = {}
+    for i in range(num_tables):
+        tag, _, table_offset, length = struct.unpack_from(">4sIII", directory, 16 * i)
+        tables[tag.decode("latin-1")] = (table_offset, length)
+    return tables
+
+
+def _sfnt_names(data: bytes) -> dict:
+    """nameID -> string from a `name` table, preferring Windows English records."""
+    _, count, string_offset = struct.unpack_from(">HHH", data, 0)
+    names, ranks = {}, {}
+    for i in range(count):
+        platform_id, encoding_id, language_id, name_id, length, offset = \
+            struct.unpack_from(">HHHHHH", data, 6 + 12 * i)
+        if name_id not in (1, 2, 4, 6, 16, 17):
+            continue
+        raw = data[string_offset + offset:string_offset + offset + length]
+        if platform_id == 3 and encoding_id in (0, 1, 10):
+            rank, text = (0 if language_id == 0x409 else 1), raw.decode("utf-16-be", "replace")
+        elif platform_id == 1 and encoding_id == 0:
+            rank, text = 2, raw.decode("mac_roman", "replace")
+        else:
             continue
+        if rank < ranks.get(name_id, 99):
+            names[name_id], ranks[name_id] = text, rank
+    return names
 
-        entries = []
-        names = {}
-        for role, (name, idx) in mapping.items():
-            if system == "Linux" and role != "body":
-                companion = _LINUX_COMPANIONS.get(role)
-                if companion and os.path.exists(companion):
-                    entries.append((name, companion, None))
-                else:
-                    entries.append((name, font_path, idx))
+
+class FontCoverage:
+    """The characters a face maps, as a bitmap: bit (cp & 7) of byte (cp >> 3) is set for cp.
+
+    Stored in the font index zlib-compressed and base64-encoded (a few hundred bytes for a
+    Latin/Cyrillic face, a few KB for a CJK one).
+    """
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits: bytes):
+        self.bits = bits
+
+    def __contains__(self, cp: int) -> bool:
+        i = cp >> 3
+        return i < len(self.bits) and bool(self.bits[i] >> (cp & 7) & 1)
+
+    def __and__(self, other: "FontCoverage") -> "FontCoverage":
+        return FontCoverage(bytes(a & b for a, b in zip(self.bits, other.bits)))
+
+    def __len__(self):
+        return sum(bin(b).count("1") for b in self.bits)
+
+    def encode(self) -> str:
+        return base64.b64encode(zlib.compress(self.bits, 9)).decode("ascii")
+
+    @staticmethod
+    def decode(data: str) -> "FontCoverage":
+        return FontCoverage(zlib.decompress(base64.b64decode(data)))
+
+    @staticmethod
+    def from_cmap(data: bytes) -> "FontCoverage":
+        """Coverage of a `cmap` table's Unicode subtable (format 12, else format 4)."""
+        subtables = {}
+        _, count = struct.unpack_from(">HH", data, 0)
+        for i in range(count):
+            platform_id, encoding_id, offset = struct.unpack_from(">HHI", data, 4 + 8 * i)
+            if offset + 2 <= len(data):
+                subtables[(platform_id, encoding_id)] = offset
+        bits = bytearray(0x110000 >> 3)
+        for key, fmt in (((3, 10), 12), ((0, 6), 12), ((0, 4), 12),
+                         ((3, 1), 4), ((0, 3), 4), ((0, 2), 4), ((0, 1), 4), ((0, 0), 4)):
+            offset = subtables.get(key)
+            if offset is None or struct.unpack_from(">H", data, offset)[0] != fmt:
+                continue
+            if fmt == 12:
+                groups, = struct.unpack_from(">I", data, offset + 12)
+                for g in range(groups):
+                    start, end, _ = struct.unpack_from(">III", data, offset + 16 + 12 * g)
+                    _set_bits(bits, start, min(end, 0x10FFFF))
             else:
-                entries.append((name, font_path, idx))
-            names[role] = name
+                segs = struct.unpack_from(">H", data, offset + 6)[0] // 2
+                ends = struct.unpack_from(f">{segs}H", data, offset + 14)
+                starts = struct.unpack_from(f">{segs}H", data, offset + 16 + 2 * segs)
+                deltas = struct.unpack_from(f">{segs}h", data, offset + 16 + 4 * segs)
+                range_pos = offset + 16 + 6 * segs
+                range_offsets = struct.unpack_from(f">{segs}H", data, range_pos)
+                for seg, (start, end) in enumerate(zip(starts, ends)):
+                    if start == 0xFFFF:
+                        continue
+                    if range_offsets[seg] == 0:  # glyph = cp + delta; only a zero result is unmapped
+                        _set_bits(bits, start, end)
+                        hole = -deltas[seg] & 0xFFFF
+                        if start <= hole <= end:
+                            bits[hole >> 3] &= ~(1 << (hole & 7))
+                        continue
+                    base = range_pos + 2 * seg + range_offsets[seg]
+                    for cp in range(start, end + 1):
+                        glyph_pos = base + 2 * (cp - start)
+                        if glyph_pos + 2 <= len(data) and struct.unpack_from(">H", data, glyph_pos)[0]:
+                            bits[cp >> 3] |= 1 << (cp & 7)
+            break
+        return FontCoverage(bytes(bits.rstrip(b"\0")))
+
+
+def _set_bits(bits: bytearray, start: int, end: int):
+    """Set bits start..end (inclusive): whole bytes by slice, the ragged ends bit by bit."""
+    while start <= end and start & 7:
+        bits[start >> 3] |= 1 << (start & 7)
+        start += 1
+    full_end = (end + 1) & ~7
+    if start < full_end:
+        bits[start >> 3:full_end >> 3] = b"\xff" * ((full_end - start) >> 3)
+        start = full_end
+    while start <= end:
+        bits[start >> 3] |= 1 << (start & 7)
+        start += 1
+
+
+def read_font_faces(path: str) -> list:
+    """Metadata for every face in a TrueType file or collection (struct-level, no outlines).
+
+    Faces with CFF outlines are skipped: reportlab embeds TrueType (glyf) outlines only.
+    """
+    faces = []
+    with open(path, "rb") as fh:
+        head = fh.read(12)
+        if head[:4] == b"ttcf":
+            count = struct.unpack_from(">I", head, 8)[0]
+            offsets = struct.unpack(f">{count}I", fh.read(4 * count))
+        else:
+            offsets = (0,)
+        for idx, offset in enumerate(offsets):
+            tables = _sfnt_tables(fh, offset)
+            if "glyf" not in tables or "name" not in tables or "cmap" not in tables:
+                continue
+
+            def table(tag, size=None):
+                table_offset, length = tables[tag]
+                fh.seek(table_offset)
+                return fh.read(length if size is None else min(size, length))
+
+            names = _sfnt_names(table("name"))
+            weight, selection, ranges = 400, 0, [0, 0, 0, 0]
+            if "OS/2" in tables:
+                os2 = table("OS/2", 64)
+                if len(os2) >= 64:
+                    weight, = struct.unpack_from(">H", os2, 4)
+                    ranges = list(struct.unpack_from(">4I", os2, 42))
+                    selection, = struct.unpack_from(">H", os2, 62)
+            mono = False
+            if "post" in tables:
+                post = table("post", 16)
+                mono = len(post) >= 16 and struct.unpack_from(">I", post, 12)[0] != 0
+            try:
+                coverage = FontCoverage.from_cmap(table("cmap"))
+            except struct.error:  # a truncated subtable: nothing is known to be covered
+                coverage = FontCoverage(b"")
+            family = names.get(16) or names.get(1) or Path(path).stem
+            faces.append({
+                "path": path, "index": idx if head[:4] == b"ttcf" else None,
+                "family": family, "style": names.get(17) or names.get(2) or "Regular",
+                "ps_name": re.sub(r"[^A-Za-z0-9_.-]", "", names.get(6) or "") or
+                           re.sub(r"[^A-Za-z0-9_.-]", "", f"{Path(path).stem}{idx or ''}"),
+                "weight": weight, "bold": bool(selection & 0x20) or weight >= 600,
+                "italic": bool(selection & 0x201), "mono": mono, "unicode_ranges": ranges,
+                "glyphs": len(coverage), "coverage": coverage.encode(),
+            })
+    return faces
+
+
+class FontIndex:
+    """Every usable face under font_dirs(), grouped by family for O(1) lookups.
+
+    The index is a JSON file in the font cache directory. It is trusted while the mtimes
+    of every scanned directory are unchanged; otherwise the directories are walked again,
+    and only files whose size or mtime changed are re-read.
+    """
 
-        names["family"] = names["body"]
-        names["_source"] = font_path
-        names["_entries"] = entries
-        return names
+    def __init__(self, files: dict, dirs: dict):
+        self.files, self.dirs = files, dirs
+        self._digest = None
+        self.families, self.faces, self._coverage = {}, {}, {}
+        for record in files.values():
+            for entry in record["faces"]:
+                self.faces[(entry["path"], entry["index"])] = entry
+                style = ("boldItalic" if entry["italic"] else "bold") if entry["bold"] \
+                    else ("italic" if entry["italic"] else "body")
+                target = 700 if entry["bold"] else 400
+                faces = self.families.setdefault(_family_key(entry["family"]), {})
+                best = faces.get(style)
+                if best is None or (abs(entry["weight"] - target), entry["path"]) < \
+                        (abs(best["weight"] - target), best["path"]):
+                    faces[style] = entry
+
+    def family(self, name: str, auto: list):
+        """{style: face} for a family name ("auto": the first present of `auto`), or None."""
+        for candidate in ([] if name in ("auto", None) else [name]) + list(auto):
+            faces = self.families.get(_family_key(candidate))
+            if faces and "body" in faces:
+                return faces
+        return None
 
-    return {
-        "body": "Helvetica", "bold": "Helvetica-Bold",
-        "italic": "Helvetica-Oblique", "boldItalic": "Helvetica-BoldOblique",
-        "family": "Helvetica", "_source": "builtin", "_entries": [],
-    }
+    def fallback_chain(self, spec, exclude=None) -> list:
+        """Family keys for `fonts.fallback`: the listed families that are indexed, or for
+        "auto", _AUTO_FALLBACK then every other family, widest coverage first."""
+        if spec == "auto":
+            ranked = sorted(self.families, key=lambda k: (-self.families[k].get("body", {}).get("glyphs", 0), k))
+            keys = [_family_key(name) for name in _AUTO_FALLBACK] + ranked
+        else:
+            keys = [_family_key(name) for name in spec or []]
+        skip = _family_key(exclude) if exclude else None
+        chain = []
+        for key in keys:
+            if key != skip and key not in chain and "body" in self.families.get(key, {}):
+                chain.append(key)
+        return chain
+
+    def coverage(self, path: str, index=None) -> FontCoverage:
+        """The decoded coverage of one face (memoized; empty for a face not in the index)."""
+        cov = self._coverage.get((path, index))
+        if cov is None:
+            entry = self.faces.get((path, index))
+            cov = FontCoverage.decode(entry["coverage"]) if entry else FontCoverage(b"")
+            self._coverage[(path, index)] = cov
+        return cov
+
+    def __len__(self):
+        return sum(len(r["faces"]) for r in self.files.values())
+
+    @staticmethod
+    def scan(previous=None) -> "FontIndex":
+        """Walk font_dirs(), reusing `previous` entries for files whose size and mtime match."""
+        old = previous.files if previous else {}
+        files, dirs = {}, {}
+        for root in font_dirs():
+            if not os.path.isdir(root):
+                dirs[root] = None
+                continue
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                dirs[dirpath] = os.stat(dirpath).st_mtime_ns
+                for filename in sorted(filenames):
+                    if not filename.lower().endswith(_FONT_SUFFIXES):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        st = os.stat(path)
+                        stamp = [st.st_size, st.st_mtime_ns]
+                        record = old.get(path)
+                        if record is None or record["stamp"] != stamp:
+                            record = {"stamp": stamp, "faces": read_font_faces(path)}
+                    except (OSError, struct.error, ValueError):  # unreadable or not an sfnt
+                        continue
+                    files[path] = record
+        return FontIndex(files, dirs)
+
+    @property
+    def digest(self) -> str:
+        """Hash of every indexed file's path, size and mtime: a font installed or removed
+        anywhere the index scans changes it."""
+        if self._digest is None:
+            h = hashlib.sha256()
+            for path in sorted(self.files):
+                h.update(f"{path}\0{self.files[path]['stamp']}\n".encode("utf-8"))
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def is_current(self) -> bool:
+        """True while the scanned roots and every directory mtime match the filesystem."""
+        roots = font_dirs()
+        if any(root not in self.dirs for root in roots):
+            return False
+        for path, mtime in self.dirs.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                if mtime is not None:
+                    return False
+        return True
+
+
+_font_index = None
+
+
+def font_index() -> FontIndex:
+    """The current FontIndex: kept in memory, persisted next to the parsed-font cache."""
+    global _font_index
+    if _font_index is not None and _font_index.is_current():
+        return _font_index
+    cache_dir = font_cache_dir()
+    path = cache_dir / "index.json" if cache_dir else None
+    index = _font_index
+    if index is None and path is not None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") == _FONT_INDEX_VERSION:
+                index = FontIndex(data["files"], data["dirs"])
+        except (OSError, ValueError, KeyError):
+            index = None
+    if index is None or not index.is_current():
+        index = FontIndex.scan(index)
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _write_json_atomic(path, {"version": _FONT_INDEX_VERSION,
+                                          "dirs": index.dirs, "files": index.files})
+            except OSError:
+                pass
+    _font_index = index
+    return index
+
+
+def fonts_digest(fonts_config=None) -> str:
+    """Hash of the fonts a render can use: the FontIndex digest (which fallback families
+    exist) plus the current size and mtime of each face detect_fonts() resolves."""
+    h = hashlib.sha256(font_index().digest.encode("ascii"))
+    for name, path, idx in detect_fonts(fonts_config).get("_entries", []):
+        try:
+            st = os.stat(path)
+            stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            stamp = "missing"
+        h.update(f"{name}\0{path}\0{idx}\0{stamp}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+_FONT_LOCK = threading.Lock()
 
 
 def register_detected_fonts(font_info: dict):
-    """Register detected fonts with reportlab (lazy import)."""
+    """Register detected fonts with reportlab (lazy import).
+
+    Names already registered in this process are skipped, so a warm daemon parses each TTF once,
+    and faces come from the parsed-font cache (see load_ttfont) when it is current.
+    """
     from reportlab.pdfbase import pdfmetrics
+
+    # pdfmetrics is a process-wide registry: check-then-register must not interleave
+    # between threads (AsyncRenderer thread mode, the HTTP workers)
+    with _FONT_LOCK:
+        registered = set(pdfmetrics.getRegisteredFontNames())
+        for name, path, idx in font_info.get("_entries", []):
+            if name in registered:
+                continue
+            pdfmetrics.registerFont(load_ttfont(name, path, idx))
+
+        if font_info["_entries"]:
+            pdfmetrics.registerFontFamily(
+                font_info["family"],
+                normal=font_info["body"],
+                bold=font_info["bold"],
+                italic=font_info["italic"],
+                boldItalic=font_info["boldItalic"],
+            )
+
+
+# ---------------------------------------------------------------------------
+# Font fallback -- characters the paragraph font lacks are set in a fallback family
+# ---------------------------------------------------------------------------
+
+_TAG_RE = re.compile(r"(<[^>]*>)")
+_FACE_RE = re.compile(r'face="([^"]*)"')
+
+
+@lru_cache(maxsize=None)
+def _winansi_coverage() -> FontCoverage:
+    """What the PDF standard fonts (Helvetica, Courier, ...) can show: WinAnsiEncoding."""
+    bits = bytearray(0x2200 >> 3)
+    for byte in range(32, 256):
+        try:
+            cp = ord(bytes([byte]).decode("cp1252"))
+        except UnicodeDecodeError:
+            continue
+        bits[cp >> 3] |= 1 << (cp & 7)
+    return FontCoverage(bytes(bits))
+
+
+def _face_role(name: str) -> str:
+    """The style role of a face name that is not otherwise known (e.g. Courier-BoldOblique)."""
+    bold, italic = "Bold" in name, "Italic" in name or "Oblique" in name
+    return ("boldItalic" if italic else "bold") if bold else ("italic" if italic else "body")
+
+
+class FontFallback:
+    """Splits Paragraph markup into <font face=...> runs so every character has a glyph.
+
+    Coverage is a bitmap lookup per character (memoized per face), never a glyph probe;
+    pure-ASCII markup is returned untouched. A fallback run uses the style (bold, italic)
+    in effect. A fallback family is registered with reportlab the first time one of its
+    characters is needed, so unused fallbacks cost nothing.
+    """
+
+    _cache = LRUCache(32)
+
+    def __init__(self, font_info: dict):
+        self.index = font_index()
+        self.chain = list(font_info.get("fallback", []))
+        self.sources = {name: (path, idx) for name, path, idx in font_info.get("_entries", [])}
+        self.body = {role: font_info[role] for role in _STYLE_SUFFIX}
+        self.roles = {name: role for role, name in self.body.items()}
+        # a character counts as covered by the body family only if every style has it
+        self.body_coverage = None
+        for name in self.roles:
+            cov = self._source_coverage(name)
+            self.body_coverage = cov if self.body_coverage is None else self.body_coverage & cov
+        self._faces = {}     # face name -> FontCoverage
+        self._families = {}  # fallback family key -> {role: registered face name}
+        self._memo = {}      # (face, char) -> family to switch to ("" = body), or None
+
+    @classmethod
+    def of(cls, font_info: dict) -> "FontFallback":
+        """The shared fallback for a detect_fonts() result (memo and registrations reused)."""
+        key = (font_info["body"], tuple(font_info.get("_entries", ())), tuple(font_info.get("fallback", ())))
+        fallback = cls._cache.get(key)
+        if fallback is None:
+            fallback = cls(font_info)
+            cls._cache.put(key, fallback)
+        return fallback
+
+    def _source_coverage(self, name: str) -> FontCoverage:
+        source = self.sources.get(name)
+        return self.index.coverage(*source) if source else _winansi_coverage()
+
+    def _coverage(self, face: str) -> FontCoverage:
+        if face in self.body.values():
+            return self.body_coverage
+        cov = self._faces.get(face)
+        if cov is None:
+            cov = self._faces[face] = self._source_coverage(face)
+        return cov
+
+    def _family(self, key: str) -> dict:
+        """Register a fallback family on first use; returns {role: face name}."""
+        names = self._families.get(key)
+        if names is None:
+            names, entries = family_fonts(self.index.families[key])
+            register_detected_fonts(dict(names, family=names["body"], _entries=entries))
+            self.sources.update((n, (path, idx)) for n, path, idx in entries)
+            self.roles.update((n, role) for role, n in names.items())
+            self._families[key] = names
+        return names
+
+    def _pick(self, face: str, ch: str):
+        cp = ord(ch)
+        if cp in self._coverage(face):
+            return None
+        if face not in self.body.values() and cp in self.body_coverage:
+            return ""
+        for key in self.chain:
+            faces = self.index.families.get(key)
+            if faces and cp in self.index.coverage(faces["body"]["path"], faces["body"]["index"]):
+                return key
+        return None  # nothing has it: leave it to the paragraph font
+
+    def _split(self, run: str, face: str, role: str) -> str:
+        memo = self._memo
+        out, segment, target = [], [], None
+        for ch in run:
+            key = (face, ch)
+            pick = memo[key] if key in memo else memo.setdefault(key, self._pick(face, ch))
+            if pick != target and segment:
+                out.append(self._wrap("".join(segment), target, role))
+                segment = []
+            target = pick
+            segment.append(ch)
+        out.append(self._wrap("".join(segment), target, role))
+        return "".join(out)
+
+    def _wrap(self, text: str, target, role: str) -> str:
+        if target is None:
+            return text
+        name = (self.body if target == "" else self._family(target))[role]
+        return f'<font face="{name}">{text}</font>'
+
+    def apply(self, markup: str, face: str) -> str:
+        """Wrap the characters `face` (the paragraph style's font) lacks; tags are kept."""
+        if markup.isascii():
+            return markup
+        stack, bold, italic = [face], 0, 0
+        out = []
+        for i, part in enumerate(_TAG_RE.split(markup)):
+            if i & 1:  # a tag: track the face and style in effect
+                tag = part.strip("</>").split(" ", 1)[0].lower()
+                closing = part.startswith("</")
+                if tag == "font":
+                    if closing and len(stack) > 1:
+                        stack.pop()
+                    elif not closing:
+                        m = _FACE_RE.search(part)
+                        stack.append(m.group(1) if m else stack[-1])
+                elif tag in ("b", "strong"):
+                    bold += -1 if closing else 1
+                elif tag in ("i", "em"):
+                    italic += -1 if closing else 1
+                out.append(part)
+            elif part.isascii():
+                out.append(part)
+            else:
+                current = stack[-1]
+                base = self.roles.get(current) or _face_role(current)
+                is_bold = bold > 0 or base in ("bold", "boldItalic")
+                is_italic = italic > 0 or base in ("italic", "boldItalic")
+                role = ("boldItalic" if is_italic else "bold") if is_bold else ("italic" if is_italic else "body")
+                out.append(self._split(part, current, role))
+        return "".join(out)
+
+
+# ---------------------------------------------------------------------------
+# Parsed font cache -- TTF/TTC tables parsed once per font file version, not per run
+# ---------------------------------------------------------------------------
+
+_FONT_CACHE_VERSION = 1
+# Parser attributes that are rebuilt on load: the raw file (re-read) and a scale closure.
+_FACE_TRANSIENT = ("_ttf_data", "_pdfScale")
+
+
+@contextmanager
+def _atomic_write(target, mode: str = "wb"):
+    """Yield a temp file beside target, renamed over it when the block completes.
+
+    Readers never see half a file, and on any error the temp file is removed, so a full
+    disk or a failed pickle leaves no .md-to-pdf-* file behind.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), prefix=".md-to-pdf-")
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as fh:
+            yield fh
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _user_cache_dir(variable: str, leaf: str):
+    """$<variable>, else $XDG_CACHE_HOME/md-to-pdf/<leaf>; None when the variable is "off"."""
+    configured = os.environ.get(variable)
+    if configured is not None:
+        return None if configured.strip().lower() in ("", "0", "off") else Path(configured)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "md-to-pdf" / leaf
+
+
+def font_cache_dir():
+    """$MD_TO_PDF_FONT_CACHE, else $XDG_CACHE_HOME/md-to-pdf/fonts; None when set to "off"."""
+    return _user_cache_dir("MD_TO_PDF_FONT_CACHE", "fonts")
+
+
+def _font_cache_entry(cache_dir: Path, path: str, idx):
+    """Cache file for one face, keyed on cache format, reportlab version, path, size and mtime."""
+    from reportlab import Version
+    st = os.stat(path)
+    ident = f"{_FONT_CACHE_VERSION}|{Version}|{os.path.abspath(path)}|{idx}|{st.st_size}|{st.st_mtime_ns}"
+    return cache_dir / f"{hashlib.sha256(ident.encode('utf-8')).hexdigest()[:32]}.pickle"
+
+
+# path -> read-only mapping of the font file, shared by every face loaded from it
+_font_maps = {}
+
+
+def map_font_file(path: str):
+    """The font file as a read-only mmap (bytes where mapping is impossible, e.g. empty files).
+
+    A mapping is backed by the page cache, so every worker that maps the same file -- forked
+    pool workers, spool workers, separate CLI runs -- shares one physical copy of it; only
+    the pages subsetting actually touches become resident.
+    """
+    data = _font_maps.get(path)
+    if data is None:
+        import mmap
+        with open(path, "rb") as fh:
+            try:
+                data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                data = fh.read()
+        data = _font_maps.setdefault(path, data)
+    return data
+
+
+def font_memory():
+    """This process's resident memory in mapped font files, in KB, from /proc/self/smaps.
+
+    Returns {"pid", "files", "rss", "pss", "shared", "private"} (pss divides shared pages
+    among the processes mapping them), or None where smaps is unavailable (non-Linux).
+    """
+    import mmap
+
+    paths = {os.path.realpath(p) for p, data in _font_maps.items() if isinstance(data, mmap.mmap)}
+    report = {"pid": os.getpid(), "files": len(paths), "rss": 0, "pss": 0, "shared": 0, "private": 0}
+    fields = {"Rss:": ("rss",), "Pss:": ("pss",), "Shared_Clean:": ("shared",),
+              "Shared_Dirty:": ("shared",), "Private_Clean:": ("private",),
+              "Private_Dirty:": ("private",)}
+    try:
+        with open("/proc/self/smaps", encoding="utf-8", errors="replace") as fh:
+            current = False
+            for line in fh:
+                parts = line.split()
+                if not parts:
+                    continue
+                if not parts[0].endswith(":"):  # a mapping header: address perms offset dev inode [path]
+                    current = len(parts) >= 6 and " ".join(parts[5:]) in paths
+                elif current and parts[0] in fields:
+                    for key in fields[parts[0]]:
+                        report[key] += int(parts[1])
+    except OSError:
+        return None
+    return report
+
+
+def _restore_ttfont(name: str, path: str, state: dict):
+    from fnmatch import fnmatch
+    from weakref import WeakKeyDictionary
+    from reportlab import rl_config
+    from reportlab.pdfbase import ttfonts
+
+    face = ttfonts.TTFontFace.__new__(ttfonts.TTFontFace)
+    face.__dict__.update(state)
+    face._ttf_data = map_font_file(path)  # subsetting copies glyphs out of the raw file
+    scale = 1000 / face.unitsPerEm
+    face._pdfScale = (lambda x: x) if face.unitsPerEm == 1000 else (lambda x: x * scale)
+
+    font = ttfonts.TTFont.__new__(ttfonts.TTFont)  # what TTFont.__init__ does, minus the parse
+    font.fontName, font.face = name, face
+    font.encoding = ttfonts.TTEncoding()
+    font.state = WeakKeyDictionary()
+    font._asciiReadable = rl_config.ttfAsciiReadable
+    font.shapable = not any(fnmatch(name, g) for g in getattr(ttfonts, "unShapedFontGlob", ()))
+    return font
+
+
+def load_ttfont(name: str, path: str, idx=None):
+    """TTFont(name, path) restored from the parsed-face cache, or parsed and then cached.
+
+    A cache entry that is missing, stale or fails to restore or store for any reason only
+    costs the normal parse.
+    """
+    import pickle
     from reportlab.pdfbase.ttfonts import TTFont
 
-    for name, path, idx in font_info.get("_entries", []):
-        kwargs = {"subfontIndex": idx} if idx is not None else {}
-        pdfmetrics.registerFont(TTFont(name, path, **kwargs))
+    cache_dir = font_cache_dir()
+    entry = None
+    if cache_dir is not None:
+        try:
+            entry = _font_cache_entry(cache_dir, path, idx)
+            with open(entry, "rb") as fh:
+                return _restore_ttfont(name, path, pickle.load(fh))
+        except Exception:  # absent, from another layout or not restorable: parse instead
+            pass
+
+    font = TTFont(name, path, **({"subfontIndex": idx} if idx is not None else {}))
+    font.face._ttf_data = map_font_file(path)  # drop the parser's private copy
+    if entry is not None:
+        state = {k: v for k, v in font.face.__dict__.items() if k not in _FACE_TRANSIENT}
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            with _atomic_write(entry) as fh:
+                pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:  # unwritable, or a face that does not pickle: the next run parses
+            pass
+    return font
+
 
-    if font_info["_entries"]:
-        pdfmetrics.registerFontFamily(
-            font_info["family"],
-            normal=font_info["body"],
-            bold=font_info["bold"],
-            italic=font_info["italic"],
-            boldItalic=font_info["boldItalic"],
-        )
+def warm_font_cache(fonts_config=None) -> list:
+    """Parse and cache every detected face (for image builds); returns [(name, path), ...]."""
+    font_info = detect_fonts(fonts_config)
+    for name, path, idx in font_info.get("_entries", []):
+        load_ttfont(name, path, idx)
+    return [(name, path) for name, path, _ in font_info.get("_entries", [])]
 
 
 # ---------------------------------------------------------------------------
 # Structured output
 # ---------------------------------------------------------------------------
 
-def print_status(output_path: str, page_count: int, engine: str):
-    """Emit the five result lines the skill parses. Never suppressed -- they are the contract."""
-    size_bytes = Path(output_path).stat().st_size
-    size_kb = f"{size_bytes / 1024:.0f}KB"
+def print_status(output_path: str, page_count: int, engine: str, cache=None,
+                 size_bytes=None, file=None):
+    """Emit the five result lines the skill parses. Never suppressed -- they are the contract.
+
+    With the render cache enabled a sixth line, CACHE=HIT|MISS, follows them. size_bytes
+    stands in for stat() when the PDF went to a stream.
+    """
+    if size_bytes is None:
+        size_bytes = Path(output_path).stat().st_size
     for ln in (
         "STATUS=OK",
         f"OUTPUT={output_path}",
         f"PAGES={page_count}",
-        f"SIZE={size_kb}",
+        f"SIZE={_size_kb(size_bytes)}",
         f"ENGINE={engine}",
     ):
-        print(ln)
+        print(ln, file=file)
+    if cache:
+        print(f"CACHE={cache.upper()}", file=file)
+
+
+def print_font_memory(report, file=None):
+    """FONT_MEMORY=pid=N rss=KB pss=KB shared=KB private=KB, when --font-memory produced one."""
+    if report:
+        print("FONT_MEMORY=" + " ".join(f"{k}={report[k]}" + ("" if k in ("pid", "files") else "KB")
+                                        for k in ("pid", "files", "rss", "pss", "shared", "private")),
+              file=file)
+
 
+def _size_kb(size_bytes: int) -> str:
+    return f"{size_bytes / 1024:.0f}KB"
 
-def print_failure(message: str):
-    print("STATUS=FAILED", file=sys.stdout)
+
+def print_failure(message: str, file=None):
+    print("STATUS=FAILED", file=file or sys.stdout)
     print(message, file=sys.stderr)
 
 
+# Set by run_job: warnings land in the job's result instead of the process stderr.
+_warning_sink: ContextVar = ContextVar("md_to_pdf_warnings", default=None)
+
+
 def warn(message: str):
-    """Report degraded output (dropped content) on stderr."""
+    """Report degraded output (dropped content) on stderr, or into the running job's result."""
+    sink = _warning_sink.get()
+    if sink is not None:
+        sink.append(message)
+        return
     print(f"WARN={message}", file=sys.stderr)
 
 
+# Set by the HTTP endpoint: images may only be read from inside this (resolved) directory.
+_image_root: ContextVar = ContextVar("md_to_pdf_image_root", default=None)
+
+
+def _resolve_image(src: str, base_dir: Path):
+    """Local path of an image source: as given, else against base_dir; None outside the image root.
+
+    Under an image root a relative source resolves against base_dir only, and the check runs
+    on the real path, so neither an absolute path, "..", nor a symlink reaches out of it.
+    """
+    root = _image_root.get()
+    img_path = Path(src)
+    if not img_path.is_absolute() and (root is not None or not img_path.exists()):
+        img_path = base_dir / src
+    if root is not None and not Path(os.path.realpath(img_path)).is_relative_to(root):
+        return None
+    return img_path
+
+
+def _confined_url_fetcher(root: Path):
+    """A weasyprint url_fetcher that serves data: URLs and files inside root, and nothing else."""
+    import weasyprint
+    from urllib.parse import unquote, urlsplit
+
+    def fetch(url, *args, **kwargs):
+        parts = urlsplit(url)
+        if parts.scheme != "data" and not (
+                parts.scheme == "file"
+                and Path(os.path.realpath(unquote(parts.path))).is_relative_to(root)):
+            raise ValueError(f"{url} is outside the image root")
+        return weasyprint.default_url_fetcher(url, *args, **kwargs)
+
+    return fetch
+
+
+@contextmanager
+def _phase(timings, name: str):
+    """Add the wall time of the block, in ms, to timings[name] (no-op when timings is None)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0) + (time.perf_counter() - started) * 1000, 3)
+
+
 # ---------------------------------------------------------------------------
 # WeasyPrint engine
 # ---------------------------------------------------------------------------
@@ -244,57 +1234,402 @@ th {{ background-color: {c.get("header_bg", "#1a3a5c")}; color: {c.get("header_f
 """
 
 
-def convert_weasyprint(input_path: str, output_path: str, config: dict,
-                       css_path=None, pygments_theme="github"):
-    """Convert MD -> HTML -> CSS -> PDF via weasyprint."""
+_pygments_css = {}  # (theme, selector) -> CSS, for this process's pygments
+_PYGMENTS_CSS_LOCK = threading.RLock()  # an unknown theme recurses for "default"
+
+
+def pygments_css(theme: str = "github", selector: str = ".highlight") -> str:
+    """The pygments stylesheet for a theme, generated once per (theme, selector, version).
+
+    Looked up in memory, then in $MD_TO_PDF_STYLE_CACHE (default
+    $XDG_CACHE_HOME/md-to-pdf/styles; "off" disables it); only a miss on both imports the
+    pygments style machinery. An unknown theme warns once and resolves to `default` for the
+    rest of the process; that substitute is not written to disk.
+    """
+    css = _pygments_css.get((theme, selector))
+    if css is not None:
+        return css
+    with _PYGMENTS_CSS_LOCK:
+        css = _pygments_css.get((theme, selector))
+        if css is not None:
+            return css
+        import pygments
+
+        cache_dir = _user_cache_dir("MD_TO_PDF_STYLE_CACHE", "styles")
+        entry = None
+        if cache_dir is not None:
+            digest = hashlib.sha256(f"{theme}\0{selector}\0{pygments.__version__}".encode("utf-8")).hexdigest()
+            entry = cache_dir / f"pygments-{digest[:32]}.css"
+            try:
+                css = entry.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                css = None
+        if css is None:
+            from pygments.formatters import HtmlFormatter
+            from pygments.util import ClassNotFound
+            try:
+                css = HtmlFormatter(style=theme).get_style_defs(selector)
+            except ClassNotFound:
+                warn(f"unknown pygments theme {theme!r}; using 'default'")
+                css = _pygments_css[(theme, selector)] = pygments_css("default", selector)
+                return css
+            if entry is not None:
+                try:
+                    entry.parent.mkdir(parents=True, exist_ok=True)
+                    with _atomic_write(entry, "w") as fh:
+                        fh.write(css)
+                except OSError:
+                    pass
+        _pygments_css[(theme, selector)] = css
+        return css
+
+
+# interpreter named by a shebang (basename, version digits stripped) -> pygments alias
+_SHEBANG_LANGS = {
+    "python": "python", "sh": "bash", "bash": "bash", "zsh": "zsh", "dash": "bash", "ksh": "bash",
+    "node": "javascript", "deno": "typescript", "ruby": "ruby", "perl": "perl", "php": "php",
+    "pwsh": "powershell", "lua": "lua", "fish": "fish", "awk": "awk", "make": "make",
+}
+# file extension named on the first line ("# file: app.py", "// src/main.go") -> pygments alias
+_FILENAME_LANGS = {
+    "py": "python", "pyi": "python", "sh": "bash", "bash": "bash", "zsh": "zsh", "js": "javascript",
+    "mjs": "javascript", "cjs": "javascript", "jsx": "jsx", "ts": "typescript", "tsx": "tsx",
+    "json": "json", "yaml": "yaml", "yml": "yaml", "toml": "toml", "ini": "ini", "cfg": "ini",
+    "sql": "sql", "go": "go", "rs": "rust", "c": "c", "h": "c", "cc": "cpp", "cpp": "cpp",
+    "hpp": "cpp", "java": "java", "kt": "kotlin", "rb": "ruby", "php": "php", "pl": "perl",
+    "html": "html", "xml": "xml", "css": "css", "scss": "scss", "md": "markdown", "lua": "lua",
+    "ps1": "powershell", "tf": "terraform", "diff": "diff", "patch": "diff", "swift": "swift",
+}
+_FILENAME_NAMES = {"dockerfile": "docker", "makefile": "make", "gnumakefile": "make"}
+_SHEBANG_RE = re.compile(r"#!\s*\S*?/(?:env\s+(?:-\S+\s+)*)?([A-Za-z]+)[\d.]*(?:\s|$)")
+_FILENAME_RE = re.compile(
+    r"(?:#|//|--|;|/\*|<!--)\s*(?:(?:file(?:name)?|path)\s*:\s*)?(\S*?([\w-]+)(?:\.(\w+))?)\s*(?:\*/|-->)?\s*$")
+# ordered (pattern, alias); a pattern must only match text that is unmistakably that language
+_CODE_SIGNATURES = (
+    (r"\A\s*(?:diff --git |--- \S.*\n\+\+\+ |@@ -\d)", "diff"),
+    (r"\A\s*<\?xml\b", "xml"),
+    (r"\A\s*(?:<!DOCTYPE html|<html\b)", "html"),
+    (r"\A\s*(?:\{\s*(?:\"[^\"\n]*\"\s*:|\}\s*\Z)|\[\s*(?:[\"{\[\d-]|\]\s*\Z))", "json"),
+    (r"\A\s*FROM\s+\S+(?:\s+AS\s+\w+)?\s*$(?:\n(?:RUN|COPY|WORKDIR|ENV|CMD|ENTRYPOINT|ARG|EXPOSE)\b)?", "docker"),
+    (r"^\s*(?:package\s+main\b|func\s+(?:\([^)]*\)\s*)?\w+\s*\(|import\s+\(\s*$)", "go"),
+    (r"^\s*(?:fn\s+\w+\s*[<(]|let\s+mut\s+\w|use\s+\w+(?:::\w+)+|impl(?:<[^>]*>)?\s+\w+)", "rust"),
+    (r"^\s*#include\s*<\w+\.h>", "c"),
+    (r"^\s*#include\s*[<\"]|^\s*(?:std::|template\s*<|namespace\s+\w+\s*\{)", "cpp"),
+    (r"^\s*(?:public|private|protected)\s+(?:static\s+)?(?:final\s+)?(?:class|void|int|String)\b", "java"),
+    (r"^\s*(?:def\s+\w+\s*\(.*\)\s*(?:->\s*[^:]+)?:\s*$|class\s+\w+(?:\([^)]*\))?:\s*$"
+     r"|from\s+[\w.]+\s+import\s|import\s+[\w.]+(?:\s+as\s+\w+)?\s*$|if\s+__name__\s*==)", "python"),
+    (r"^\s*(?:(?:export\s+)?(?:interface|type)\s+\w+\s*(?:<[^>]*>\s*)?[={]|\w+\s*:\s*(?:string|number|boolean)\b)",
+     "typescript"),
+    (r"^\s*(?:(?:export\s+)?(?:async\s+)?function\s*\*?\s*\w*\s*\(|(?:const|let|var)\s+\w+\s*=|"
+     r"import\s+.+\s+from\s+['\"]|module\.exports\b|console\.log\()", "javascript"),
+    (r"^\s*(?i:SELECT\b(?:.|\n){1,400}?\bFROM\s+\w|INSERT\s+INTO\b|UPDATE\s+\w+\s+SET\b|DELETE\s+FROM\b|"
+     r"CREATE\s+(?:TABLE|INDEX|VIEW)\b|ALTER\s+TABLE\b|WITH\s+\w+\s+AS\s*\()", "sql"),
+    (r"\A\s*\$ \S", "console"),
+    (r"^\s*(?:(?:sudo|apt(?:-get)?|brew|npm|npx|pnpm|yarn|pip3?|git|cd|echo|export|curl|wget|docker|"
+     r"kubectl|mkdir|chmod|ls|cat|source|python3?)\s|if\s+\[\[?\s|for\s+\w+\s+in\s.*;\s*do\b|\w+=\$\()", "bash"),
+    (r"\A\s*(?:---[ \t]*\n)?(?:#[^\n]*\n)*(?:- )?[\w.\"-]+:(?:[ \t]+[^\s{(].*)?\n[ \t]*(?:- )?[\w.\"-]+:(?:[ \t]|$)",
+     "yaml"),
+    (r"\A\s*(?:#[^\n]*\n\s*)*\[[\w.\"-]+\]\s*\n[\w.\"-]+\s*=", "toml"),
+    (r"\A\s*[.#@]?[\w-][\w\s.#:>,\[\]=\"-]*\{\s*\n?\s*[\w-]+\s*:[^;{}]+;", "css"),
+    (r"\A[\w.-]+\s*:[^=\n]*\n\t\S", "make"),
+)
+_CODE_SCAN_CHARS = 2000  # signatures and guesses look at the first chars only
+_GUESS_CHARS = 4000
+_guessed_langs = LRUCache(512)  # content hash -> guess_lexer alias (None: no guess)
+
+
+def code_hint_language(code: str, filename=None):
+    """The pygments alias a shebang or file name (given, or named on the first line) implies; else None."""
+    first = code.lstrip("\n").split("\n", 1)[0].strip()
+    if first.startswith("#!"):
+        m = _SHEBANG_RE.match(first)
+        return _SHEBANG_LANGS.get(m.group(1).lower()) if m else None
+    if filename is None:
+        m = _FILENAME_RE.match(first)
+        if m is None or m.group(3) is None and "/" not in m.group(1) and m.group(2).lower() not in _FILENAME_NAMES:
+            return None
+        filename = m.group(1)
+    name = filename.replace("\\", "/").rsplit("/", 1)[-1].lower()
+    if name in _FILENAME_NAMES:
+        return _FILENAME_NAMES[name]
+    return _FILENAME_LANGS.get(name.rsplit(".", 1)[-1]) if "." in name else None
+
+
+@lru_cache(maxsize=None)
+def _code_signatures() -> tuple:
+    """_CODE_SIGNATURES compiled on the first unlabelled code block instead of at import."""
+    return tuple((re.compile(pattern, re.M), lang) for pattern, lang in _CODE_SIGNATURES)
+
+
+def code_signature_language(code: str):
+    """The pygments alias of the first _CODE_SIGNATURES pattern the code's head matches; else None."""
+    head = code[:_CODE_SCAN_CHARS]
+    for pattern, lang in _code_signatures():
+        if pattern.search(head):
+            return lang
+    return None
+
+
+def guess_code_language(code: str):
+    """pygments' guess_lexer over the code's head, memoized by content hash; None for plain text.
+
+    guess_lexer runs every registered lexer's analyse_text (the first call also imports them
+    all), so this is the last resort behind the hint and signature tables.
+    """
+    key = hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+    lang = _guessed_langs.get(key, "")  # "" never is an alias: not memoized yet
+    if lang != "":
+        return lang
+    from pygments.lexers import guess_lexer
+    from pygments.util import ClassNotFound
     try:
-        import markdown
-        import weasyprint
-        from pygments.formatters import HtmlFormatter
-    except ImportError as exc:
-        print_failure(f"Missing dependency for weasyprint engine: {exc}\n"
-                      f"Install with: bash {SCRIPT_DIR}/check_deps.sh install weasyprint")
-        sys.exit(1)
+        lang = guess_lexer(code[:_GUESS_CHARS]).aliases[0]
+    except (ClassNotFound, IndexError):
+        lang = None
+    lang = None if lang == "text" else lang
+    _guessed_langs.put(key, lang)
+    return lang
 
-    md_text = Path(input_path).read_text(encoding="utf-8")
 
-    extensions = [
-        "tables", "fenced_code", "codehilite", "footnotes",
-        "toc", "attr_list", "def_list", "admonition", "sane_lists", "smarty",
-    ]
-    extension_configs = {
-        "codehilite": {"css_class": "highlight", "guess_lang": True},
-    }
-    html_body = markdown.markdown(md_text, extensions=extensions,
-                                  extension_configs=extension_configs)
+class CodeLanguages:
+    """Language detection for one document's unlabelled code blocks.
+
+    Cheapest first: the fence info string (never overridden), a shebang or file name on the
+    first line, the signature table, then guess_code_language while the document has
+    guess_budget_ms left (None: unlimited, 0: never guess). reset() restores the budget;
+    markdown_to_html calls it through Markdown.reset() for every document.
+    """
+
+    def __init__(self, guess_budget_ms=50):
+        self.guess_budget_ms = guess_budget_ms
+        self.reset()
+
+    def reset(self):
+        self.spent_ms = 0.0
+        self.guesses = 0
+
+    def detect(self, code: str, filename=None):
+        lang = code_hint_language(code, filename) or code_signature_language(code)
+        if lang is not None or self.guess_budget_ms == 0:
+            return lang
+        if self.guess_budget_ms is not None and self.spent_ms >= self.guess_budget_ms:
+            return None
+        started = time.perf_counter()
+        lang = guess_code_language(code)
+        self.spent_ms += (time.perf_counter() - started) * 1000
+        self.guesses += 1
+        return lang
+
+
+class _CodeFences:
+    """Markdown preprocessor: highlight ``` fences through the block cache.
+
+    Runs just before fenced_code and matches with its FENCED_BLOCK_RE. Unlabelled fences
+    get their language from CodeLanguages; each fence without {attrs} is then highlighted
+    exactly as fenced_code would (CodeHilite with the codehilite config), the HTML is kept in
+    BlockCache "weasyprint-code" by content hash, and the fence becomes an htmlStash
+    placeholder. Fences with {attrs} are left to fenced_code.
+    """
+
+    def __init__(self, md, languages: CodeLanguages):
+        import pygments
+        from markdown.extensions.codehilite import CodeHiliteExtension
+        from markdown.extensions.fenced_code import FencedBlockPreprocessor
+        self.md = md
+        self.languages = languages
+        self.fence_re = FencedBlockPreprocessor.FENCED_BLOCK_RE
+        self.config = next(ext.getConfigs() for ext in md.registeredExtensions
+                           if isinstance(ext, CodeHiliteExtension))
+        self.ident = f"{pygments.__version__}\0{sorted(self.config.items())!r}"
+
+    def highlight(self, code: str, lang, hl_lines) -> str:
+        cache = BlockCache.of("weasyprint-code")
+        key = BlockCache.key(self.ident, lang or "", hl_lines or "", code)
+        html = cache.get(key)
+        if html is None:
+            from markdown.extensions.codehilite import CodeHilite, parse_hl_lines
+            config = dict(self.config)
+            if hl_lines:
+                config["hl_lines"] = parse_hl_lines(hl_lines)
+            html = CodeHilite(code, lang=lang or None, style=config.pop("pygments_style", "default"),
+                              **config).hilite(shebang=False)
+            cache.put(key, html)
+        return html
+
+    def run(self, lines: list) -> list:
+        text = "\n".join(lines)
+        if "```" not in text and "~~~" not in text:
+            return lines
+        parts, index = [], 0
+        for m in self.fence_re.finditer(text):
+            if m.group("attrs") is not None:
+                continue
+            code = m.group("code")
+            lang = m.group("lang") or self.languages.detect(code)
+            placeholder = self.md.htmlStash.store(self.highlight(code, lang, m.group("hl_lines")))
+            parts += [text[index:m.start()], "\n", placeholder, "\n"]
+            index = m.end()
+        return "".join(parts + [text[index:]]).split("\n") if parts else lines
+
+
+class _IndentedLanguages:
+    """Markdown treeprocessor: give indented code blocks a codehilite ':::lang' header.
+
+    Runs just before codehilite's; a block that already starts with ':::' or a '#!' line
+    naming no known interpreter is left to codehilite's own header parsing.
+    """
+
+    def __init__(self, languages: CodeLanguages):
+        self.languages = languages
+
+    def run(self, root):
+        for block in root.iter("pre"):
+            if len(block) != 1 or block[0].tag != "code" or not block[0].text:
+                continue
+            text = block[0].text
+            code = text.replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&")
+            first = code.lstrip("\n")
+            if first.startswith(":::") or first.startswith("#!") and code_hint_language(code) is None:
+                continue
+            lang = self.languages.detect(code)
+            if lang:
+                block[0].text = f":::{lang}\n{text}"
+
+
+def install_code_languages(md, guess_budget_ms=50) -> CodeLanguages:
+    """Register CodeLanguages detection on a markdown.Markdown that uses codehilite, and
+    cached fence highlighting (_CodeFences) when it uses fenced_code too.
+
+    codehilite itself must run with guess_lang off (MARKDOWN_EXTENSION_CONFIGS): blocks left
+    undetected render as plain text instead of going through guess_lexer.
+    """
+    languages = CodeLanguages(guess_budget_ms)
+    md.registerExtension(languages)  # Markdown.reset() resets every registered extension
+    if "fenced_code_block" in md.preprocessors:
+        md.preprocessors.register(_CodeFences(md, languages), "code_fences", 26)
+    md.treeprocessors.register(_IndentedLanguages(languages), "code_languages", 31)
+    return languages
+
+
+MARKDOWN_EXTENSIONS = (
+    "tables", "fenced_code", "codehilite", "footnotes",
+    "toc", "attr_list", "def_list", "admonition", "sane_lists", "smarty",
+)
+MARKDOWN_EXTENSION_CONFIGS = {
+    # languages come from install_code_languages; guess_lexer runs only within its budget
+    "codehilite": {"css_class": "highlight", "guess_lang": False},
+}
+# extension -> a pre-scan that is False only when the document cannot use it; pruning an
+# extension whose syntax is absent leaves the HTML unchanged
+_EXTENSION_TRIGGERS = {
+    "tables": lambda text: "|" in text,
+    "fenced_code": lambda text: "```" in text or "~~~" in text,
+    # codehilite also highlights indented code blocks
+    "codehilite": lambda text: "```" in text or "~~~" in text or _INDENTED_RE.search(text) is not None,
+    "footnotes": lambda text: "[^" in text,
+    "attr_list": lambda text: "{" in text,
+    "def_list": lambda text: _DEF_LINE_RE.search(text) is not None,
+    "admonition": lambda text: "!!!" in text,
+}
+_INDENTED_RE = re.compile(r"^(?: {4}|\t)", re.M)
+_DEF_LINE_RE = re.compile(r"^ {0,3}:[ \t]", re.M)
+_markdown_local = threading.local()  # Markdown instances are stateful: one set per thread
 
-    # Resolve CSS
-    css_file = Path(css_path) if css_path else DEFAULT_CSS_PATH
-    css_link = ""
-    if css_file.exists():
-        css_link = f'<link rel="stylesheet" href="file://{css_file.resolve()}">'
 
-    # Pygments inline CSS
+def markdown_extensions(md_text: str) -> tuple:
+    """The subset of MARKDOWN_EXTENSIONS this document can use, in their original order."""
+    return tuple(name for name in MARKDOWN_EXTENSIONS
+                 if name not in _EXTENSION_TRIGGERS or _EXTENSION_TRIGGERS[name](md_text))
+
+
+def markdown_to_html(md_text: str, guess_budget_ms=50) -> str:
+    """Markdown to an HTML body through a cached markdown.Markdown, reset per document.
+
+    Building a Markdown instance loads and registers every extension; batch workers, the
+    daemon and the HTTP endpoint convert many documents, so instances are kept per
+    extension set (see markdown_extensions), guess budget and thread. Unlabelled code
+    blocks get their language from CodeLanguages (guess_budget_ms: see there).
+    """
+    import markdown
+
+    extensions = markdown_extensions(md_text)
+    instances = getattr(_markdown_local, "instances", None)
+    if instances is None:
+        instances = _markdown_local.instances = {}
+    key = (extensions, guess_budget_ms)
+    md = instances.get(key)
+    if md is None:
+        md = instances[key] = markdown.Markdown(
+            extensions=list(extensions),
+            extension_configs={k: v for k, v in MARKDOWN_EXTENSION_CONFIGS.items() if k in extensions})
+        if "codehilite" in extensions:
+            install_code_languages(md, guess_budget_ms)
     try:
-        pygments_css = HtmlFormatter(style=pygments_theme).get_style_defs(".highlight")
+        html = md.reset().convert(md_text)
     except Exception:
-        pygments_css = HtmlFormatter(style="default").get_style_defs(".highlight")
+        instances.pop(key, None)  # an instance that failed mid-document is not reused
+        raise
+    return html
+
+
+def code_guess_budget(config: dict):
+    """The guess_lang budget from config "code": None (unlimited), 0 (off) or milliseconds."""
+    code = config.get("code", {})
+    if not code.get("guess_lang", True):
+        return 0
+    return code.get("guess_budget_ms", 50)
+
+
+def convert_weasyprint(input_path: str, output_path: str, config,
+                       css_path=None, pygments_theme="github", timings=None) -> int:
+    """Convert MD -> HTML -> CSS -> PDF via weasyprint (config: dict or RenderProfile). Returns the page count."""
+    md_text = Path(input_path).read_text(encoding="utf-8")
+    return render_weasyprint(md_text, output_path, config, Path(input_path).parent,
+                             css_path=css_path, pygments_theme=pygments_theme, timings=timings)
+
+
+def render_weasyprint(md_text: str, target, profile, base_dir: Path,
+                      css_path=None, pygments_theme="github", timings=None) -> int:
+    """Render Markdown text into target (a path or a binary file object); returns the page count.
+
+    profile: a RenderProfile, or a merged config dict to look one up for.
+    """
+    try:
+        import markdown
+        if "weasyprint" in sys.modules:
+            import weasyprint
+        else:
+            # its missing-pango banner must not reach the status lines; redirect_stdout swaps
+            # sys.stdout for every thread, so only do it for the first import
+            with redirect_stdout(sys.stderr):
+                import weasyprint
+    except (ImportError, OSError) as exc:
+        raise RuntimeError(f"Missing dependency for weasyprint engine: {exc}\n"
+                           f"Install with: bash {SCRIPT_DIR}/check_deps.sh install weasyprint") from exc
+
+    with _phase(timings, "setup"):
+        # base, pygments and override CSS: parsed once per profile, not per document
+        profile = RenderProfile.of(profile)
+        stylesheets, font_config = profile.weasyprint_stylesheets(css_path, pygments_theme)
+    with _phase(timings, "parse"):
+        html_body = markdown_to_html(md_text, code_guess_budget(profile.config))
 
     html_doc = f"""<!DOCTYPE html>
 <html><head>
 <meta charset="utf-8">
-{css_link}
-<style>{pygments_css}</style>
-<style>{_weasyprint_override_css(config)}</style>
 </head><body>
 {html_body}
 </body></html>"""
 
-    doc = weasyprint.HTML(string=html_doc, base_url=str(Path(input_path).parent)).render()
-    doc.write_pdf(output_path)
+    with _phase(timings, "layout"):
+        root = _image_root.get()
+        fetcher = {} if root is None else {"url_fetcher": _confined_url_fetcher(root)}
+        doc = weasyprint.HTML(string=html_doc, base_url=str(base_dir), **fetcher).render(
+            stylesheets=stylesheets, font_config=font_config)
+    with _phase(timings, "write"):
+        doc.write_pdf(target)
 
-    page_count = len(doc.pages)
-    print_status(output_path, page_count, "weasyprint")
+    return len(doc.pages)
 
 
 # ---------------------------------------------------------------------------
@@ -319,35 +1654,149 @@ def _rl_colors(config: dict):
     }
 
 
-def safe_xml(text: str, code_font: str = "Courier-Bold") -> str:
-    """Escape XML-unsafe chars, apply inline Markdown markup.
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+_EMPHASIS_TAGS = {1: ("<i>", "</i>"), 2: ("<b>", "</b>"), 3: ("<b><i>", "</i></b>")}
+_INLINE_SPECIALS = re.compile(r"[*`\[]")
+
+
+class _Delimiter:
+    """A run of '*' in the inline token list, filled in by emphasis matching."""
+
+    __slots__ = ("count", "can_open", "can_close", "opens", "closes")
+
+    def __init__(self, count: int, can_open: bool, can_close: bool):
+        self.count, self.can_open, self.can_close = count, can_open, can_close
+        self.opens, self.closes = [], []  # tags, in match order
+
+    def __str__(self):
+        return "".join(self.closes) + "*" * self.count + "".join(reversed(self.opens))
 
-    Handles: **bold**, *italic*, ***bold italic***, `inline code`, [links](url).
-    Args:
-        code_font: font face for inline `code` spans (default: Courier-Bold).
-    """
-    text = text.replace("&", "&amp;")
-    text = text.replace("<", "&lt;").replace(">", "&gt;")
 
-    # Links [text](url) -- must come before bold/italic to avoid mangling
-    # Internal anchors (#...) become plain bold text; external URLs become <a> tags
-    def _link_repl(m):
-        link_text, url = m.group(1), m.group(2)
-        if url.startswith("#"):
-            return f"<b>{link_text}</b>"
-        return f'<a href="{url}" color="blue"><u>{link_text}</u></a>'
+def _inline_tokens(text: str, lo: int, hi: int, code_font: str) -> list:
+    """Markup tokens for text[lo:hi]: strings, plus _Delimiters still to be matched.
 
-    text = re.sub(r"\[([^\]]+?)\]\(([^)]+?)\)", _link_repl, text)
+    Every character is looked at once. Code spans (a backtick run up to the next run of the
+    same length) are atomic; a link's text is tokenized as its own region, so emphasis
+    never crosses a link boundary. Searches for a closing ']' or ')' resume from the last
+    hit, and backtick runs are indexed per length up front, so no position is rescanned.
+    """
+    tokens, plain = [], lo
+    runs = {}  # backtick run length -> start positions, in order
+    pos = text.find("`", lo, hi)
+    while pos != -1:
+        end = pos
+        while end < hi and text[end] == "`":
+            end += 1
+        runs.setdefault(end - pos, []).append(pos)
+        pos = text.find("`", end, hi)
+    run_next = dict.fromkeys(runs, 0)
+    found = {"]": None, ")": None}  # next ']' / ')' at or after the last search start (-1: none)
+
+    def next_of(ch: str, start: int) -> int:
+        at = found[ch]
+        if at is None or at != -1 and at < start:
+            at = found[ch] = text.find(ch, start, hi)
+        return at
+
+    i = lo
+    while i < hi:
+        m = _INLINE_SPECIALS.search(text, i, hi)
+        if m is None:
+            break
+        i = m.start()
+        ch = text[i]
+        if ch == "`":
+            end = i
+            while end < hi and text[end] == "`":
+                end += 1
+            starts, k = runs[end - i], run_next[end - i]
+            while k < len(starts) and starts[k] <= i:
+                k += 1
+            run_next[end - i] = k
+            if k == len(starts):  # no closing run: the backticks are literal
+                i = end
+                continue
+            close = starts[k]
+            code = text[end:close]
+            # `` ` `` style: one padding space each side is dropped (single backticks keep it)
+            if end - i > 1 and len(code) > 2 and code[0] == " " and code[-1] == " " and code.strip(" "):
+                code = code[1:-1]
+            tokens.append(_xml_escape(text[plain:i]))
+            tokens.append(f'<font face="{code_font}" color="#c53030">{_xml_escape(code)}</font>')
+            i = plain = close + (end - i)
+        elif ch == "[":
+            close = next_of("]", i + 1)
+            if close > i + 1 and close + 1 < hi and text[close + 1] == "(":
+                paren = next_of(")", close + 2)
+                if paren > close + 2:
+                    tokens.append(_xml_escape(text[plain:i]))
+                    label = _match_emphasis(_inline_tokens(text, i + 1, close, code_font))
+                    url = text[close + 2:paren]
+                    if url.startswith("#"):  # internal anchors become plain bold text
+                        tokens.append(f"<b>{label}</b>")
+                    else:
+                        href = _xml_escape(url).replace('"', "&quot;")
+                        tokens.append(f'<a href="{href}" color="blue"><u>{label}</u></a>')
+                    i = plain = paren + 1
+                    continue
+            i += 1
+        else:
+            end = i
+            while end < hi and text[end] == "*":
+                end += 1
+            before = text[i - 1] if i > lo else " "
+            after = text[end] if end < hi else " "
+            tokens.append(_xml_escape(text[plain:i]))
+            tokens.append(_Delimiter(end - i, not after.isspace(), not before.isspace()))
+            i = plain = end
+    tokens.append(_xml_escape(text[plain:hi]))
+    return tokens
+
+
+def _match_emphasis(tokens: list) -> str:
+    """Pair '*' delimiters innermost-first on a stack (linear) and join the tokens.
+
+    A run closes the nearest open run before it: three stars each side make <b><i>, two <b>,
+    one <i>; leftover stars stay literal. Tags therefore always nest.
+    """
+    stack = []
+    for token in tokens:
+        if token.__class__ is not _Delimiter:
+            continue
+        if token.can_close:
+            while token.count and stack:
+                opener = stack[-1]
+                use = min(opener.count, token.count, 3)
+                if use == 3 and (opener.count > 3 or token.count > 3):
+                    use = 2
+                open_tag, close_tag = _EMPHASIS_TAGS[use]
+                opener.opens.append(open_tag)
+                token.closes.append(close_tag)
+                opener.count -= use
+                token.count -= use
+                if not opener.count:
+                    stack.pop()
+        if token.count and token.can_open:
+            stack.append(token)
+    return "".join(map(str, tokens))
 
-    # Bold+italic (***), then bold (**), then italic (*)
-    text = re.sub(r"\*\*\*(.+?)\*\*\*", r"<b><i>\1</i></b>", text)
-    text = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", text)
-    text = re.sub(r"\*(.+?)\*", r"<i>\1</i>", text)
 
-    # Inline code -- monospace bold in red
-    text = re.sub(r"`(.+?)`", rf'<font face="{code_font}" color="#c53030">\1</font>', text)
+def safe_xml(text: str, code_font: str = "Courier-Bold") -> str:
+    """Escape XML-unsafe chars, apply inline Markdown markup.
 
-    return text
+    Handles: **bold**, *italic*, ***bold italic***, `inline code`, [links](url). One linear
+    scan (see _inline_tokens): long lines full of unmatched '*', '`' or '[' cost no more than
+    plain text, code spans keep their '*' literal, and emphasis works inside link text.
+    Internal anchors (#...) become plain bold text; external URLs become <a> tags.
+    Args:
+        code_font: font face for inline `code` spans (default: Courier-Bold).
+    """
+    if _INLINE_SPECIALS.search(text) is None:
+        return _xml_escape(text)
+    return _match_emphasis(_inline_tokens(text, 0, len(text), code_font))
 
 
 def parse_md_table(lines: list) -> list:
@@ -368,6 +1817,77 @@ def parse_md_table(lines: list) -> list:
     return rows
 
 
+def inline_markup(text: str, style, code_font: str = "Courier-Bold", fallback=None) -> str:
+    """Paragraph markup for inline Markdown: safe_xml, then fallback fonts for the style's face.
+
+    Memoized in the fragment cache, so repeated cells and labels are marked up once.
+    """
+    key = (text, style.fontName, code_font, fallback)
+    markup = _fragments.get(key)
+    if markup is None:
+        markup = safe_xml(text, code_font)
+        if fallback is not None:
+            markup = fallback.apply(markup, style.fontName)
+        _fragments.put(key, markup)
+    return markup
+
+
+def table_markups(rows: list, styles, code_font: str = "Courier-Bold", fallback=None) -> tuple:
+    """Cell markup per row, short rows padded with empty cells, the first row as header."""
+    num_cols = max(len(r) for r in rows)
+    header_style, cell_style = styles["TableHeaderCell"], styles["TableCell"]
+    return tuple(tuple(inline_markup(cell, header_style if ri == 0 else cell_style, code_font, fallback)
+                       for cell in list(row) + [""] * (num_cols - len(row)))
+                 for ri, row in enumerate(rows))
+
+
+# ---------------------------------------------------------------------------
+# Reportlab engine -- paragraph fragment cache (parsed markup, kept across renders)
+# ---------------------------------------------------------------------------
+
+# Set by render_reportlab: [hits, misses] of paragraph() during its story phase.
+_fragment_counts: ContextVar = ContextVar("md_to_pdf_fragment_counts", default=None)
+
+
+class FragmentCache(LRUCache):
+    """Inline markup and parsed reportlab paragraph fragments, least recently used dropped first.
+
+    Paragraph(markup, style) runs reportlab's XML parser every time, while status cells,
+    labels and list items repeat within a document and across renders. paragraph() parses a
+    (markup, style) pair once and builds later Paragraphs from the stored fragments, and
+    inline_markup() keeps its results here too. Layout mutates fragments in place (breakLines
+    tags them, text transforms rewrite their text), so the cache keeps its own copies and
+    every Paragraph gets fresh clones. Keys hold their style and fallback objects, so an
+    entry never matches a new object that reuses an id.
+    """
+
+    MAX_ENTRIES = 4096
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        super().__init__(max_entries)
+
+    def paragraph(self, markup: str, style):
+        """Paragraph(markup, style), parsed only the first time the pair is seen."""
+        from reportlab.platypus import Paragraph
+
+        key = (markup, style)
+        entry = self.get(key)
+        hit = entry is not None
+        counts = _fragment_counts.get()
+        if counts is not None:
+            counts[0 if hit else 1] += 1
+        if hit:
+            return Paragraph(entry[0], style, frags=[f.clone() for f in entry[1]])
+        para = Paragraph(markup, style)
+        # <para> attributes and <bullet> tags change the style or bullet; those are parsed each time
+        if para.style is style and para.bulletText is getattr(style, "bulletText", None):
+            self.put(key, (para.text, tuple(f.clone() for f in para.frags)))
+        return para
+
+
+_fragments = FragmentCache()
+
+
 # ---------------------------------------------------------------------------
 # Reportlab engine -- styles
 # ---------------------------------------------------------------------------
@@ -388,22 +1908,22 @@ def build_styles(font_info: dict, config: dict):
         leading=body_sz * 1.35, textColor=clr["text"], spaceAfter=4,
     ))
     ss.add(ParagraphStyle(
-        name="H1", fontName=f["bold"], fontSize=typo.get("h1_size", 18),
+        name="H1", fontName=f.get("heading", f["bold"]), fontSize=typo.get("h1_size", 18),
         leading=22, textColor=clr["primary"], alignment=TA_CENTER,
         spaceAfter=6, spaceBefore=0,
     ))
     ss.add(ParagraphStyle(
-        name="H2", fontName=f["bold"], fontSize=typo.get("h2_size", 14),
+        name="H2", fontName=f.get("heading", f["bold"]), fontSize=typo.get("h2_size", 14),
         leading=18, textColor=clr["primary"], alignment=TA_LEFT,
         spaceAfter=6, spaceBefore=14,
     ))
     ss.add(ParagraphStyle(
-        name="H3", fontName=f["bold"], fontSize=typo.get("h3_size", 12),
+        name="H3", fontName=f.get("heading", f["bold"]), fontSize=typo.get("h3_size", 12),
         leading=15, textColor=clr["secondary"], alignment=TA_LEFT,
         spaceAfter=4, spaceBefore=10,
     ))
     ss.add(ParagraphStyle(
-        name="H4", fontName=f["bold"], fontSize=typo.get("h4_size", 10),
+        name="H4", fontName=f.get("heading", f["bold"]), fontSize=typo.get("h4_size", 10),
         leading=13, textColor=clr["primary"], alignment=TA_LEFT,
         spaceAfter=4, spaceBefore=8,
     ))
@@ -441,7 +1961,7 @@ def build_styles(font_info: dict, config: dict):
         leftIndent=20, firstLineIndent=-14, spaceAfter=3,
     ))
     ss.add(ParagraphStyle(
-        name="CodeBlock", fontName="Courier", fontSize=config.get("code", {}).get("font_size", 7.5),
+        name="CodeBlock", fontName=f.get("code", "Courier"), fontSize=config.get("code", {}).get("font_size", 7.5),
         leading=10, textColor=clr["text"], leftIndent=6,
         spaceAfter=2, spaceBefore=2,
     ))
@@ -453,10 +1973,53 @@ def build_styles(font_info: dict, config: dict):
 # Reportlab engine -- table builder
 # ---------------------------------------------------------------------------
 
-def build_table(rows: list, styles, font_info: dict, clr: dict, available_width: float):
-    """Build a reportlab Table from parsed MD rows with auto column widths."""
+def build_table_styles(font_info: dict, clr: dict) -> dict:
+    """TableStyles for tables, blockquotes and code blocks -- none depends on the content."""
     from reportlab.lib import colors as rlc
-    from reportlab.platypus import Table, TableStyle, Paragraph
+    from reportlab.platypus import TableStyle
+
+    return {
+        "table": TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), clr["header_bg"]),
+            ("TEXTCOLOR", (0, 0), (-1, 0), clr["header_fg"]),
+            ("FONTNAME", (0, 0), (-1, 0), font_info["bold"]),
+            ("FONTSIZE", (0, 0), (-1, 0), 8),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("TOPPADDING", (0, 0), (-1, -1), 3),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+            ("LEFTPADDING", (0, 0), (-1, -1), 4),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+            ("GRID", (0, 0), (-1, -1), 0.5, rlc.HexColor("#c0c0c0")),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [rlc.white, clr["light_bg"]]),
+        ]),
+        "blockquote": TableStyle([
+            ("BACKGROUND", (0, 0), (0, 0), clr["border"]),
+            ("BACKGROUND", (1, 0), (1, 0), clr["quote_bg"]),
+            ("TOPPADDING", (0, 0), (-1, -1), 4),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+            ("LEFTPADDING", (0, 0), (0, 0), 0),
+            ("RIGHTPADDING", (0, 0), (0, 0), 0),
+            ("LEFTPADDING", (1, 0), (1, 0), 6),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]),
+        "code": TableStyle([
+            ("BACKGROUND", (0, 0), (0, 0), clr["code_bg"]),
+            ("TOPPADDING", (0, 0), (-1, -1), 6),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+            ("LEFTPADDING", (0, 0), (-1, -1), 8),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 8),
+            ("BOX", (0, 0), (-1, -1), 0.5, rlc.HexColor("#d0d0d0")),
+        ]),
+    }
+
+
+def build_table(rows: list, styles, font_info: dict, clr: dict, available_width: float,
+                table_style=None, fallback=None, markups=None):
+    """Build a reportlab Table from parsed MD rows with auto column widths.
+
+    markups: the cells' paragraph markup (block_markups), when already prepared.
+    """
+    from reportlab.platypus import Table
 
     if not rows:
         return None
@@ -469,14 +2032,10 @@ def build_table(rows: list, styles, font_info: dict, clr: dict, available_width:
     header_style = styles["TableHeaderCell"]
     cell_style = styles["TableCell"]
 
-    data = []
-    for ri, row in enumerate(rows):
-        prow = []
-        for cell in row:
-            cell_text = safe_xml(cell)
-            st = header_style if ri == 0 else cell_style
-            prow.append(Paragraph(cell_text, st))
-        data.append(prow)
+    if markups is None:
+        markups = table_markups(rows, styles, font_info.get("codeBold", "Courier-Bold"), fallback)
+    data = [[_fragments.paragraph(markup, header_style if ri == 0 else cell_style) for markup in row]
+            for ri, row in enumerate(markups)]
 
     # Auto column widths based on content length
     col_weights = [0.0] * num_cols
@@ -490,19 +2049,7 @@ def build_table(rows: list, styles, font_info: dict, clr: dict, available_width:
     col_widths = [(r / ratio_sum) * available_width for r in col_ratios]
 
     table = Table(data, colWidths=col_widths, repeatRows=1)
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), clr["header_bg"]),
-        ("TEXTCOLOR", (0, 0), (-1, 0), clr["header_fg"]),
-        ("FONTNAME", (0, 0), (-1, 0), font_info["bold"]),
-        ("FONTSIZE", (0, 0), (-1, 0), 8),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("TOPPADDING", (0, 0), (-1, -1), 3),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
-        ("LEFTPADDING", (0, 0), (-1, -1), 4),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 4),
-        ("GRID", (0, 0), (-1, -1), 0.5, rlc.HexColor("#c0c0c0")),
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [rlc.white, clr["light_bg"]]),
-    ]))
+    table.setStyle(table_style or build_table_styles(font_info, clr)["table"])
     return table
 
 
@@ -510,26 +2057,20 @@ def build_table(rows: list, styles, font_info: dict, clr: dict, available_width:
 # Reportlab engine -- blockquote builder
 # ---------------------------------------------------------------------------
 
-def build_blockquote(text: str, styles, clr: dict, available_width: float):
-    """Build a blockquote as a table with a left blue border."""
-    from reportlab.platypus import Table, TableStyle, Paragraph
+def build_blockquote(text: str, styles, clr: dict, available_width: float, table_style=None,
+                     code_font: str = "Courier-Bold", fallback=None, markup=None):
+    """Build a blockquote as a table with a left blue border (markup: prepared cell markup)."""
+    from reportlab.platypus import Table
 
-    cell_text = safe_xml(text)
-    para = Paragraph(cell_text, styles["Blockquote"])
+    if markup is None:
+        markup = inline_markup(text, styles["Blockquote"], code_font, fallback)
+    para = _fragments.paragraph(markup, styles["Blockquote"])
 
     data = [[" ", para]]
     col_widths = [3, available_width - 10]
     t = Table(data, colWidths=col_widths)
-    t.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (0, 0), clr["border"]),
-        ("BACKGROUND", (1, 0), (1, 0), clr["quote_bg"]),
-        ("TOPPADDING", (0, 0), (-1, -1), 4),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-        ("LEFTPADDING", (0, 0), (0, 0), 0),
-        ("RIGHTPADDING", (0, 0), (0, 0), 0),
-        ("LEFTPADDING", (1, 0), (1, 0), 6),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-    ]))
+    # blockquote/code styles only read colors, so any font mapping builds them
+    t.setStyle(table_style or build_table_styles({"bold": "Helvetica-Bold"}, clr)["blockquote"])
     return t
 
 
@@ -537,26 +2078,26 @@ def build_blockquote(text: str, styles, clr: dict, available_width: float):
 # Reportlab engine -- code block builder
 # ---------------------------------------------------------------------------
 
-def build_code_block(text: str, styles, clr: dict, available_width: float):
-    """Build a code block with gray background."""
-    from reportlab.lib import colors as rlc
-    from reportlab.platypus import Table, TableStyle, Paragraph
+def code_markup(text: str, style, fallback=None) -> str:
+    """Paragraph markup for a code block: escaped, fallback fonts applied, lines as <br/>."""
+    text = _xml_escape(text)
+    if fallback is not None:
+        text = fallback.apply(text, style.fontName)
+    return text.replace("\n", "<br/>")
+
+
+def build_code_block(text: str, styles, clr: dict, available_width: float, table_style=None,
+                     fallback=None, markup=None):
+    """Build a code block with gray background (markup: prepared code_markup)."""
+    from reportlab.platypus import Table
 
-    text = text.replace("&", "&amp;")
-    text = text.replace("<", "&lt;").replace(">", "&gt;")
-    text = text.replace("\n", "<br/>")
-    para = Paragraph(text, styles["CodeBlock"])
+    if markup is None:
+        markup = code_markup(text, styles["CodeBlock"], fallback)
+    para = _fragments.paragraph(markup, styles["CodeBlock"])
 
     data = [[para]]
     t = Table(data, colWidths=[available_width])
-    t.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (0, 0), clr["code_bg"]),
-        ("TOPPADDING", (0, 0), (-1, -1), 6),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-        ("LEFTPADDING", (0, 0), (-1, -1), 8),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 8),
-        ("BOX", (0, 0), (-1, -1), 0.5, rlc.HexColor("#d0d0d0")),
-    ]))
+    t.setStyle(table_style or build_table_styles({"bold": "Helvetica-Bold"}, clr)["code"])
     return t
 
 
@@ -577,9 +2118,10 @@ def _try_build_image(alt: str, src: str, available_width: float, base_dir: Path)
     if src.startswith("http://") or src.startswith("https://"):
         warn(f"image not rendered: {label} -- remote sources are not fetched")
         return None
-    img_path = Path(src)
-    if not img_path.is_absolute() and not img_path.exists():
-        img_path = base_dir / src
+    img_path = _resolve_image(src, base_dir)
+    if img_path is None:
+        warn(f"image not rendered: {label} -- outside the image root")
+        return None
     if not img_path.exists():
         warn(f"image not rendered: {label} -- file not found")
         return None
@@ -639,97 +2181,138 @@ def _make_numbered_canvas_class(font_name: str, footer_fmt: str, page_width: flo
 
 
 # ---------------------------------------------------------------------------
-# Reportlab engine -- markdown to story (flowables)
+# Reportlab engine -- block tokenizer (Markdown lines to a compact block AST)
 # ---------------------------------------------------------------------------
 
-def md_to_story(md_text: str, styles, font_info: dict, clr: dict,
-                available_width: float, base_dir: Path) -> list:
-    """Parse markdown text and return a list of reportlab flowables."""
-    from reportlab.lib import colors as rlc
-    from reportlab.platypus import Paragraph, Spacer
-    from reportlab.platypus.flowables import HRFlowable
+class Block:
+    """A top-level Markdown block. Subclasses list their fields in __slots__; blocks compare
+    and pickle by those fields, so a parsed document can be cached or shipped to a worker."""
 
-    lines = md_text.split("\n")
-    story = []
-    i = 0
+    __slots__ = ()
 
-    while i < len(lines):
-        line = lines[i]
-        stripped = line.strip()
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
 
-        if not stripped:
-            i += 1
-            continue
+    def __eq__(self, other):
+        return type(other) is type(self) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
 
-        # Fenced code block
-        if stripped.startswith("```"):
-            code_lines = []
-            i += 1
-            while i < len(lines):
-                if lines[i].strip().startswith("```"):
-                    i += 1
-                    break
-                code_lines.append(lines[i].rstrip())
-                i += 1
-            story.append(build_code_block("\n".join(code_lines), styles, clr, available_width))
-            story.append(Spacer(1, 4))
-            continue
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(repr(getattr(self, n)) for n in self.__slots__)})"
 
-        # Image ![alt](path)
-        img_match = re.match(r"^!\[([^\]]*)\]\(([^)]+)\)$", stripped)
-        if img_match:
-            alt, src = img_match.group(1), img_match.group(2)
-            img = _try_build_image(alt, src, available_width, base_dir)
-            if img:
-                story.append(Spacer(1, 4))
-                story.append(img)
-                story.append(Spacer(1, 4))
-            i += 1
-            continue
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
 
-        # Horizontal rule
-        if stripped in ("---", "***", "___"):
-            story.append(Spacer(1, 4))
-            story.append(HRFlowable(
-                width="100%", thickness=0.5,
-                color=rlc.HexColor("#cccccc"), spaceAfter=4, spaceBefore=4,
-            ))
-            i += 1
-            continue
+    def __setstate__(self, state):
+        self.__init__(*state)
 
-        # H1
-        if stripped.startswith("# ") and not stripped.startswith("## "):
-            story.append(Spacer(1, 20))
-            story.append(Paragraph(safe_xml(stripped[2:].strip()), styles["H1"]))
-            i += 1
+
+class HeadingBlock(Block):
+    __slots__ = ("level", "text")  # level 1-4; text: raw inline Markdown
+
+
+class ParagraphBlock(Block):
+    __slots__ = ("text",)  # one source line (the reportlab engine does not join lines)
+
+
+class ListBlock(Block):
+    # (marker, text) per item: "-" bullet, "[ ]"/"[x]" task, "<n>." numbered
+    __slots__ = ("items",)
+
+
+class TableBlock(Block):
+    __slots__ = ("rows",)  # parse_md_table() rows, header first, separator rows dropped
+
+
+class CodeBlock(Block):
+    __slots__ = ("text", "lang")  # lang: the fence info string, "" when absent
+
+
+class QuoteBlock(Block):
+    __slots__ = ("text",)  # the quoted lines joined with spaces
+
+
+class ImageBlock(Block):
+    __slots__ = ("alt", "src")
+
+
+class RuleBlock(Block):
+    __slots__ = ()
+
+
+_IMAGE_LINE_RE = re.compile(r"^!\[([^\]]*)\]\(([^)]+)\)$")
+_NUMBERED_RE = re.compile(r"^(\d+)\.\s+(.+)$")
+_HEADING_PREFIXES = ((1, "# "), (2, "## "), (3, "### "), (4, "#### "))
+_TASK_MARKERS = {"- [ ] ": "[ ]", "- [x] ": "[x]", "- [X] ": "[x]"}
+
+
+def _list_item(stripped: str):
+    """(marker, text) when the stripped line is a list item, else None."""
+    if stripped[0] == "-":
+        marker = _TASK_MARKERS.get(stripped[:6])
+        if marker is not None:
+            return marker, stripped[6:].strip()
+    elif stripped[0] != "*":
+        m = _NUMBERED_RE.match(stripped)
+        return (m.group(1) + ".", m.group(2)) if m else None
+    if stripped[1:2] == " ":
+        return "-", stripped[2:].strip()
+    return None
+
+
+def parse_blocks(md_text: str) -> list:
+    """Tokenize Markdown into Block nodes in one pass over the lines.
+
+    Each line is stripped once and dispatched on its first character; only "!" (images) and
+    digits (numbered items) reach a regex. The grammar is the reportlab engine's subset:
+    fenced code, images on their own line, rules, H1-H4, blockquotes, pipe tables, bullet,
+    task and numbered items, and one paragraph per remaining line.
+    """
+    lines = md_text.split("\n")
+    blocks = []
+    n = len(lines)
+    i = 0
+    while i < n:
+        stripped = lines[i].strip()
+        i += 1
+        if not stripped:
             continue
+        first = stripped[0]
 
-        # H2
-        if stripped.startswith("## ") and not stripped.startswith("### "):
-            story.append(Paragraph(safe_xml(stripped[3:].strip()), styles["H2"]))
-            story.append(HRFlowable(
-                width="100%", thickness=0.8,
-                color=clr["primary"], spaceAfter=6, spaceBefore=1,
-            ))
-            i += 1
+        if first == "`" and stripped.startswith("```"):
+            code_lines = []
+            while i < n:
+                line = lines[i]
+                i += 1
+                if line.strip().startswith("```"):
+                    break
+                code_lines.append(line.rstrip())
+            blocks.append(CodeBlock("\n".join(code_lines), stripped.lstrip("`").strip()))
             continue
 
-        # H3
-        if stripped.startswith("### ") and not stripped.startswith("#### "):
-            story.append(Paragraph(safe_xml(stripped[4:].strip()), styles["H3"]))
-            i += 1
+        if first == "!":
+            m = _IMAGE_LINE_RE.match(stripped)
+            if m:
+                blocks.append(ImageBlock(m.group(1), m.group(2)))
+                continue
+
+        elif first in "-*_" and stripped in ("---", "***", "___"):
+            blocks.append(RuleBlock())
             continue
 
-        # H4
-        if stripped.startswith("#### "):
-            story.append(Paragraph(safe_xml(stripped[5:].strip()), styles["H4"]))
-            i += 1
+        elif first == "#":
+            for level, prefix in _HEADING_PREFIXES:
+                if stripped.startswith(prefix):
+                    blocks.append(HeadingBlock(level, stripped[level + 1:].strip()))
+                    break
+            else:
+                blocks.append(ParagraphBlock(stripped))
             continue
 
-        # Blockquote
-        if stripped.startswith("> ") or stripped == ">":
-            quote_lines = []
-            while i < len(lines):
+        elif first == ">" and (stripped == ">" or stripped[1] == " "):
+            quote_lines = [stripped[2:]]
+            while i < n:
                 s = lines[i].strip()
                 if s.startswith("> "):
                     quote_lines.append(s[2:])
@@ -738,65 +2321,321 @@ def md_to_story(md_text: str, styles, font_info: dict, clr: dict,
                 else:
                     break
                 i += 1
-            story.append(build_blockquote(" ".join(quote_lines), styles, clr, available_width))
-            story.append(Spacer(1, 4))
+            blocks.append(QuoteBlock(" ".join(quote_lines)))
             continue
 
-        # Table
-        if stripped.startswith("|"):
-            table_lines = []
-            while i < len(lines):
+        elif first == "|":
+            table_lines = [stripped]
+            while i < n:
                 s = lines[i].strip()
-                if s.startswith("|"):
-                    table_lines.append(s)
-                    i += 1
-                else:
+                if not s.startswith("|"):
                     break
+                table_lines.append(s)
+                i += 1
             rows = parse_md_table(table_lines)
             if rows:
-                t = build_table(rows, styles, font_info, clr, available_width)
-                if t:
-                    story.append(t)
-                    story.append(Spacer(1, 6))
+                blocks.append(TableBlock(rows))
             continue
 
-        # Checkbox items
-        if stripped.startswith("- [ ] ") or stripped.startswith("- [x] ") or stripped.startswith("- [X] "):
-            text = stripped[6:].strip()
-            marker = "\u2610 " if stripped.startswith("- [ ]") else "\u2611 "
-            story.append(Paragraph(marker + safe_xml(text), styles["BulletItem"]))
-            i += 1
-            continue
+        if first in "-*" or first.isdigit():
+            item = _list_item(stripped)
+            if item is not None:
+                items = [item]
+                while i < n:
+                    s = lines[i].strip()
+                    item = _list_item(s) if s and s not in ("---", "***") else None
+                    if item is None:
+                        break
+                    items.append(item)
+                    i += 1
+                blocks.append(ListBlock(items))
+                continue
 
-        # Numbered list
-        m_num = re.match(r"^(\d+)\.\s+(.+)$", stripped)
-        if m_num:
-            story.append(Paragraph(
-                f"<b>{m_num.group(1)}.</b> " + safe_xml(m_num.group(2)),
-                styles["NumberedItem"],
-            ))
-            i += 1
-            continue
+        blocks.append(ParagraphBlock(stripped))
+    return blocks
 
-        # Bullet list
-        if stripped.startswith("- ") or stripped.startswith("* "):
-            story.append(Paragraph(
-                "\u2022 " + safe_xml(stripped[2:].strip()),
-                styles["BulletItem"],
-            ))
-            i += 1
-            continue
 
-        # Bold-colon lines (**Label:** value) -- render with bold styling
-        if stripped.startswith("**") and ":" in stripped:
-            text = safe_xml(stripped)
-            story.append(Paragraph(text, styles["Normal"]))
-            i += 1
+# ---------------------------------------------------------------------------
+# Block cache -- per-chunk parse results keyed by content hash, kept across renders
+# ---------------------------------------------------------------------------
+
+_BLOCK_CACHE_VERSION = 1
+
+
+def block_cache_dir():
+    """$MD_TO_PDF_BLOCK_CACHE when set (persisting parsed blocks is opt-in); None when unset or "off"."""
+    if not os.environ.get("MD_TO_PDF_BLOCK_CACHE"):
+        return None
+    return _user_cache_dir("MD_TO_PDF_BLOCK_CACHE", "blocks")
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Hold an exclusive flock on path (created if missing); a no-op without fcntl."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, "a+b") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def split_blocks(md_text: str) -> list:
+    """Top-level chunks of Markdown: runs of non-blank lines, with ``` fences kept whole.
+
+    parse_blocks() never carries state across a blank line outside a fence, so parsing
+    each chunk on its own gives the blocks of the whole text; an edit re-parses only the
+    chunks it touches.
+    """
+    chunks, current, fenced = [], [], False
+    for line in md_text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            fenced = not fenced
+        elif not stripped and not fenced:
+            if current:
+                chunks.append("\n".join(current))
+                current = []
             continue
+        current.append(line)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
 
-        # Plain text
-        story.append(Paragraph(safe_xml(stripped), styles["Normal"]))
-        i += 1
+
+class BlockCache(LRUCache):
+    """Results per chunk of Markdown, keyed by a hash of the chunk (and whatever else the
+    result depends on), least recently used dropped first.
+
+    Entries live in memory for the process. With a block_cache_dir() (opt-in), each named
+    cache is also one pickle there: read on first use, and merged back by save_all() when
+    the process that opened it exits, so a render itself never writes to disk. The file is
+    discarded when the script changes.
+    """
+
+    _caches = {}  # name -> BlockCache
+    _LOCK = threading.Lock()
+    _owner_pid = None  # the process whose exit flushes the persistent caches
+    MAX_ENTRIES = 4096
+
+    def __init__(self, path=None):
+        super().__init__(self.MAX_ENTRIES)
+        self.path = path
+        self.dirty = False
+        if path is not None:
+            self.entries = self._load(path)
+
+    @staticmethod
+    def _load(path: Path) -> dict:
+        import pickle
+
+        try:
+            with open(path, "rb") as fh:
+                version, digest, entries = pickle.load(fh)
+            if version == _BLOCK_CACHE_VERSION and digest == _script_digest():
+                return entries
+        except Exception:  # missing, truncated or from another version: start empty
+            pass
+        return {}
+
+    @classmethod
+    def of(cls, name: str) -> "BlockCache":
+        """The process-wide cache for a name (e.g. one per render profile)."""
+        with cls._LOCK:
+            cache = cls._caches.get(name)
+            if cache is None:
+                directory = block_cache_dir()
+                cache = cls._caches[name] = cls(directory / f"{name}.pickle" if directory else None)
+                if directory is not None and cls._owner_pid is None:
+                    cls._owner_pid = os.getpid()
+                    atexit.register(cls.save_all)
+            return cache
+
+    @classmethod
+    def save_all(cls):
+        """save() every persistent cache; only in the process that opened them (not in forks)."""
+        if os.getpid() != cls._owner_pid:
+            return
+        with cls._LOCK:
+            caches = list(cls._caches.values())
+        for cache in caches:
+            cache.save()
+
+    @staticmethod
+    def key(*parts: str) -> bytes:
+        return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).digest()
+
+    def put(self, key: bytes, value):
+        super().put(key, value)
+        self.dirty = True
+
+    def save(self):
+        """Merge the entries into the file when any were added; an unwritable cache is skipped.
+
+        The file is re-read under a lock and this process's entries go in as the most recent,
+        so processes sharing the directory keep each other's chunks instead of the last
+        writer's only.
+        """
+        if self.path is None or not self.dirty:
+            return
+        import pickle
+
+        with self._lock:
+            snapshot, self.dirty = dict(self.entries), False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with _file_lock(self.path.with_suffix(".lock")):
+                merged = self._load(self.path)
+                for key in snapshot:
+                    merged.pop(key, None)
+                merged.update(snapshot)
+                while len(merged) > self.max_entries:
+                    merged.pop(next(iter(merged)))
+                with _atomic_write(self.path) as fh:
+                    pickle.dump((_BLOCK_CACHE_VERSION, _script_digest(), merged), fh, pickle.HIGHEST_PROTOCOL)
+        except Exception:  # unwritable, or an entry that does not pickle
+            pass
+
+
+def cached_blocks(md_text: str, profile: "RenderProfile") -> tuple:
+    """(blocks, markups) for a document, each chunk parsed and marked up once per profile.
+
+    markups[i] holds the paragraph markup of blocks[i] (see block_markups), with inline
+    Markdown, escaping and font fallback already applied. Chunks are looked up in the
+    profile's BlockCache; only new or edited chunks are parsed.
+    """
+    cache = BlockCache.of(profile.block_cache_name())
+    code_font = profile.font_info.get("codeBold", "Courier-Bold")
+    fallback = FontFallback.of(profile.font_info)
+    blocks, markups = [], []
+    for chunk in split_blocks(md_text):
+        key = BlockCache.key(chunk)
+        entry = cache.get(key)
+        if entry is None:
+            chunk_blocks = tuple(parse_blocks(chunk))
+            entry = (chunk_blocks, tuple(block_markups(b, profile.styles, code_font, fallback)
+                                         for b in chunk_blocks))
+            cache.put(key, entry)
+        blocks += entry[0]
+        markups += entry[1]
+    return blocks, markups
+
+
+# ---------------------------------------------------------------------------
+# Reportlab engine -- markdown to story (flowables)
+# ---------------------------------------------------------------------------
+
+def md_to_story(md_text: str, styles, font_info: dict, clr: dict,
+                available_width: float, base_dir: Path, table_styles=None) -> list:
+    """Parse markdown text and return a list of reportlab flowables.
+
+    table_styles: build_table_styles() output, when the caller (a RenderProfile) has it already.
+    """
+    return blocks_to_story(parse_blocks(md_text), styles, font_info, clr, available_width, base_dir,
+                           table_styles)
+
+
+_LIST_MARKERS = {"-": "\u2022 ", "[ ]": "\u2610 ", "[x]": "\u2611 "}
+
+
+def block_markups(block, styles, code_font: str = "Courier-Bold", fallback=None) -> tuple:
+    """The paragraph markup a block renders, in order: one string per heading, paragraph,
+    quote and code block, one per list item, one tuple of cells per table row."""
+    kind = type(block)
+    if kind is ParagraphBlock:
+        return (inline_markup(block.text, styles["Normal"], code_font, fallback),)
+    if kind is ListBlock:
+        items = []
+        for marker, text in block.items:
+            prefix, style = ((_LIST_MARKERS[marker], styles["BulletItem"]) if marker in _LIST_MARKERS
+                             else (f"<b>{marker}</b> ", styles["NumberedItem"]))
+            markup = prefix + safe_xml(text, code_font)  # the marker glyph may need a fallback too
+            items.append(markup if fallback is None else fallback.apply(markup, style.fontName))
+        return tuple(items)
+    if kind is HeadingBlock:
+        return (inline_markup(block.text, styles[f"H{block.level}"], code_font, fallback),)
+    if kind is CodeBlock:
+        return (code_markup(block.text, styles["CodeBlock"], fallback),)
+    if kind is TableBlock:
+        return table_markups(block.rows, styles, code_font, fallback)
+    if kind is QuoteBlock:
+        return (inline_markup(block.text, styles["Blockquote"], code_font, fallback),)
+    return ()
+
+
+def blocks_to_story(blocks: list, styles, font_info: dict, clr: dict,
+                    available_width: float, base_dir: Path, table_styles=None, markups=None) -> list:
+    """Turn parse_blocks() output into reportlab flowables (the blocks are not modified).
+
+    markups: block_markups() per block, e.g. from cached_blocks(); computed here when None.
+    """
+    from reportlab.lib import colors as rlc
+    from reportlab.platypus import Spacer
+    from reportlab.platypus.flowables import HRFlowable
+
+    table_styles = table_styles or build_table_styles(font_info, clr)
+    code_font = font_info.get("codeBold", "Courier-Bold")
+    fallback = FontFallback.of(font_info)
+
+    story = []
+    for bi, block in enumerate(blocks):
+        kind = type(block)
+        markup = markups[bi] if markups is not None else block_markups(block, styles, code_font, fallback)
+
+        if kind is ParagraphBlock:
+            story.append(_fragments.paragraph(markup[0], styles["Normal"]))
+
+        elif kind is ListBlock:
+            for (marker, _), item in zip(block.items, markup):
+                story.append(_fragments.paragraph(
+                    item, styles["BulletItem" if marker in _LIST_MARKERS else "NumberedItem"]))
+
+        elif kind is HeadingBlock:
+            if block.level == 1:
+                story.append(Spacer(1, 20))
+            story.append(_fragments.paragraph(markup[0], styles[f"H{block.level}"]))
+            if block.level == 2:
+                story.append(HRFlowable(
+                    width="100%", thickness=0.8,
+                    color=clr["primary"], spaceAfter=6, spaceBefore=1,
+                ))
+
+        elif kind is CodeBlock:
+            story.append(build_code_block(block.text, styles, clr, available_width,
+                                          table_styles["code"], fallback, markup[0]))
+            story.append(Spacer(1, 4))
+
+        elif kind is TableBlock:
+            # build_table pads short rows in place; the block may be cached and rendered again
+            t = build_table([list(row) for row in block.rows], styles, font_info, clr, available_width,
+                            table_styles["table"], fallback, markup)
+            if t:
+                story.append(t)
+                story.append(Spacer(1, 6))
+
+        elif kind is QuoteBlock:
+            story.append(build_blockquote(block.text, styles, clr, available_width,
+                                          table_styles["blockquote"], code_font, fallback, markup[0]))
+            story.append(Spacer(1, 4))
+
+        elif kind is ImageBlock:
+            img = _try_build_image(block.alt, block.src, available_width, base_dir)
+            if img:
+                story.append(Spacer(1, 4))
+                story.append(img)
+                story.append(Spacer(1, 4))
+
+        elif kind is RuleBlock:
+            story.append(Spacer(1, 4))
+            story.append(HRFlowable(
+                width="100%", thickness=0.5,
+                color=rlc.HexColor("#cccccc"), spaceAfter=4, spaceBefore=4,
+            ))
 
     return story
 
@@ -805,7 +2644,7 @@ def md_to_story(md_text: str, styles, font_info: dict, clr: dict,
 # Reportlab engine -- document builder
 # ---------------------------------------------------------------------------
 
-def build_document(output_path: str, config: dict):
+def build_document(target, config: dict):
     from reportlab.lib import pagesizes
     from reportlab.lib.units import mm
     from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate
@@ -819,7 +2658,7 @@ def build_document(output_path: str, config: dict):
     bottom = margins.get("bottom", 25) * mm
 
     doc = BaseDocTemplate(
-        output_path, pagesize=page_size,
+        target, pagesize=page_size,
         leftMargin=left, rightMargin=right,
         topMargin=top, bottomMargin=bottom,
     )
@@ -846,69 +2685,1683 @@ def build_document(output_path: str, config: dict):
 # Reportlab engine -- main conversion
 # ---------------------------------------------------------------------------
 
-def convert_reportlab(input_path: str, output_path: str, config: dict):
-    """Convert MD -> PDF via reportlab."""
+def convert_reportlab(input_path: str, output_path: str, config, timings=None) -> int:
+    """Convert MD -> PDF via reportlab (config: dict or RenderProfile). Returns the page count."""
+    md_text = Path(input_path).read_text(encoding="utf-8")
+    return render_reportlab(md_text, output_path, config, Path(input_path).resolve().parent,
+                            timings=timings)
+
+
+def render_reportlab(md_text: str, target, profile, base_dir: Path, timings=None) -> int:
+    """Render Markdown text into target (a path or a binary file object); returns the page count.
+
+    profile: a RenderProfile, or a merged config dict to look one up for.
+    """
     try:
         import_module("reportlab.platypus")  # availability probe; the builders do their own imports
-    except ImportError:
-        print_failure(f"reportlab is not installed.\n"
-                      f"Install with: bash {SCRIPT_DIR}/check_deps.sh install reportlab")
-        sys.exit(1)
+    except ImportError as exc:
+        raise RuntimeError(f"reportlab is not installed.\n"
+                           f"Install with: bash {SCRIPT_DIR}/check_deps.sh install reportlab") from exc
+
+    with _phase(timings, "setup"):
+        profile = RenderProfile.of(profile).prepare_reportlab()
+        doc, available_width, _ = build_document(target, profile.config)
+
+    with _phase(timings, "parse"):
+        # unchanged chunks come from the block cache, parsed and marked up already
+        blocks, markups = cached_blocks(md_text, profile)
+    counts = [0, 0]
+    token = _fragment_counts.set(counts)
+    try:
+        with _phase(timings, "story"):
+            story = blocks_to_story(blocks, profile.styles, profile.font_info, profile.colors,
+                                    available_width, Path(base_dir), profile.table_styles, markups)
+    finally:
+        _fragment_counts.reset(token)
+    if timings is not None:
+        timings["fragment_hits"], timings["fragment_misses"] = counts
+
+    canvas_cls = profile.canvas_cls
+    with _phase(timings, "layout"):
+        if canvas_cls is not None:
+            doc.build(story, canvasmaker=canvas_cls)
+        else:
+            doc.build(story)
 
-    font_info = detect_fonts()
-    register_detected_fonts(font_info)
+    try:
+        return doc.page
+    except Exception:
+        return 0
 
-    clr = _rl_colors(config)
-    styles = build_styles(font_info, config)
-    doc, available_width, page_width = build_document(output_path, config)
 
-    md_text = Path(input_path).read_text(encoding="utf-8")
-    story = md_to_story(md_text, styles, font_info, clr, available_width,
-                        Path(input_path).resolve().parent)
+# ---------------------------------------------------------------------------
+# Render profile -- everything derived from one merged config, built once
+# ---------------------------------------------------------------------------
 
-    footer_cfg = config.get("footer", {})
-    footer_fmt = footer_cfg.get("format", "Page {page} of {total}")
-    canvas_cls = _make_numbered_canvas_class(font_info["body"], footer_fmt, page_width)
+class RenderProfile:
+    """The per-config half of a render, shared by every document rendered with that config.
 
-    if footer_cfg.get("enabled", True):
-        doc.build(story, canvasmaker=canvas_cls)
-    else:
-        doc.build(story)
+    reportlab: detected fonts (registered once per process), colors, the paragraph
+    stylesheet, table styles and the footer canvas class. weasyprint: the override CSS, and
+    it plus the base stylesheet and each theme's pygments_css() compiled into weasyprint.CSS
+    objects sharing one FontConfiguration. Parts are built on first use by the engine that
+    needs them.
 
-    page_count = canvas_cls.__dict__.get("_page_count", 0)
-    # Fallback: read page count from built doc
-    if page_count == 0:
+    Profiles pickle (save/load) without the canvas class, which is a closure, and without
+    the compiled CSS; both are rebuilt on first use after a load, and fonts are
+    re-registered the first time a loaded profile renders. A profile remembers the fonts it
+    was built against (fonts_digest), so one outlived by a font change is never reused.
+    """
+
+    _cache = LRUCache(32)  # key -> profile; see of()
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.key = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+        self.version = _script_digest()
+        self.fonts = fonts_digest(config.get("fonts"))
+        self.font_info = self.colors = self.styles = self.table_styles = None
+        self.canvas_cls = None
+        self._registered = False
+        self._override_css = None
+        self._stylesheets = {}  # (base CSS path, theme) -> (base mtime, [weasyprint.CSS])
+        self._font_config = None
+
+    @classmethod
+    def of(cls, config) -> "RenderProfile":
+        """The cached profile for a merged config dict (a profile is returned as is).
+
+        A cached profile whose fonts have since been installed, removed or updated is
+        rebuilt, so daemon, HTTP and spool workers follow font changes.
+        """
+        if isinstance(config, RenderProfile):
+            return config
+        key = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+        profile = cls._cache.get(key)
+        if profile is None or profile.fonts != fonts_digest(config.get("fonts")):
+            profile = cls(deepcopy(config))
+            cls._cache.put(key, profile)
+        return profile
+
+    def prepare_reportlab(self) -> "RenderProfile":
+        if self.styles is None:
+            font_info = detect_fonts(self.config.get("fonts"))
+            self.colors = _rl_colors(self.config)
+            # a plain dict: StyleSheet1 does not survive pickling, and the builders only index it
+            self.styles = dict(build_styles(font_info, self.config).byName)
+            self.table_styles = build_table_styles(font_info, self.colors)
+            self.font_info = font_info
+        if not self._registered:
+            register_detected_fonts(self.font_info)
+            self._registered = True
+        footer = self.config.get("footer", {})
+        if self.canvas_cls is None and footer.get("enabled", True):
+            from reportlab.lib import pagesizes
+            page_width = getattr(pagesizes, _page_size_name(self.config).upper())[0]
+            self.canvas_cls = _make_numbered_canvas_class(
+                self.font_info["body"], footer.get("format", "Page {page} of {total}"), page_width)
+        return self
+
+    def block_cache_name(self) -> str:
+        """BlockCache name for this profile's reportlab markup: config, fonts and fallback chain."""
+        ident = json.dumps([self.key, self.font_info.get("_entries", ()), self.font_info.get("fallback", ())],
+                           default=str)
+        return "reportlab-" + hashlib.sha256(ident.encode("utf-8")).hexdigest()[:32]
+
+    @property
+    def override_css(self) -> str:
+        if self._override_css is None:
+            self._override_css = _weasyprint_override_css(self.config)
+        return self._override_css
+
+    def weasyprint_stylesheets(self, css_path=None, theme: str = "github") -> tuple:
+        """(stylesheets, font_config) for weasyprint's render(): the base stylesheet (css_path,
+        else default.css), the pygments theme and the config overrides as compiled
+        weasyprint.CSS objects, sharing one FontConfiguration.
+
+        Compiled once per base path and theme; an edited base stylesheet (newer mtime) is
+        compiled again. The sheets keep the cascade order of the <link>/<style> blocks they
+        replace.
+        """
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        css_file = Path(css_path) if css_path else DEFAULT_CSS_PATH
         try:
-            page_count = doc.page
+            css_file, mtime = css_file.resolve(), css_file.stat().st_mtime_ns
+        except OSError:  # no base stylesheet, as before
+            mtime = None
+        key = (str(css_file), theme)
+        cached = self._stylesheets.get(key)
+        if cached is None or cached[0] != mtime:
+            if self._font_config is None:
+                self._font_config = FontConfiguration()
+            font_config = self._font_config
+            sheets = [CSS(filename=str(css_file), font_config=font_config)] if mtime is not None else []
+            sheets.append(CSS(string=pygments_css(theme), font_config=font_config))
+            sheets.append(CSS(string=self.override_css, font_config=font_config))
+            cached = self._stylesheets[key] = (mtime, sheets)
+        return cached[1], self._font_config
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # compiled CSS and the font configuration hold native handles: rebuilt on first use
+        state.update(canvas_cls=None, _registered=False, _stylesheets={}, _font_config=None)
+        return state
+
+    def save(self, path):
+        import pickle
+
+        with _atomic_write(path) as fh:
+            pickle.dump(self, fh)
+
+    @classmethod
+    def load(cls, path):
+        """A saved profile, or None when it is unreadable, from another script version, or its fonts changed."""
+        import pickle
+
+        try:
+            with open(path, "rb") as fh:
+                profile = pickle.load(fh)
         except Exception:
-            page_count = 0
+            return None
+        if not isinstance(profile, cls) or profile.version != _script_digest():
+            return None
+        if profile.fonts != fonts_digest(profile.config.get("fonts")):
+            return None
+        return profile
+
+
+# ---------------------------------------------------------------------------
+# In-memory API -- Markdown text in, PDF bytes out (blocking and asyncio)
+# ---------------------------------------------------------------------------
+
+class RenderResult(NamedTuple):
+    pdf_bytes: bytes
+    pages: int
+    warnings: list
+    timings: dict  # phase -> ms: setup/parse/story/layout (reportlab), setup/parse/layout/write (weasyprint), total;
+    #                reportlab adds fragment_hits/fragment_misses, paragraphs built from cached fragments or parsed
+
+
+def render(md_text: str, config=None, engine: str = "reportlab", base_dir=None,
+           css_path=None, pygments_theme: str = "github") -> RenderResult:
+    """Render Markdown to PDF bytes without temp files.
+
+    config is deep-merged over the default style config, or is a RenderProfile used as is.
+    Relative image paths resolve
+    against base_dir (default: the working directory); those images are the only files
+    read besides the stylesheet and fonts. Raises ValueError for an unknown engine and
+    RuntimeError when the engine is not installed.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine: {engine}")
+    if isinstance(config, RenderProfile):
+        merged = config
+    else:
+        merged = _deep_merge(load_config(None), config) if config else load_config(None)
+    base = Path(base_dir or ".").resolve()
+    warnings, timings, buf = [], {}, io.BytesIO()
+    token = _warning_sink.set(warnings)
+    try:
+        with _phase(timings, "total"):
+            if engine == "weasyprint":
+                pages = render_weasyprint(md_text, buf, merged, base, css_path=css_path,
+                                          pygments_theme=pygments_theme, timings=timings)
+            else:
+                pages = render_reportlab(md_text, buf, merged, base, timings=timings)
+    finally:
+        _warning_sink.reset(token)
+    return RenderResult(buf.getvalue(), pages, warnings, timings)
 
-    print_status(output_path, page_count, "reportlab")
+
+def _reset_locks_in_child():
+    """Give a forked child fresh module locks.
+
+    fork() copies only the calling thread, so a lock another thread held at that moment
+    (font registration, a cache update) would stay locked in the child forever.
+    """
+    global _FONT_LOCK, _PYGMENTS_CSS_LOCK
+    _FONT_LOCK = threading.Lock()
+    _PYGMENTS_CSS_LOCK = threading.RLock()
+    BlockCache._LOCK = threading.Lock()
+    for cache in LRUCache._instances:
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_in_child)
+
+
+class AsyncRenderer:
+    """Await render() off the event loop, at most `limit` renders at a time.
+
+    mode="process" forks a child of this process per render; cancelling the awaiting task,
+    or the render running past `timeout` seconds (TimeoutError), kills that child at once.
+    mode="thread" renders in a thread pool sharing this process's font registry; there,
+    cancellation only drops renders that have not started and `timeout` is not applied.
+    Without os.fork (Windows) process mode falls back to threads.
+    """
+
+    def __init__(self, limit=None, mode: str = "process", timeout=600):
+        if mode not in ("process", "thread"):
+            raise ValueError(f"unknown mode: {mode}")
+        self.limit = max(1, limit or os.cpu_count() or 1)
+        self.mode = mode if hasattr(os, "fork") else "thread"
+        self.timeout = timeout
+        self._semaphore = self._loop = self._executor = None
+
+    async def render(self, md_text: str, **options) -> RenderResult:
+        """render(md_text, **options) with the same arguments, result and exceptions."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # asyncio primitives belong to one loop
+            self._semaphore, self._loop = asyncio.Semaphore(self.limit), loop
+        async with self._semaphore:
+            if self.mode == "process":
+                return await self._render_forked(loop, md_text, options, self.timeout)
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.limit, thread_name_prefix="md-to-pdf")
+            return await loop.run_in_executor(self._executor, partial(render, md_text, **options))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @staticmethod
+    async def _render_forked(loop, md_text: str, options: dict, timeout=None) -> RenderResult:
+        import asyncio
+        import pickle
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(read_fd)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                try:
+                    outcome = (True, render(md_text, **options))
+                except Exception as exc:
+                    outcome = (False, exc)
+                try:
+                    payload = pickle.dumps(outcome)
+                except Exception:  # an exception type that does not pickle
+                    payload = pickle.dumps((False, RuntimeError(str(outcome[1]))))
+                with os.fdopen(write_fd, "wb") as fh:
+                    fh.write(payload)
+                code = 0
+            finally:
+                os._exit(code)
+
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        chunks, eof = [], loop.create_future()
+
+        def readable():
+            try:
+                data = os.read(read_fd, 65536)
+            except BlockingIOError:
+                return
+            if data:
+                chunks.append(data)
+            elif not eof.done():
+                eof.set_result(None)
+
+        loop.add_reader(read_fd, readable)
+        try:
+            await asyncio.wait_for(eof, timeout)
+        except asyncio.TimeoutError:
+            os.kill(pid, signal.SIGKILL)
+            raise TimeoutError(f"render worker killed after {timeout}s") from None
+        except asyncio.CancelledError:
+            os.kill(pid, signal.SIGKILL)
+            raise
+        finally:
+            loop.remove_reader(read_fd)
+            os.close(read_fd)
+            _, wait_status = os.waitpid(pid, 0)
+        if not chunks:
+            raise RuntimeError(f"render worker died without a result (wait status {wait_status})")
+        ok, value = pickle.loads(b"".join(chunks))
+        if not ok:
+            raise value
+        return value
+
+
+_default_renderer = None
+
+
+async def convert_async(md_text: str, config=None, engine: str = "reportlab", base_dir=None,
+                        css_path=None, pygments_theme: str = "github") -> RenderResult:
+    """Async render() in a forked child, at most CPU-count at once across all callers.
+
+    For another limit or thread mode, create an AsyncRenderer and await its render().
+    """
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = AsyncRenderer()
+    return await _default_renderer.render(md_text, config=config, engine=engine, base_dir=base_dir,
+                                          css_path=css_path, pygments_theme=pygments_theme)
 
 
 # ---------------------------------------------------------------------------
-# Main
+# Render cache -- content-addressed PDFs, size-bounded, least recently used out first
 # ---------------------------------------------------------------------------
 
-def main():
-    args = parse_args()
+@lru_cache(maxsize=1)
+def _script_digest() -> str:
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
 
-    if not os.path.isfile(args.input):
-        print_failure(f"File not found: {args.input}")
-        sys.exit(1)
+def _engine_version(engine: str) -> str:
+    try:
+        from importlib.metadata import version
+        return version(engine)
+    except Exception:
+        return "unknown"
 
-    config = load_config(args.config)
 
+def render_key(job: dict, config: dict) -> str:
+    """Hash of everything that decides the PDF bytes of a file job (see content_key)."""
+    return content_key(Path(job["input"]).read_bytes(), Path(job["input"]).resolve().parent,
+                       job.get("engine") or "reportlab", config,
+                       job.get("style"), job.get("pygments_theme"))
+
+
+def content_key(md_bytes: bytes, base_dir: Path, engine: str, config: dict,
+                css_path=None, pygments_theme=None) -> str:
+    """Hash of everything that decides the PDF bytes.
+
+    Markdown, merged config, engine and its version, this script, the fonts (fonts_digest),
+    the referenced local images and -- for weasyprint -- the stylesheet and pygments theme.
+    """
+    h = hashlib.sha256()
+
+    def part(label: str, data: bytes):
+        h.update(f"{label}:{len(data)}:".encode("utf-8"))
+        h.update(data)
+
+    part("script", _script_digest().encode("ascii"))
+    part("engine", f"{engine}=={_engine_version(engine)}".encode("utf-8"))
+    part("markdown", md_bytes)
+    part("config", json.dumps(config, sort_keys=True).encode("utf-8"))
+    part("fonts", fonts_digest(config.get("fonts")).encode("ascii"))
+    if engine == "weasyprint":
+        css = Path(css_path or DEFAULT_CSS_PATH)
+        part("css", css.read_bytes() if css.exists() else b"")
+        part("pygments", (pygments_theme or "github").encode("utf-8"))
+    for img in referenced_images(md_bytes.decode("utf-8", "replace"), base_dir):
+        part("image", img.encode("utf-8") + b"\0" + hashlib.sha256(Path(img).read_bytes()).digest())
+    return h.hexdigest()
+
+
+def _atomic_copy(source: str, target: str):
+    """Copy via a temp file in the target directory and rename -- readers never see half a file."""
+    with _atomic_write(target) as dst, open(source, "rb") as src:
+        shutil.copyfileobj(src, dst)
+
+
+def _write_json_atomic(target, data):
+    """json.dump to a temp file beside target, then rename it into place."""
+    with _atomic_write(target, "w") as fh:
+        json.dump(data, fh, ensure_ascii=False)
+
+
+class RenderCache:
+    """PDFs stored as <root>/<key[:2]>/<key>.pdf with a <key>.json sidecar (pages, warnings).
+
+    Publishing renames complete files into place, PDF first, so a sidecar always has its PDF
+    and concurrent workers never read a partial entry. Entry mtimes record last use: a hit
+    touches them, and eviction drops the oldest until the cache fits max_bytes. The total
+    size is kept in <root>/usage.json, updated under a lock by every put, so only a put that
+    crosses the cap (or finds no ledger) walks the cache.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def _entry(self, key: str):
+        shard = self.root / key[:2]
+        return shard / f"{key}.pdf", shard / f"{key}.json"
+
+    def fetch(self, key: str, output_path: str):
+        """Copy a cached PDF to output_path and return its metadata, or None on a miss."""
+        pdf, meta_path = self._entry(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            _atomic_copy(str(pdf), output_path)
+            os.utime(pdf)
+            os.utime(meta_path)
+        except (OSError, ValueError):  # absent, or evicted between the two reads
+            return None
+        return meta
+
+    def get(self, key: str):
+        """(pdf_bytes, metadata) for a cached key, or None on a miss."""
+        pdf, meta_path = self._entry(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            data = pdf.read_bytes()
+            os.utime(pdf)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return data, meta
+
+    def put(self, key: str, pdf_bytes: bytes, meta: dict):
+        pdf, meta_path = self._entry(key)
+        pdf.parent.mkdir(parents=True, exist_ok=True)
+        replaced = self._size(pdf)
+        with _atomic_write(pdf) as fh:
+            fh.write(pdf_bytes)
+        _write_json_atomic(meta_path, meta)
+        self._account(len(pdf_bytes) - replaced)
+
+    def publish(self, key: str, pdf_path: str, meta: dict):
+        pdf, meta_path = self._entry(key)
+        pdf.parent.mkdir(parents=True, exist_ok=True)
+        replaced = self._size(pdf)
+        _atomic_copy(pdf_path, str(pdf))
+        _write_json_atomic(meta_path, meta)
+        self._account(self._size(pdf) - replaced)
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+
+    def _account(self, added: int):
+        """Add `added` bytes to the usage ledger; evict once the total crosses max_bytes."""
+        ledger = self.root / "usage.json"
+        with _file_lock(self.root / "usage.lock"):
+            try:
+                total = int(json.loads(ledger.read_text(encoding="utf-8"))["bytes"]) + added
+            except (OSError, ValueError, KeyError, TypeError):
+                total = None  # no ledger yet (or garbled): the walk below measures the cache
+            if total is None or total > self.max_bytes:
+                total = self.evict()
+            _write_json_atomic(ledger, {"bytes": total})
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits; returns the bytes kept."""
+        entries, total = [], 0
+        for pdf in self.root.glob("??/*.pdf"):
+            try:
+                st = pdf.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, pdf))
+            total += st.st_size
+        for _, size, pdf in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in (pdf.with_suffix(".json"), pdf):  # sidecar first: a reader then misses cleanly
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            total -= size
+        return total
+
+
+# ---------------------------------------------------------------------------
+# Jobs -- one conversion, as plain data (shared by the CLI and the daemon)
+# ---------------------------------------------------------------------------
+
+def job_from_args(args, input_path: str, output_path: str) -> dict:
+    return {
+        "input": input_path, "output": output_path, "engine": args.engine,
+        "config": args.config, "style": args.style, "pygments_theme": args.pygments_theme,
+        "cache_dir": args.cache_dir, "cache_max_mb": args.cache_max_mb,
+        "font_memory": args.font_memory,
+    }
+
+
+def _convert_job(job: dict) -> dict:
+    if not os.path.isfile(job["input"]):
+        return {"status": "FAILED", "error": f"File not found: {job['input']}"}
+    config = load_config(job.get("config"))
+    if job.get("overrides"):
+        config = _deep_merge(config, job["overrides"])
+    out_dir = os.path.dirname(job["output"])
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    engine = job.get("engine") or "reportlab"
+
+    cache = key = None
+    if job.get("cache_dir"):
+        cache = RenderCache(job["cache_dir"], job.get("cache_max_mb", 512) * 1024 * 1024)
+        key = render_key(job, config)
+        meta = cache.fetch(key, job["output"])
+        if meta is not None:
+            for message in meta.get("warnings", []):
+                warn(message)
+            return {"status": "OK", "output": job["output"], "pages": meta["pages"],
+                    "engine": engine, "cache": "hit"}
+
+    timings = {}
+    if engine == "weasyprint":
+        pages = convert_weasyprint(job["input"], job["output"], config,
+                                   css_path=job.get("style"),
+                                   pygments_theme=job.get("pygments_theme") or "github",
+                                   timings=timings)
+    else:
+        pages = convert_reportlab(job["input"], job["output"], config, timings=timings)
+    result = {"status": "OK", "output": job["output"], "pages": pages, "engine": engine,
+              "timings": timings}
+    if cache is not None:
+        cache.publish(key, job["output"], {"pages": pages, "warnings": list(_warning_sink.get() or [])})
+        result["cache"] = "miss"
+    return result
+
+
+def run_job(job: dict) -> dict:
+    """Run one conversion job; never raises.
+
+    The result carries the job's own warnings and its wall time, so callers running many
+    jobs can attribute both. `overrides` (a config fragment) is deep-merged over `config`.
+    """
+    warnings = []
+    token = _warning_sink.set(warnings)
+    started = time.monotonic()
     try:
-        if args.engine == "weasyprint":
-            convert_weasyprint(args.input, args.output, config,
-                               css_path=args.style,
-                               pygments_theme=args.pygments_theme)
+        result = _convert_job(job)
+    except Exception as exc:
+        result = {"status": "FAILED", "error": str(exc)}
+    finally:
+        _warning_sink.reset(token)
+    result["warnings"] = warnings
+    result["duration_ms"] = round((time.monotonic() - started) * 1000)
+    if job.get("font_memory"):
+        result["font_memory"] = font_memory()
+    return result
+
+
+def emit_result(result: dict, file=None) -> int:
+    """Print a job result in the CLI contract (WARN= on stderr, status lines); return the exit code."""
+    for message in result.get("warnings", []):
+        warn(message)
+    if result["status"] != "OK":
+        print_failure(result.get("error", "conversion failed"), file=file)
+        return 1
+    print_status(result["output"], result["pages"], result["engine"], result.get("cache"), file=file)
+    print_font_memory(result.get("font_memory"), file=file)
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Streams -- "-" as input and/or output, for pipelines
+# ---------------------------------------------------------------------------
+
+def _status_stream(args):
+    if args.status_fd is not None:
+        return os.fdopen(args.status_fd, "w", closefd=False)
+    return sys.stderr if args.output == "-" else sys.stdout
+
+
+def run_stream(args) -> int:
+    """Convert one document read from stdin and/or written to stdout; return the exit code.
+
+    The PDF bytes own stdout, so the status lines move to stderr or --status-fd.
+    """
+    status = _status_stream(args)
+    try:
+        if args.input == "-":
+            md_text = sys.stdin.buffer.read().decode("utf-8")
+            base_dir = args.base_dir or "."
+        elif not os.path.isfile(args.input):
+            raise FileNotFoundError(f"File not found: {args.input}")
         else:
-            convert_reportlab(args.input, args.output, config)
+            md_text = Path(args.input).read_text(encoding="utf-8")
+            base_dir = args.base_dir or Path(args.input).resolve().parent
+        result = render(md_text, load_config(args.config), args.engine, base_dir,
+                        css_path=args.style, pygments_theme=args.pygments_theme)
+        if args.output != "-":
+            out_dir = os.path.dirname(args.output)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+            Path(args.output).write_bytes(result.pdf_bytes)
     except Exception as exc:
-        print_failure(str(exc))
-        sys.exit(1)
+        print_failure(str(exc), file=status)
+        status.flush()
+        return 1
+    for message in result.warnings:
+        warn(message)
+    if args.output == "-":
+        sys.stdout.buffer.write(result.pdf_bytes)
+        sys.stdout.buffer.flush()
+    print_status(args.output, result.pages, args.engine, size_bytes=len(result.pdf_bytes), file=status)
+    status.flush()
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Batch -- many documents over one ForkPool, a status block per document
+# ---------------------------------------------------------------------------
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+_SKIP_DIRS = {"node_modules", "__pycache__"}
+
+_MD_IMAGE_RE = re.compile(r"!\[[^\]]*\]\(\s*<?([^)\s>]+)")
+_HTML_IMAGE_RE = re.compile(r"<img\b[^>]*?\bsrc=[\"']([^\"']+)", re.IGNORECASE)
+
+
+def batch_documents(paths: list, out_dir=None) -> list:
+    """Expand batch inputs to (input, output, relative path) triples.
+
+    A directory contributes every Markdown file below it (hidden and vendor directories
+    skipped), its layout mirrored under out_dir; a file maps to <out_dir>/<stem>.pdf.
+    Without out_dir every PDF lands next to its source. The relative path -- from the
+    directory given, or the file path as given -- is what sharding hashes.
+    """
+    docs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            docs.append((path, output_path_for(path, out_dir), Path(os.path.normpath(path)).as_posix()))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in _SKIP_DIRS)
+            for name in sorted(files):
+                if name.startswith(".") or not name.lower().endswith(MARKDOWN_SUFFIXES):
+                    continue
+                source = os.path.join(root, name)
+                rel = Path(os.path.relpath(source, path))
+                output = Path(out_dir) / rel.with_suffix(".pdf") if out_dir else Path(source).with_suffix(".pdf")
+                docs.append((source, str(output), rel.as_posix()))
+    return docs
+
+
+def _path_hash(rel: str) -> int:
+    return int.from_bytes(hashlib.sha256(rel.encode("utf-8")).digest()[:8], "big")
+
+
+def select_shard(docs: list, shard: int, count: int, balance: str = "hash") -> list:
+    """The documents of shard `shard` (1-based) of `count`, in their original order.
+
+    Every node computes the same split with no coordinator. "hash" puts a document in
+    shard hash(relative path) % count; "size" deals documents largest first to the
+    currently lightest shard, so shards carry similar byte totals.
+    """
+    if balance == "size":
+        loads = [0] * count
+        owner = {}
+        for doc in sorted(docs, key=lambda d: (-_doc_size(d[0]), d[2])):
+            i = min(range(count), key=lambda j: (loads[j], j))
+            loads[i] += max(_doc_size(doc[0]), 1)
+            owner[doc[2]] = i
+        return [d for d in docs if owner[d[2]] == shard - 1]
+    return [d for d in docs if _path_hash(d[2]) % count == shard - 1]
+
+
+def _doc_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def referenced_images(md_text: str, base_dir: Path) -> list:
+    """Local image files the document references, resolved the way the engines resolve them."""
+    found = []
+    for src in _MD_IMAGE_RE.findall(md_text) + _HTML_IMAGE_RE.findall(md_text):
+        if src.startswith(("http://", "https://", "data:")):
+            continue
+        img_path = _resolve_image(src, base_dir)
+        if img_path is not None and img_path.is_file():
+            found.append(str(img_path))
+    return found
+
+
+def job_dependencies(job: dict) -> list:
+    """Every file whose change can change the job's PDF: source, images, config, CSS, this script."""
+    deps = [job["input"], __file__, str(DEFAULT_CONFIG_PATH)]
+    if job.get("config"):
+        deps.append(job["config"])
+    if job.get("engine") == "weasyprint":
+        deps.append(job.get("style") or str(DEFAULT_CSS_PATH))
+    md_text = Path(job["input"]).read_text(encoding="utf-8")
+    deps.extend(referenced_images(md_text, Path(job["input"]).resolve().parent))
+    return deps
+
+
+def build_identity(job: dict) -> str:
+    """Hash of what decides a job's PDF besides its dependencies' mtimes: this script, the
+    engine and its version, the config and overrides, the fonts, and for weasyprint the CSS
+    and theme."""
+    engine = job.get("engine") or "reportlab"
+    config = load_config(job.get("config"))
+    if job.get("overrides"):
+        config = _deep_merge(config, job["overrides"])
+    parts = {"script": _script_digest(), "engine": f"{engine}=={_engine_version(engine)}",
+             "config": job.get("config"), "overrides": job.get("overrides"),
+             "fonts": fonts_digest(config.get("fonts"))}
+    if engine == "weasyprint":
+        parts["style"] = job.get("style")
+        parts["pygments_theme"] = job.get("pygments_theme") or "github"
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def build_record_path(output: str) -> str:
+    """The hidden record of how a batch output was built: <dir>/.<name>.build.json."""
+    head, name = os.path.split(output)
+    return os.path.join(head, f".{name}.build.json")
+
+
+def record_build(job: dict):
+    """Note build_identity() beside a freshly converted output (skipped when not writable)."""
+    try:
+        _write_json_atomic(build_record_path(job["output"]), {"build": build_identity(job)})
+    except OSError:
+        pass
+
+
+def is_up_to_date(job: dict) -> bool:
+    """Make-style check: the PDF exists, is newer than every dependency that exists, and was
+    built the same way (engine, theme, config, script) as the job asks for now."""
+    try:
+        built = os.stat(job["output"]).st_mtime_ns
+        with open(build_record_path(job["output"]), encoding="utf-8") as fh:
+            if json.load(fh).get("build") != build_identity(job):
+                return False
+        deps = job_dependencies(job)
+    except (OSError, ValueError, AttributeError):  # no/garbled record, unreadable source
+        return False
+    for dep in deps:
+        try:
+            if os.stat(dep).st_mtime_ns >= built:
+                return False
+        except OSError:
+            continue
+    return True
+
+
+def emit_block(job: dict, result: dict):
+    """One batch status block: INPUT= then the single-document lines, ERROR= on failure."""
+    for message in result.get("warnings", []):
+        print(f"WARN={job['input']}: {message}", file=sys.stderr)
+    print(f"INPUT={job['input']}")
+    if result["status"] == "OK":
+        print_status(result["output"], result["pages"], result["engine"], result.get("cache"))
+        print_font_memory(result.get("font_memory"))
+    elif result["status"] == "SKIPPED":
+        print("STATUS=SKIPPED")
+        print(f"OUTPUT={result['output']}")
+    else:
+        error = result.get("error", "conversion failed")
+        print(f"STATUS={result['status']}")
+        print(f"ERROR={error.splitlines()[0] if error else ''}")
+        print(f"{job['input']}: {error}", file=sys.stderr)
+    print(flush=True)
+
+
+def run_batch(args, inputs: list) -> int:
+    """Convert every input, isolating failures per document; return the exit code."""
+    jobs, counts = [], {"OK": 0, "SKIPPED": 0, "FAILED": 0}
+    owners = {}
+    docs = batch_documents(inputs, args.out_dir)
+    if args.shard:
+        docs = select_shard(docs, args.shard[0], args.shard[1], args.shard_balance)
+    for path, output, _ in docs:
+        job = job_from_args(args, path, output)
+        owner = owners.setdefault(os.path.abspath(output), path)
+        if owner != path:
+            emit_block(job, {"status": "FAILED", "warnings": [],
+                             "error": f"output {output} is already produced by {owner}"})
+            counts["FAILED"] += 1
+            continue
+        if not args.force and is_up_to_date(job):
+            emit_block(job, {"status": "SKIPPED", "output": output, "warnings": []})
+            counts["SKIPPED"] += 1
+            continue
+        jobs.append(job)
+
+    if jobs:
+        warm_engines(args.config, args.pygments_theme)
+    cache_counts = {"hit": 0, "miss": 0}
+    workers = {}  # pid -> its latest font memory report
+    for job, result in ForkPool(args.jobs).imap_unordered(run_job, jobs):
+        emit_block(job, result)
+        counts["OK" if result["status"] == "OK" else "FAILED"] += 1
+        if result["status"] == "OK":
+            record_build(job)
+        if result.get("cache") in cache_counts:
+            cache_counts[result["cache"]] += 1
+        if result.get("font_memory"):
+            workers[result["font_memory"]["pid"]] = result["font_memory"]
+
+    print("BATCH=DONE")
+    print(f"DOCUMENTS={sum(counts.values())}")
+    print(f"CONVERTED={counts['OK']}")
+    print(f"SKIPPED={counts['SKIPPED']}")
+    print(f"FAILED={counts['FAILED']}")
+    if args.shard:
+        print(f"SHARD={args.shard[0]}/{args.shard[1]}")
+    if args.cache_dir:
+        print(f"CACHE_HITS={cache_counts['hit']}")
+        print(f"CACHE_MISSES={cache_counts['miss']}")
+    if workers:
+        # shared pages count fully in each RSS but once, divided, across the PSS values
+        print(f"FONT_WORKERS={len(workers)}")
+        print(f"FONT_RSS_TOTAL={sum(w['rss'] for w in workers.values())}KB")
+        print(f"FONT_PSS_TOTAL={sum(w['pss'] for w in workers.values())}KB")
+    return 1 if counts["FAILED"] else 0
+
+
+# ---------------------------------------------------------------------------
+# Manifest -- NDJSON jobs in, one NDJSON result per job out
+# ---------------------------------------------------------------------------
+
+_MANIFEST_KEYS = {"input", "output", "engine", "config", "overrides", "style", "pygments_theme"}
+
+
+def manifest_job(record, args) -> dict:
+    """Validate one manifest record into a job; CLI options fill the fields it leaves out."""
+    if not isinstance(record, dict) or not isinstance(record.get("input"), str):
+        raise ValueError('a manifest line must be an object with an "input" path')
+    unknown = sorted(set(record) - _MANIFEST_KEYS)
+    if unknown:
+        raise ValueError(f"unknown manifest keys: {', '.join(unknown)}")
+    if record.get("engine", args.engine) not in ENGINES:
+        raise ValueError(f"unknown engine: {record['engine']}")
+    if not isinstance(record.get("overrides", {}), dict):
+        raise ValueError('"overrides" must be an object')
+    job = job_from_args(args, record["input"],
+                        record.get("output") or output_path_for(record["input"], args.out_dir))
+    job.update({k: v for k, v in record.items() if k not in ("input", "output")})
+    return job
+
+
+def result_record(job: dict, result: dict) -> dict:
+    """A result as one NDJSON object: the print_status fields plus duration and warnings."""
+    record = {"input": job.get("input"), "status": result["status"]}
+    if result["status"] == "OK":
+        size_bytes = Path(result["output"]).stat().st_size
+        record.update(output=result["output"], pages=result["pages"], size=_size_kb(size_bytes),
+                      bytes=size_bytes, engine=result["engine"])
+        if result.get("cache"):
+            record["cache"] = result["cache"]
+        timings = result.get("timings") or {}
+        if "fragment_hits" in timings:
+            record.update(fragment_hits=timings["fragment_hits"], fragment_misses=timings["fragment_misses"])
+    else:
+        record["error"] = result.get("error", "conversion failed")
+    record["duration_ms"] = result.get("duration_ms", 0)
+    record["warnings"] = result.get("warnings", [])
+    if result.get("font_memory"):
+        record["font_memory"] = result["font_memory"]
+    return record
+
+
+def _emit_record(record: dict):
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def run_manifest(args, manifest) -> int:
+    """Run every job of an NDJSON manifest ("-" = stdin); return the exit code."""
+    fh = sys.stdin if manifest == "-" else open(manifest, encoding="utf-8")
+    jobs, failed = [], 0
+    with fh:
+        for line_no, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise ValueError(f"invalid JSON: {exc}") from exc
+                jobs.append(manifest_job(record, args))
+            except ValueError as exc:
+                _emit_record({"line": line_no, "status": "FAILED", "error": str(exc),
+                              "duration_ms": 0, "warnings": []})
+                failed += 1
+
+    if jobs:
+        warm_engines(args.config, args.pygments_theme)
+    for job, result in ForkPool(args.jobs).imap_unordered(run_job, jobs):
+        _emit_record(result_record(job, result))
+        failed += result["status"] != "OK"
+    return 1 if failed else 0
+
+
+# ---------------------------------------------------------------------------
+# Spool -- a shared directory as a work queue; a move that never replaces is the only lock
+# ---------------------------------------------------------------------------
+
+_SPOOL_NAME_RE = re.compile(r"^(?P<stem>[^.@][^@]*?)(?:@(?P<attempt>\d+))?\.json$")
+
+
+def _move_new(src, dst):
+    """Move src to dst, raising FileExistsError rather than replacing an existing dst.
+
+    rename() silently replaces its target; link() refuses one atomically. Filesystems
+    without hard links get a check-then-rename instead.
+    """
+    try:
+        os.link(src, dst)
+    except (FileExistsError, FileNotFoundError):
+        raise
+    except OSError:
+        if os.path.lexists(dst):
+            raise FileExistsError(f"{dst} already exists") from None
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+
+class Spool:
+    """A job queue in <root>/{incoming,claimed,done,failed}, safe across hosts sharing root.
+
+    Producers write a manifest record to incoming/<name>.json (via a dot-file and rename, so
+    it is never read half-written). A worker claims it by renaming it into claimed/: the
+    rename succeeds for exactly one worker. The claimed file's mtime is its lease, renewed
+    while the job runs; a lease older than lease_seconds belonged to a dead worker and goes
+    back to incoming as <name>@<attempt>.json, until max_attempts is used up. A move never
+    replaces a file: a job whose next name is taken fails with a status file saying so.
+    """
+
+    def __init__(self, root: str, lease_seconds: float = 600, max_attempts: int = 3):
+        self.root = Path(root)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.incoming, self.claimed = self.root / "incoming", self.root / "claimed"
+        self.done, self.failed = self.root / "done", self.root / "failed"
+
+    def prepare(self):
+        for d in (self.incoming, self.claimed, self.done, self.failed):
+            d.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def parse_name(name: str):
+        """incoming/claimed file name -> (job stem, attempt), or None for foreign files."""
+        m = _SPOOL_NAME_RE.match(name)
+        return (m.group("stem"), int(m.group("attempt") or 1)) if m else None
+
+    def claim(self, limit: int) -> list:
+        """Lease up to `limit` incoming jobs, oldest first; returns their claimed paths."""
+        candidates = []
+        for entry in os.scandir(self.incoming):
+            if self.parse_name(entry.name):
+                try:
+                    candidates.append((entry.stat().st_mtime_ns, entry.name))
+                except OSError:  # claimed by another worker since the scan
+                    pass
+        leases = []
+        for _, name in sorted(candidates):
+            if len(leases) >= limit:
+                break
+            lease = self.claimed / name
+            try:
+                _move_new(self.incoming / name, lease)
+            except FileExistsError:  # a job of that name is still leased
+                self._fail_collision(self.incoming / name, lease)
+                continue
+            except OSError:  # another worker won the move
+                continue
+            os.utime(lease)
+            leases.append(lease)
+        return leases
+
+    def renew(self, leases: list):
+        for lease in leases:
+            try:
+                os.utime(lease)
+            except OSError:
+                pass
+
+    def reclaim_stale(self) -> int:
+        """Requeue (or fail, once out of attempts) leases whose worker stopped renewing them."""
+        cutoff = time.time() - self.lease_seconds
+        reclaimed = 0
+        for entry in os.scandir(self.claimed):
+            parsed = self.parse_name(entry.name)
+            try:
+                if not parsed or entry.stat().st_mtime >= cutoff:
+                    continue
+            except OSError:
+                continue
+            stem, attempt = parsed
+            if attempt >= self.max_attempts:
+                try:
+                    record = json.loads(Path(entry.path).read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    record = None
+                source = record.get("input") if isinstance(record, dict) else None
+                self.finish(Path(entry.path), record, {
+                    "input": source, "status": "FAILED", "duration_ms": 0, "warnings": [],
+                    "error": f"lease expired {attempt} times; the job keeps losing its worker"})
+            else:
+                retry = self.incoming / f"{stem}@{attempt + 1}.json"
+                try:
+                    _move_new(entry.path, retry)
+                except FileExistsError:
+                    if not self._fail_collision(Path(entry.path), retry):
+                        continue
+                except OSError:  # another worker reclaimed it first
+                    continue
+            reclaimed += 1
+        return reclaimed
+
+    def _fail_collision(self, path: Path, taken: Path) -> bool:
+        """Fail the job file at path, whose next name is taken; False if another worker moved it."""
+        try:
+            if os.path.samefile(path, taken):
+                return False  # another worker's move, between its link() and unlink()
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            return False
+        try:
+            record = json.loads(text)
+        except ValueError:
+            record = None
+        source = record.get("input") if isinstance(record, dict) else None
+        self.finish(path, record, {
+            "input": source, "status": "FAILED", "duration_ms": 0, "warnings": [],
+            "error": f"{taken.relative_to(self.root)} already exists; not replacing it"})
+        return True
+
+    def finish(self, lease: Path, record, status: dict):
+        """Write done/<stem>.json or failed/<stem>.json, then release the lease."""
+        stem, _ = self.parse_name(lease.name)
+        import socket
+
+        status = dict(status, job=stem, worker=f"{socket.gethostname()}:{os.getpid()}")
+        if record is not None:
+            status["request"] = record
+        target = self.done if status["status"] == "OK" else self.failed
+        _write_json_atomic(target / f"{stem}.json", status)
+        try:
+            lease.unlink()
+        except OSError:
+            pass
+
+    def job_for(self, lease: Path, args):
+        """Load a leased record as (record, job, error); relative paths resolve against root."""
+        stem, _ = self.parse_name(lease.name)
+        try:
+            record = json.loads(lease.read_text(encoding="utf-8"))
+        except ValueError as exc:
+            return None, None, f"invalid JSON: {exc}"
+        except OSError as exc:
+            return None, None, f"unreadable job: {exc}"
+        resolved = record
+        if isinstance(record, dict) and isinstance(record.get("input"), str):
+            resolved = dict(record)
+            for key in ("input", "output", "config", "style"):
+                if isinstance(resolved.get(key), str) and resolved[key]:
+                    resolved[key] = str(self.root / resolved[key])  # absolute paths stay as they are
+            resolved["output"] = resolved.get("output") or str(self.done / f"{stem}.pdf")
+        try:
+            return record, manifest_job(resolved, args), None
+        except ValueError as exc:
+            return record, None, str(exc)
+
+
+def run_spool(args, root: str) -> int:
+    """Claim and convert jobs from a spool directory; with --spool-drain, exit once it is empty."""
+    spool = Spool(root, args.lease_timeout, args.max_attempts)
+    spool.prepare()
+    warm_engines(args.config, args.pygments_theme)
+    while True:
+        spool.reclaim_stale()
+        leases = spool.claim(args.jobs)
+        if not leases:
+            if args.spool_drain:
+                return 0
+            time.sleep(args.poll_interval)
+            continue
+
+        jobs = []
+        for lease in leases:
+            record, job, error = spool.job_for(lease, args)
+            if error:
+                source = record.get("input") if isinstance(record, dict) else None
+                status = {"input": source, "status": "FAILED", "error": error,
+                          "duration_ms": 0, "warnings": []}
+                spool.finish(lease, record, status)
+                _emit_record(dict(status, job=spool.parse_name(lease.name)[0]))
+                continue
+            job["lease"], job["request"] = str(lease), record
+            jobs.append(job)
+
+        # the parent renews every lease while children convert; a lease only goes stale
+        # when this whole process (or its host) is gone
+        for job, result in ForkPool(args.jobs).imap_unordered(
+                run_job, jobs, tick=lambda: spool.renew(leases), tick_seconds=spool.lease_seconds / 3):
+            lease = Path(job["lease"])
+            record = result_record(job, result)
+            spool.finish(lease, job["request"], record)
+            _emit_record(dict(record, job=spool.parse_name(lease.name)[0]))
+
+
+# ---------------------------------------------------------------------------
+# Fork-server pool -- warm the parent once, fork a copy-on-write child per job
+# ---------------------------------------------------------------------------
+
+# Everything either engine imports on its first document; markdown loads its extensions by name.
+_WARM_MODULES = (
+    "reportlab.platypus", "reportlab.pdfbase.ttfonts", "reportlab.pdfgen.canvas",
+    "markdown", "markdown.extensions.tables", "markdown.extensions.fenced_code",
+    "markdown.extensions.codehilite", "markdown.extensions.footnotes", "markdown.extensions.toc",
+    "markdown.extensions.attr_list", "markdown.extensions.def_list", "markdown.extensions.admonition",
+    "markdown.extensions.sane_lists", "markdown.extensions.smarty",
+    "pygments", "pygments.formatters.html", "pygments.lexers",
+    "weasyprint",
+)
+
+
+def warm_engines(config_path=None, pygments_theme="github") -> list:
+    """Import every installed engine module, build the RenderProfile, then freeze the heap.
+
+    The profile is for the config at config_path (default: the bundled defaults), so
+    children converting with it skip fonts, styles and CSS; the pygments stylesheet is for
+    pygments_theme (an unknown theme warns here, once, not in every child). Returns the modules that
+    imported. gc.freeze() moves everything loaded so far out of the collector's reach, so
+    forked children do not dirty those pages by scanning them.
+    """
+    loaded = []
+    for name in _WARM_MODULES:
+        try:
+            # weasyprint prints an install banner to stdout before failing; keep it off the contract
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                import_module(name)
+        except (ImportError, OSError):  # ...and raises OSError when pango is missing
+            continue
+        loaded.append(name)
+    try:
+        profile = RenderProfile.of(load_config(config_path))
+    except (OSError, ValueError):  # a broken --config fails each job with its own message
+        profile = RenderProfile.of(load_config())
+    if "reportlab.platypus" in loaded:
+        profile.prepare_reportlab()
+    if "pygments.formatters.html" in loaded:
+        pygments_css(pygments_theme)
+    if "weasyprint" in loaded:
+        profile.weasyprint_stylesheets(theme=pygments_theme)
+    _code_signatures()  # compiled once here rather than in every child
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    return loaded
+
+
+class ForkPool:
+    """Run jobs in forked children of a warmed parent, at most `workers` at a time.
+
+    Every child starts from the parent's image (engines imported, fonts registered) and runs
+    exactly one job, so a crash or leak stays inside it. Results travel back as JSON over a
+    pipe; a child that dies without one yields a FAILED result. Without os.fork (Windows) jobs
+    run in-process, one after another.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+
+    def imap_unordered(self, func, items, tick=None, tick_seconds=None):
+        """Yield (item, func(item)) pairs in completion order.
+
+        tick, if given, is called at least every tick_seconds while children run.
+        """
+        if not hasattr(os, "fork"):
+            for item in items:
+                if tick:
+                    tick()
+                yield item, func(item)
+            return
+        import selectors
+
+        pending = iter(items)
+        sel = selectors.DefaultSelector()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(sel.get_map()) < self.workers:
+                    item = next(pending, _DONE)
+                    if item is _DONE:
+                        exhausted = True
+                        break
+                    self._launch(sel, func, item)
+                if not sel.get_map():
+                    return
+                ready = sel.select(tick_seconds if tick else None)
+                if tick:
+                    tick()
+                for key, _ in ready:
+                    pid, item, chunks = key.data
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        chunks.append(data)
+                        continue
+                    sel.unregister(key.fd)
+                    os.close(key.fd)
+                    _, wait_status = os.waitpid(pid, 0)
+                    yield item, self._decode(b"".join(chunks), wait_status)
+        finally:
+            for key in list(sel.get_map().values()):
+                os.kill(key.data[0], signal.SIGKILL)
+                os.waitpid(key.data[0], 0)
+                os.close(key.fd)
+            sel.close()
+
+    @staticmethod
+    def _launch(sel, func, item):
+        import selectors
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(read_fd)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                payload = json.dumps(func(item)).encode("utf-8")
+                with os.fdopen(write_fd, "wb") as fh:
+                    fh.write(payload)
+                code = 0
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        sel.register(read_fd, selectors.EVENT_READ, (pid, item, []))
+
+    @staticmethod
+    def _decode(payload: bytes, wait_status: int) -> dict:
+        if payload:
+            try:
+                return json.loads(payload)
+            except ValueError:
+                pass
+        return {"status": "FAILED", "warnings": [],
+                "error": f"worker died without a result (wait status {wait_status})"}
+
+
+_DONE = object()
+
+
+# ---------------------------------------------------------------------------
+# Daemon -- a warm process on a Unix socket, one JSON job per connection
+# ---------------------------------------------------------------------------
+
+def default_socket_path() -> str:
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(base, f"md-to-pdf-{uid}.sock")
+
+
+class _JobHandler:
+    """The job half of the daemon's handler; serve() mixes it into socketserver's
+    StreamRequestHandler, so only --serve imports the server stack."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line.strip():
+            return  # liveness probe (see _unlink_stale_socket) or a client that gave up
+        try:
+            job = json.loads(line)
+        except ValueError as exc:
+            result = {"status": "FAILED", "error": f"malformed daemon request: {exc}", "warnings": []}
+        else:
+            result = run_job(job)
+        try:
+            self.wfile.write(json.dumps(result).encode("utf-8") + b"\n")
+        except BrokenPipeError:
+            pass
+
+
+def _unlink_stale_socket(socket_path: str):
+    """Remove a socket file left by a dead daemon; refuse to replace a live one."""
+    if not os.path.exists(socket_path):
+        return
+    import socket
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"a daemon is already listening on {socket_path}")
+
+
+def serve(socket_path: str, workers: int):
+    """Serve conversion jobs on a Unix socket until interrupted, `workers` at a time."""
+    import socket
+    import socketserver
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("--serve needs Unix domain sockets, which this platform lacks")
+    _unlink_stale_socket(socket_path)
+    warm_engines()
+    # one forked child per connection: each job starts from the warmed, frozen daemon image
+    server_cls = type("ForkingUnixServer", (socketserver.ForkingMixIn, socketserver.UnixStreamServer), {})
+    handler = type("JobHandler", (_JobHandler, socketserver.StreamRequestHandler), {})
+    previous_umask = os.umask(0o177)  # the socket is owner-only from bind(), not after a chmod
+    try:
+        server = server_cls(socket_path, handler)
+    finally:
+        os.umask(previous_umask)
+    server.max_children = workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # noqa: ARG005 -- still unlink the socket
+    try:
+        print("STATUS=SERVING")
+        print(f"SOCKET={socket_path}", flush=True)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def request_daemon(socket_path: str, job: dict):
+    """Run a job on the daemon. Returns None when no daemon answers, so the caller converts itself.
+
+    Paths go over the wire absolute: the daemon's cwd is not the client's.
+    """
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    wire = dict(job)
+    for key in ("input", "output", "config", "style"):
+        if wire.get(key):
+            wire[key] = os.path.abspath(wire[key])
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(wire).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as fh:
+            reply = fh.readline()
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    if not reply:
+        return None
+    try:
+        result = json.loads(reply)
+    except ValueError:  # truncated, e.g. the worker was killed mid-write
+        return None
+    if not isinstance(result, dict):
+        return None
+    if result.get("status") == "OK":
+        result["output"] = job["output"]
+    return result
+
+
+# ---------------------------------------------------------------------------
+# HTTP endpoint -- POST Markdown, get the PDF; identical requests share one render
+# ---------------------------------------------------------------------------
+
+_HTTP_KEYS = {"markdown", "config", "engine", "pygments_theme"}
+
+
+def _http_arg(text: str):
+    host, sep, port = text.rpartition(":")
+    if not sep or not port.isdigit() or not 0 <= int(port) <= 65535:
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT, got {text!r}")
+    return host.strip("[]") or "127.0.0.1", int(port)
+
+
+def http_request(body: bytes) -> dict:
+    """Validate a POST body: {"markdown": str, "config": {...}, "engine": str, "pygments_theme": str}."""
+    try:
+        request = json.loads(body)
+    except ValueError as exc:
+        raise ValueError(f"invalid JSON: {exc}") from exc
+    if not isinstance(request, dict) or not isinstance(request.get("markdown"), str):
+        raise ValueError('the body must be a JSON object with a "markdown" string')
+    unknown = sorted(set(request) - _HTTP_KEYS)
+    if unknown:
+        raise ValueError(f"unknown request keys: {', '.join(unknown)}")
+    if request.get("engine", "reportlab") not in ENGINES:
+        raise ValueError(f"unknown engine: {request['engine']}")
+    if not isinstance(request.get("config", {}), dict):
+        raise ValueError('"config" must be an object')
+    return request
+
+
+def request_key(request: dict) -> str:
+    """Content hash of a request; equal keys render to the same PDF."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class RenderQueue:
+    """At most `workers` renders at a time, `depth` more waiting; equal requests render once.
+
+    submit() hands every caller with the same request_key the same Future while that render
+    is queued or running, so a burst of one page costs a single conversion. A full queue
+    raises queue.Full instead of growing.
+    """
+
+    def __init__(self, args, workers: int, depth: int):
+        import queue
+
+        self.args = args
+        self._queue = queue.Queue(maxsize=depth)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, request: dict):
+        """Return (future, coalesced) for a validated request."""
+        from concurrent.futures import Future
+
+        key = request_key(request)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, True
+            future = Future()
+            self._queue.put_nowait((key, request, future))
+            self._inflight[key] = future
+        return future, False
+
+    def _work(self):
+        while True:
+            key, request, future = self._queue.get()
+            try:
+                result = self.render(request)
+            except Exception as exc:  # render() failures are already results; this is the cache
+                result = {"status": "FAILED", "error": str(exc), "warnings": [], "duration_ms": 0}
+            with self._lock:
+                del self._inflight[key]
+            future.set_result(result)
+
+    def render(self, request: dict) -> dict:
+        """Render a validated request in memory, reading images only from under --base-dir.
+
+        The Markdown comes from the network, so its image references are untrusted: absolute
+        paths, ".." and symlinks out of the image root are dropped with a warning, and
+        weasyprint fetches no remote URLs.
+        """
+        root = Path(os.path.realpath(self.args.base_dir or "."))
+        token = _image_root.set(root)
+        try:
+            return self._render(request, root)
+        finally:
+            _image_root.reset(token)
+
+    def _render(self, request: dict, root: Path) -> dict:
+        args, started = self.args, time.monotonic()
+        engine = request.get("engine", args.engine)
+        theme = request.get("pygments_theme", args.pygments_theme)
+        config = _deep_merge(load_config(args.config), request.get("config") or {})
+        cache = key = None
+        if args.cache_dir:
+            cache = RenderCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+            key = content_key(request["markdown"].encode("utf-8"), root, engine, config,
+                              args.style, theme)
+            hit = cache.get(key)
+            if hit is not None:
+                return {"status": "OK", "pdf": hit[0], "pages": hit[1]["pages"], "engine": engine,
+                        "cache": "hit", "warnings": hit[1].get("warnings", []), "timings": {},
+                        "duration_ms": round((time.monotonic() - started) * 1000)}
+        try:
+            rendered = render(request["markdown"], config, engine, root, css_path=args.style,
+                              pygments_theme=theme)
+        except Exception as exc:
+            return {"status": "FAILED", "error": str(exc), "warnings": [],
+                    "duration_ms": round((time.monotonic() - started) * 1000)}
+        result = {"status": "OK", "pdf": rendered.pdf_bytes, "pages": rendered.pages,
+                  "engine": engine, "warnings": rendered.warnings, "timings": rendered.timings,
+                  "duration_ms": round((time.monotonic() - started) * 1000)}
+        if cache is not None:
+            cache.put(key, rendered.pdf_bytes, {"pages": rendered.pages, "warnings": rendered.warnings})
+            result["cache"] = "miss"
+        return result
+
+
+class _HTTPHandler:
+    """The request handling half of the HTTP handler; serve_http mixes it into
+    http.server's BaseHTTPRequestHandler, so only --http mode imports the server stack."""
+
+    server_version = "md-to-pdf"
+    render_queue = None  # set by serve_http
+    max_body = 0         # bytes; set by serve_http
+
+    def do_POST(self):  # noqa: N802 -- BaseHTTPRequestHandler naming
+        import queue
+
+        if self.path.split("?", 1)[0] not in ("/", "/render"):
+            return self._reply_json(404, {"status": "FAILED", "error": f"no such endpoint: {self.path}"})
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._reply_json(400, {"status": "FAILED",
+                                          "error": "a non-negative Content-Length is required"})
+        if length > self.max_body:
+            self.close_connection = True  # the unread body must not be parsed as a next request
+            return self._reply_json(413, {"status": "FAILED",
+                                          "error": f"request body over {self.max_body} bytes"})
+        try:
+            request = http_request(self.rfile.read(length))
+        except ValueError as exc:
+            return self._reply_json(400, {"status": "FAILED", "error": str(exc)})
+        try:
+            future, coalesced = self.render_queue.submit(request)
+        except queue.Full:
+            return self._reply_json(503, {"status": "FAILED", "error": "render queue is full"},
+                                    {"Retry-After": "1"})
+        result = future.result()
+        headers = {
+            "X-Status": result["status"], "X-Duration-Ms": str(result.get("duration_ms", 0)),
+            "X-Coalesced": "1" if coalesced else "0",
+            "X-Warnings": json.dumps(result.get("warnings", [])),
+        }
+        if result["status"] != "OK":
+            return self._reply_json(422, {k: v for k, v in result.items() if k != "pdf"}, headers)
+        headers.update({
+            "X-Pages": str(result["pages"]), "X-Size": _size_kb(len(result["pdf"])),
+            "X-Engine": result["engine"], "X-Timings": json.dumps(result.get("timings", {})),
+        })
+        if result.get("cache"):
+            headers["X-Cache"] = result["cache"].upper()
+        self._reply(200, "application/pdf", result["pdf"], headers)
+
+    def _reply_json(self, code: int, payload: dict, headers=None):
+        self._reply(code, "application/json", json.dumps(payload).encode("utf-8"), headers)
+
+    def _reply(self, code: int, content_type: str, body: bytes, headers=None):
+        try:
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass
+
+    def log_message(self, format, *args):  # noqa: A002 -- keep stdout to the status contract
+        sys.stderr.write(f"HTTP={self.address_string()} {format % args}\n")
+
+
+def serve_http(address, args):
+    """Serve POST /render on (host, port) until interrupted; --jobs renders run at once."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    warm_engines(args.config, args.pygments_theme)
+    handler = type("Handler", (_HTTPHandler, BaseHTTPRequestHandler), {
+        "render_queue": RenderQueue(args, args.jobs, args.queue_depth),
+        "max_body": args.max_body_kb * 1024})
+    server = ThreadingHTTPServer(address, handler)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # noqa: ARG005
+    host, port = server.server_address[:2]
+    try:
+        print("STATUS=SERVING")
+        print(f"URL=http://{host}:{port}/render", flush=True)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main():
+    args = parse_args()
+
+    if args.warm_cache:
+        try:
+            faces = warm_font_cache(load_config(args.config).get("fonts"))
+        except Exception as exc:
+            print_failure(str(exc))
+            sys.exit(1)
+        print("STATUS=OK")
+        print(f"FONTS={len(faces)}")
+        print(f"FONT_INDEX={len(font_index())}")
+        print(f"FONT_CACHE={font_cache_dir() or 'off'}")
+        return
+
+    if args.serve or args.http:
+        try:
+            if args.http:
+                serve_http(args.http, args)
+            else:
+                serve(args.socket, args.jobs)
+        except Exception as exc:
+            print_failure(str(exc))
+            sys.exit(1)
+        return
+
+    if args.manifest:
+        sys.exit(run_manifest(args, args.manifest))
+    if args.spool:
+        sys.exit(run_spool(args, args.spool))
+    if args.input is None:
+        sys.exit(run_batch(args, args.paths))
+
+    if "-" in (args.input, args.output):
+        sys.exit(run_stream(args))
+
+    job = job_from_args(args, args.input, args.output)
+    result = request_daemon(args.socket, job) if args.client else None
+    if result is None:
+        result = run_job(job)
+    status = _status_stream(args)
+    code = emit_result(result, status)
+    status.flush()
+    sys.exit(code)
 
 
 if __name__ == "__main__":
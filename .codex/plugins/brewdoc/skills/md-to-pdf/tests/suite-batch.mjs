@@ -0,0 +1,170 @@
+#!/usr/bin/env node
+/**
+ * suite-batch.mjs — multi-input batch mode of `md_to_pdf.py`: one status block
+ * per document plus a summary, failures isolated per document, the legacy
+ * `in.md out` form still meaning a single conversion, directory mode's
+ * mirrored layout with make-style up-to-date skipping (mtimes plus the build
+ * record of engine, theme, config and script beside each PDF), and `--shard K/N`
+ * splitting a tree into disjoint shards that together cover it.
+ *
+ * Engine-independent: every document here either fails before an engine renders
+ * it (missing source, output collision) or is skipped against a pre-dated PDF
+ * fixture; the up-to-date checks assert only WHICH documents were skipped, so
+ * the suite runs without reportlab or weasyprint installed.
+ *
+ * Self-contained: fixtures live under one mkdtemp base, removed at the end.
+ * Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, mkdirSync, writeFileSync, utimesSync, rmSync, realpathSync } from 'node:fs';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPT = join(HERE, '..', 'scripts', 'md_to_pdf.py');
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-b-')));
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function deepEqual(a, b) {
+  if (a === b) return true;
+  if (Array.isArray(a) && Array.isArray(b)) {
+    return a.length === b.length && a.every((v, i) => deepEqual(v, b[i]));
+  }
+  return false;
+}
+
+function check(name, actual, expected, message) {
+  if (deepEqual(actual, expected)) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const convert = (...args) => spawnSync('python3', [SCRIPT, ...args], { cwd: BASE, encoding: 'utf8', timeout: 60000 });
+/** stdout split into its blank-line separated blocks, each a list of lines. */
+const blocks = (out) => out.trim().split('\n\n').map((b) => b.split('\n'));
+
+mkdirSync(join(BASE, 'a'), { recursive: true });
+mkdirSync(join(BASE, 'b'), { recursive: true });
+
+// --- failures are isolated and summarised ---------------------------------
+const run = convert('gone-1.md', 'gone-2.md', 'gone-3.md', '--out-dir', 'build', '--jobs', '2');
+const got = blocks(run.stdout);
+check('batch-exit', run.status, 1, 'a batch with failed documents exits 1');
+check('block-count', got.length, 4, 'three document blocks plus the summary');
+check('blocks-attributed', got.slice(0, 3).map((b) => b[0]).sort(),
+  ['INPUT=gone-1.md', 'INPUT=gone-2.md', 'INPUT=gone-3.md'], 'each block opens with its INPUT= line');
+check('block-shape', got.slice(0, 3).map((b) => b.slice(1).join('|')).sort(), [
+  'STATUS=FAILED|ERROR=File not found: gone-1.md',
+  'STATUS=FAILED|ERROR=File not found: gone-2.md',
+  'STATUS=FAILED|ERROR=File not found: gone-3.md',
+], 'a failed document reports STATUS=FAILED and its own ERROR=');
+check('summary', got[3], ['BATCH=DONE', 'DOCUMENTS=3', 'CONVERTED=0', 'SKIPPED=0', 'FAILED=3'],
+  'the summary counts every document');
+
+// --- two inputs that map to one output ------------------------------------
+const clash = convert('a/same.md', 'b/same.md', '--out-dir', 'build');
+const clashBlocks = blocks(clash.stdout);
+check('collision-block', clashBlocks[0],
+  ['INPUT=b/same.md', 'STATUS=FAILED', 'ERROR=output build/same.pdf is already produced by a/same.md'],
+  'the second input claiming build/same.pdf is rejected before any conversion');
+check('collision-summary', clashBlocks[clashBlocks.length - 1],
+  ['BATCH=DONE', 'DOCUMENTS=2', 'CONVERTED=0', 'SKIPPED=0', 'FAILED=2'], 'the rejected duplicate is counted');
+
+// --- the legacy two-path form --------------------------------------------
+const single = convert('gone.md', 'out.pdf');
+check('legacy-single', single.stdout, 'STATUS=FAILED\n', '`in.md out.pdf` is still one document, no batch block');
+check('legacy-stderr', single.stderr, 'File not found: gone.md\n', 'the single-document failure text is unchanged');
+const bare = convert('gone.md', 'out');
+check('legacy-no-suffix', `${bare.stdout}${bare.stderr}`, 'STATUS=FAILED\nFile not found: gone.md\n',
+  '`in.md out` without a .pdf suffix is one document too, not a batch of two inputs');
+
+// --- directory mode: mirrored layout, up-to-date skipping ---------------
+// The script and styles/ are dependencies too, so fixture PDFs are dated after them: in the future.
+const DAY = 86400000;
+const OLD = new Date(Date.now() - DAY);
+const NEW = new Date(Date.now() + DAY);
+const put = (rel, body, when) => {
+  mkdirSync(dirname(join(BASE, rel)), { recursive: true });
+  writeFileSync(join(BASE, rel), body);
+  utimesSync(join(BASE, rel), when, when);
+};
+put('docs/index.md', '# Index\n', OLD);
+put('docs/guide/setup.md', '# Setup\n\n![diagram](img/flow.png)\n', OLD);
+put('docs/guide/img/flow.png', 'PNG', OLD);
+put('docs/.drafts/wip.md', '# WIP\n', OLD);
+// a fixture PDF counts as built by this script with the default engine only with its build record
+const IDENTITY = spawnSync('python3', ['-c', `import sys; sys.path.insert(0, ${JSON.stringify(dirname(SCRIPT))})
+import md_to_pdf
+print(md_to_pdf.build_identity({"engine": "reportlab", "pygments_theme": "github"}))`], { encoding: 'utf8' }).stdout.trim();
+const putPdf = (rel) => {
+  put(rel, 'PDF', NEW);
+  writeFileSync(join(BASE, dirname(rel), `.${rel.split('/').pop()}.build.json`), JSON.stringify({ build: IDENTITY }));
+};
+putPdf('pdf/index.pdf');
+putPdf('pdf/guide/setup.pdf');
+
+const skipped = (out) => blocks(out).filter((b) => b[1] === 'STATUS=SKIPPED').map((b) => b[0]).sort();
+const inputs = (out) => blocks(out).filter((b) => b[0].startsWith('INPUT=')).map((b) => b[0]).sort();
+
+const fresh = convert('docs', '--out-dir', 'pdf');
+check('tree-inputs', inputs(fresh.stdout), ['INPUT=docs/guide/setup.md', 'INPUT=docs/index.md'],
+  'the walk finds nested Markdown and ignores hidden directories');
+check('tree-all-skipped', skipped(fresh.stdout), ['INPUT=docs/guide/setup.md', 'INPUT=docs/index.md'],
+  'PDFs newer than every dependency are skipped');
+check('tree-skip-output', blocks(fresh.stdout).find((b) => b[0] === 'INPUT=docs/guide/setup.md'),
+  ['INPUT=docs/guide/setup.md', 'STATUS=SKIPPED', 'OUTPUT=pdf/guide/setup.pdf'],
+  'the output mirrors the source layout under --out-dir');
+check('tree-summary', blocks(fresh.stdout).pop().slice(0, 5),
+  ['BATCH=DONE', 'DOCUMENTS=2', 'CONVERTED=0', 'SKIPPED=2', 'FAILED=0'], 'skips are counted in the summary');
+
+utimesSync(join(BASE, 'docs/guide/img/flow.png'), NEW, new Date(Date.now() + 2 * DAY));
+const image = convert('docs', '--out-dir', 'pdf');
+check('image-dependency', skipped(image.stdout), ['INPUT=docs/index.md'],
+  'a referenced image newer than the PDF forces that document, and only that one');
+
+check('theme-ignored', skipped(convert('docs', '--out-dir', 'pdf', '--pygments-theme', 'monokai').stdout),
+  ['INPUT=docs/index.md'], 'the pygments theme does not matter to reportlab output');
+check('engine-change', skipped(convert('docs', '--out-dir', 'pdf', '--engine', 'weasyprint').stdout), [],
+  'a PDF built with another engine is reconverted even though it is newer than its sources');
+rmSync(join(BASE, 'pdf/.index.pdf.build.json'));
+check('no-record', skipped(convert('docs', '--out-dir', 'pdf').stdout), [],
+  'a PDF without a build record (older script, hand-made) is reconverted');
+
+const forced = convert('docs', '--out-dir', 'pdf', '--force');
+check('force', skipped(forced.stdout), [], '--force reconverts up-to-date documents');
+
+// --- sharding: disjoint, complete, stable -----------------------------------
+const NAMES = ['a.md', 'b.md', 'c/d.md', 'c/e.md', 'f/g/h.md', 'i.md', 'j.md', 'k/l.md'];
+for (const name of NAMES) {
+  put(`site/${name}`, `# ${name}\n${'x'.repeat(name.length * 40)}\n`, OLD);
+  putPdf(`site-pdf/${name.replace(/\.md$/, '.pdf')}`);
+}
+const shardOf = (k, ...extra) => inputs(convert('site', '--out-dir', 'site-pdf', '--shard', `${k}/3`, ...extra).stdout);
+const ALL = NAMES.map((n) => `INPUT=site/${n}`).sort();
+for (const mode of ['hash', 'size']) {
+  const shards = [1, 2, 3].map((k) => shardOf(k, '--shard-balance', mode));
+  check(`shard-${mode}-cover`, shards.flat().sort(), ALL, `${mode}: the three shards together cover the tree exactly once`);
+  check(`shard-${mode}-stable`, shardOf(2, '--shard-balance', mode), shards[1], `${mode}: a shard is the same on every run`);
+}
+const summary = blocks(convert('site', '--out-dir', 'site-pdf', '--shard', '3/3').stdout).pop();
+check('shard-summary', summary.includes('SHARD=3/3'), true, 'the summary names the shard it ran');
+check('shard-invalid', convert('site', '--shard', '4/3').status, 2, 'K > N is a usage error');
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
@@ -0,0 +1,164 @@
+#!/usr/bin/env node
+/**
+ * suite-cache.mjs — the `--cache-dir` render cache: a request whose key is
+ * already cached is answered from the cache (CACHE=HIT, cached page count and
+ * warnings replayed) without an engine, any input change is a different key,
+ * and eviction keeps the most recently used entries under the size cap.
+ * The parsed-font cache resolves its directory from the environment; pygments
+ * theme stylesheets are generated once and then read back from disk.
+ *
+ * Engine-independent: the cache is seeded through `render_key` and
+ * `RenderCache.publish` with a fixture PDF, so a hit never needs reportlab or
+ * weasyprint.
+ *
+ * Self-contained: fixtures live under one mkdtemp base, removed at the end.
+ * Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, writeFileSync, readFileSync, readdirSync, existsSync, rmSync, realpathSync } from 'node:fs';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+const SCRIPT = join(SCRIPTS, 'md_to_pdf.py');
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-c-')));
+const CACHE = join(BASE, 'cache');
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function deepEqual(a, b) {
+  if (a === b) return true;
+  if (Array.isArray(a) && Array.isArray(b)) {
+    return a.length === b.length && a.every((v, i) => deepEqual(v, b[i]));
+  }
+  return false;
+}
+
+function check(name, actual, expected, message) {
+  if (deepEqual(actual, expected)) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+/** Run a Python snippet with md_to_pdf importable; returns trimmed stdout. */
+function py(code, env = {}) {
+  const r = spawnSync('python3', ['-c', `import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})\nimport md_to_pdf as m\n${code}`],
+    { cwd: BASE, encoding: 'utf8', timeout: 30000, env: { ...process.env, ...env } });
+  return (r.stdout || '').trim() + (r.status === 0 ? '' : `!exit=${r.status} ${r.stderr}`);
+}
+const convert = (...args) => spawnSync('python3', [SCRIPT, ...args], { cwd: BASE, encoding: 'utf8', timeout: 30000 });
+
+writeFileSync(join(BASE, 'doc.md'), '# Cached\n\nbody\n');
+writeFileSync(join(BASE, 'fixture.pdf'), '%PDF-fixture');
+
+const JOB = `{"input": "doc.md", "output": "doc.pdf", "engine": "reportlab"}`;
+const key = py(`print(m.render_key(${JOB}, m.load_config()))`);
+check('key-shape', /^[0-9a-f]{64}$/.test(key), true, 'the render key is a sha256 hex digest');
+py(`m.RenderCache(${JSON.stringify(CACHE)}, 1 << 20).publish(${JSON.stringify(key)}, "fixture.pdf", {"pages": 3, "warnings": ["seeded"]})`);
+
+const hit = convert('doc.md', 'doc.pdf', '--cache-dir', CACHE);
+check('hit-stdout', hit.stdout, 'STATUS=OK\nOUTPUT=doc.pdf\nPAGES=3\nSIZE=0KB\nENGINE=reportlab\nCACHE=HIT\n',
+  'a cached key is answered with the cached page count and a CACHE=HIT line');
+check('hit-warnings', hit.stderr, 'WARN=seeded\n', 'the warnings of the original render are replayed');
+check('hit-bytes', existsSync(join(BASE, 'doc.pdf')) && readFileSync(join(BASE, 'doc.pdf'), 'utf8'), '%PDF-fixture',
+  'the output is a copy of the cached PDF');
+
+const keyOf = (config, md = 'doc.md') => py(`print(m.render_key({"input": "${md}", "output": "x.pdf", "engine": "reportlab"}, ${config}))`);
+check('config-changes-key', keyOf('{"page": {"size": "Letter"}}') === key, false, 'a different merged config is a different key');
+writeFileSync(join(BASE, 'other.md'), '# Cached\n\nbody!\n');
+check('markdown-changes-key', keyOf('m.load_config()', 'other.md') === key, false, 'different Markdown is a different key');
+check('weasyprint-changes-key',
+  py(`print(m.render_key({"input": "doc.md", "output": "x.pdf", "engine": "weasyprint"}, m.load_config()))`) === key,
+  false, 'the engine is part of the key');
+
+// a font installed where the index looks changes the key; needs one system font to copy
+const fontKeys = py(`
+import os, shutil
+fonts = ${JSON.stringify(join(BASE, 'fonts'))}
+os.makedirs(fonts, exist_ok=True)
+os.environ["MD_TO_PDF_FONT_DIRS"] = fonts
+source = next(iter(m.FontIndex.scan(None).files), None)
+before = m.render_key(${JOB}, m.load_config())
+if source:
+    shutil.copy(source, os.path.join(fonts, "Installed.ttf"))
+print(source is None or m.render_key(${JOB}, m.load_config()) != before)
+`, { MD_TO_PDF_FONT_CACHE: 'off' });
+check('fonts-change-key', fontKeys, 'True', 'installing a font is a different key (fonts_digest)');
+
+// --- LRU eviction under the size cap ----------------------------------------
+const evicted = py(`
+import os
+c = m.RenderCache(${JSON.stringify(join(BASE, "lru"))}, 40)
+for i, k in enumerate(["aa01", "bb02", "cc03"]):
+    c.publish(k, "fixture.pdf", {"pages": 1})
+    p, j = c._entry(k)
+    os.utime(p, (1000 + i, 1000 + i)); os.utime(j, (1000 + i, 1000 + i))
+print(c.fetch("aa01", "again.pdf") is not None)
+c.publish("dd04", "fixture.pdf", {"pages": 1})
+print(" ".join(sorted(p.stem for p in c.root.glob("??/*.pdf"))))
+`);
+check('lru', evicted, 'True\naa01 cc03 dd04', 'a fetch refreshes an entry, so the least recently used ones go first');
+
+const ledger = py(`
+import json
+c = m.RenderCache(${JSON.stringify(join(BASE, "ledger"))}, 40)
+walks = []
+evict = c.evict
+c.evict = lambda: walks.append(1) or evict()
+for k in ["aa01", "bb02", "cc03", "aa01"]:
+    c.publish(k, "fixture.pdf", {"pages": 1})
+used = json.loads((c.root / "usage.json").read_text())["bytes"]
+c.publish("dd04", "fixture.pdf", {"pages": 1})
+print(len(walks), used, json.loads((c.root / "usage.json").read_text())["bytes"])
+`);
+check('ledger', ledger, '2 36 36',
+  'puts under the cap update the size ledger without walking the cache; only the first put and the one crossing the cap walk it');
+
+// --- parsed-font cache location ----------------------------------------------
+const fontDir = (env) => spawnSync('python3', ['-c',
+  `import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})\nimport md_to_pdf as m\nprint(m.font_cache_dir())`],
+{ encoding: 'utf8', timeout: 30000, env: { ...process.env, MD_TO_PDF_FONT_CACHE: undefined, ...env } }).stdout.trim();
+check('font-cache-xdg', fontDir({ XDG_CACHE_HOME: BASE }), join(BASE, 'md-to-pdf', 'fonts'),
+  'the font cache defaults to $XDG_CACHE_HOME/md-to-pdf/fonts');
+check('font-cache-env', fontDir({ MD_TO_PDF_FONT_CACHE: join(BASE, 'fc') }), join(BASE, 'fc'),
+  '$MD_TO_PDF_FONT_CACHE overrides the location');
+check('font-cache-off', fontDir({ MD_TO_PDF_FONT_CACHE: 'off' }), 'None', '"off" disables the font cache');
+
+// --- pygments stylesheet cache ------------------------------------------------
+const STYLES = join(BASE, 'styles');
+const styled = (code) => spawnSync('python3', ['-c',
+  `import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})\nimport md_to_pdf as m\n${code}`],
+{ encoding: 'utf8', timeout: 30000, env: { ...process.env, MD_TO_PDF_STYLE_CACHE: STYLES } });
+if (spawnSync('python3', ['-c', 'import pygments']).status === 0) {
+  const first = styled('print(len(m.pygments_css("monokai")) > 0)');
+  check('pygments-generated', first.stdout.trim(), 'True', 'a theme stylesheet is generated on first use');
+  const entries = () => (existsSync(STYLES) ? readdirSync(STYLES).filter((f) => f.endsWith('.css')) : []);
+  check('pygments-on-disk', entries().length, 1, 'and written to the style cache');
+  const again = styled(`css = m.pygments_css("monokai")
+print(css == open(${JSON.stringify(STYLES)} + "/" + ${JSON.stringify(entries()[0] || '')}).read(), "pygments.formatters" in sys.modules)`);
+  check('pygments-disk-hit', again.stdout.trim(), 'True False', 'a later process reads it back without the formatter machinery');
+  const unknown = styled('a = m.pygments_css("no-such-theme"); b = m.pygments_css("no-such-theme")\nprint(a == m.pygments_css("default"))');
+  check('pygments-unknown', [unknown.stdout.trim(), unknown.stderr.trim()],
+    ['True', "WARN=unknown pygments theme 'no-such-theme'; using 'default'"],
+    'an unknown theme falls back to default with one warning per process');
+  check('pygments-unknown-not-cached', entries().length, 2, 'only the real default stylesheet joins the cache');
+}
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
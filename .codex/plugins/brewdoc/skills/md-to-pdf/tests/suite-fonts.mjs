@@ -0,0 +1,277 @@
+#!/usr/bin/env node
+/**
+ * suite-fonts.mjs — the system font index: faces are read from the sfnt
+ * name/OS/2/post/cmap tables, the config's `fonts.body` / `fonts.heading` /
+ * `fonts.code` resolve by family name (missing styles fall back within the
+ * family, unknown families to the automatic choice), and the index on disk is
+ * trusted until a scanned directory changes, as is a RenderProfile built
+ * against it. FontFallback wraps the
+ * characters a face lacks in <font face> runs of the first fallback family
+ * whose coverage bitmap has them, in the style in effect. Font files are
+ * mapped read-only once per process, and font_memory() reports the resident
+ * size of those mappings. Cache files are written atomically and a failed
+ * write leaves no temp file; a parsed-face cache entry that cannot be stored
+ * or restored falls back to a plain parse.
+ *
+ * Engine-independent: the fixture fonts are header-only sfnt files written by
+ * struct (name, OS/2, post, a format 4 cmap and an empty glyf table), and
+ * fallback registration is replaced in the snippet, so nothing is parsed by
+ * reportlab. Only the parsed-face cache checks need reportlab and a system
+ * font; without them they are skipped.
+ *
+ * Self-contained: fixtures live under one mkdtemp base, removed at the end.
+ * Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, mkdirSync, readFileSync, writeFileSync, existsSync, rmSync, realpathSync } from 'node:fs';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-f-')));
+const FONTS = join(BASE, 'fonts');
+const CACHE = join(BASE, 'cache');
+mkdirSync(FONTS);
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function deepEqual(a, b) {
+  if (a === b) return true;
+  if (Array.isArray(a) && Array.isArray(b)) {
+    return a.length === b.length && a.every((v, i) => deepEqual(v, b[i]));
+  }
+  return false;
+}
+
+function check(name, actual, expected, message) {
+  if (deepEqual(actual, expected)) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+/** Run a Python snippet with md_to_pdf importable, the fixture dir indexed; returns trimmed stdout. */
+function py(code) {
+  const r = spawnSync('python3', ['-c', `import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})\nimport md_to_pdf as m\n${code}`],
+    { cwd: BASE, encoding: 'utf8', timeout: 30000,
+      env: { ...process.env, MD_TO_PDF_FONT_DIRS: FONTS, MD_TO_PDF_FONT_CACHE: CACHE } });
+  return (r.stdout || '').trim() + (r.status === 0 ? '' : `!exit=${r.status} ${r.stderr}`);
+}
+
+/**
+ * Write a header-only TrueType file: family/style names, weight, fsSelection, isFixedPitch,
+ * and a format 4 cmap mapping `ranges` ([start, end] by delta, [start, end, holes] by glyph array).
+ */
+function makeFont(file, family, style, weight, selection, mono = false, ranges = [[0x20, 0x7e]]) {
+  const out = py(`
+import struct
+def name_table(records):
+    data, entries = b"", []
+    for name_id, text in records:
+        raw = text.encode("utf-16-be")
+        entries.append(struct.pack(">HHHHHH", 3, 1, 0x409, name_id, len(raw), len(data)))
+        data += raw
+    return struct.pack(">HHH", 0, len(records), 6 + 12 * len(records)) + b"".join(entries) + data
+ps = ${JSON.stringify(family)}.replace(" ", "") + ("" if ${JSON.stringify(style)} == "Regular" else "-" + ${JSON.stringify(style)}.replace(" ", ""))
+os2 = bytearray(78)
+struct.pack_into(">H", os2, 4, ${weight})
+struct.pack_into(">4I", os2, 42, 1, 0, 0, 0)
+struct.pack_into(">H", os2, 62, ${selection})
+post = struct.pack(">IiiI", 0x00030000, 0, 0, ${mono ? 1 : 0}) + bytes(16)
+segs = ${JSON.stringify(ranges)} + [[0xFFFF, 0xFFFF]]
+n, deltas, offsets, glyphs = len(segs), [], [], []
+for i, seg in enumerate(segs):
+    if len(seg) == 3:  # mapped through the glyph array; holes map to glyph 0
+        deltas.append(0)
+        offsets.append(2 * (n - i) + 2 * len(glyphs))
+        glyphs += [0 if cp in seg[2] else 1 for cp in range(seg[0], seg[1] + 1)]
+    else:
+        deltas.append(1)
+        offsets.append(0)
+arrays = struct.pack(f">{n}H", *[s[1] for s in segs]) + bytes(2) + struct.pack(f">{n}H", *[s[0] for s in segs])
+arrays += struct.pack(f">{n}h", *deltas) + struct.pack(f">{n}H", *offsets) + struct.pack(f">{len(glyphs)}H", *glyphs)
+fmt4 = struct.pack(">7H", 4, 14 + len(arrays), 0, 2 * n, 0, 0, 0) + arrays
+cmap = struct.pack(">HHHHI", 0, 1, 3, 1, 12) + fmt4
+tables = {b"OS/2": bytes(os2), b"cmap": cmap, b"glyf": bytes(4), b"name": name_table([(1, ${JSON.stringify(family)}), (2, ${JSON.stringify(style)}), (6, ps)]), b"post": post}
+offset = 12 + 16 * len(tables)
+head, body = struct.pack(">IHHHH", 0x00010000, len(tables), 0, 0, 0), b""
+for tag, data in sorted(tables.items()):
+    head += struct.pack(">4sIII", tag, 0, offset + len(body), len(data))
+    body += data + bytes(-len(data) % 4)
+open(${JSON.stringify(join(FONTS, file))}, "wb").write(head + body)
+print("ok")`);
+  if (out !== 'ok') throw new Error(`fixture ${file}: ${out}`);
+}
+
+makeFont('BrewTestSans.ttf', 'Brew Test Sans', 'Regular', 400, 0x40);
+makeFont('BrewTestSans-Bold.ttf', 'Brew Test Sans', 'Bold', 700, 0x20);
+makeFont('BrewTestMono.ttf', 'Brew Test Mono', 'Regular', 400, 0x40, true);
+makeFont('BrewTestCyr.ttf', 'Brew Test Cyr', 'Regular', 400, 0x40, false, [[0x20, 0x7e], [0x410, 0x44f, [0x42a]]]);
+writeFileSync(join(FONTS, 'notes.txt'), 'not a font');
+writeFileSync(join(FONTS, 'Broken.ttf'), 'not an sfnt either');
+
+// --- Face metadata -----------------------------------------------------------------------------
+
+check('faces-read',
+  py(`f = m.read_font_faces(${JSON.stringify(join(FONTS, 'BrewTestSans-Bold.ttf'))})[0]
+print(f["family"], f["style"], f["ps_name"], f["weight"], f["bold"], f["italic"], f["mono"], f["index"])`),
+  'Brew Test Sans Bold BrewTestSans-Bold 700 True False False None',
+  'family, style, PostScript name, weight and flags come from the name/OS/2/post tables');
+check('mono-flag', py(`print(m.read_font_faces(${JSON.stringify(join(FONTS, 'BrewTestMono.ttf'))})[0]["mono"])`), 'True',
+  'post.isFixedPitch marks a monospaced face');
+
+check('coverage',
+  py(`f = m.read_font_faces(${JSON.stringify(join(FONTS, 'BrewTestCyr.ttf'))})[0]
+c = m.FontCoverage.decode(f["coverage"])
+print(f["glyphs"], ord("A") in c, ord("Ж") in c, 0x42a in c, ord("中") in c)`),
+  '158 True True False False', 'the cmap is a coverage bitmap: delta segments, glyph-array segments and their holes');
+
+// --- Resolution ----------------------------------------------------------------------------------
+
+const detect = (fonts, keys) => py(`i = m.detect_fonts(${fonts})
+print(" ".join(str(i[k]) for k in ${JSON.stringify(keys)}))`);
+check('named-family', detect('{"body": "Brew Test Sans"}', ['body', 'bold', 'italic', 'boldItalic']),
+  'BrewTestSans BrewTestSans-Bold BrewTestSans-Italic BrewTestSans-BoldItalic',
+  'missing italic styles get role-specific names within the family');
+check('fallback-files',
+  py(`i = m.detect_fonts({"body": "brew-test-sans"})
+print(" ".join(p.rsplit("/", 1)[1] for n, p, x in i["_entries"]))`),
+  'BrewTestSans.ttf BrewTestSans-Bold.ttf BrewTestSans.ttf BrewTestSans-Bold.ttf',
+  'italic falls back to the regular file, bold italic to the bold file; names match loosely');
+check('heading-default', detect('{"body": "Brew Test Sans"}', ['heading']), 'BrewTestSans-Bold',
+  'heading "auto" is the bold body face');
+check('code-named', detect('{"body": "Brew Test Sans", "code": "Brew Test Mono"}', ['code', 'codeBold']),
+  'BrewTestMono BrewTestMono-Bold', 'fonts.code names a family; its missing bold reuses the regular file');
+check('code-monospace', detect('{"code": "monospace"}', ['code', 'codeBold']), 'Courier Courier-Bold',
+  '"monospace" keeps the built-in Courier');
+check('unknown-family', detect('{"body": "No Such Family"}', ['body']) === detect('{}', ['body']), true,
+  'an unknown family falls back to the automatic choice');
+
+// --- Fallback runs ------------------------------------------------------------------------------
+
+const fallback = (fonts, ...calls) => py(`m.register_detected_fonts = lambda info: None  # header-only fixtures
+f = m.FontFallback.of(m.detect_fonts(${fonts}))
+${calls.map((c) => `print(repr(f.apply(${c})))`).join('\n')}`);
+const CYR = '{"body": "Brew Test Sans", "fallback": ["Brew Test Cyr"]}';
+check('fallback-run', fallback(CYR, '"Ab Жж", "BrewTestSans"'), `'Ab <font face="BrewTestCyr">Жж</font>'`,
+  'a run the body font lacks is set in the first fallback family that has it');
+check('fallback-style', fallback(CYR, '"<b>Ж</b> <i>Ж</i>", "BrewTestSans"', '"Ж", "BrewTestSans-Bold"'),
+  `'<b><font face="BrewTestCyr-Bold">Ж</font></b> <i><font face="BrewTestCyr-Italic">Ж</font></i>'
+'<font face="BrewTestCyr-Bold">Ж</font>'`,
+  'the fallback face follows <b>/<i> and the style of the paragraph font');
+check('fallback-code-span', fallback(CYR, `'<font face="Courier-Bold">é Ж</font>', "BrewTestSans"`),
+  `'<font face="Courier-Bold">é <font face="BrewTestCyr-Bold">Ж</font></font>'`,
+  'built-in faces cover WinAnsi; the nested face is the bold the code font implies');
+check('fallback-uncovered', fallback(CYR, '"\\u042a 中", "BrewTestSans"'), `'Ъ 中'`,
+  'characters no family has are left to the paragraph font');
+check('fallback-off', fallback('{"body": "Brew Test Sans", "fallback": []}', '"Жж", "BrewTestSans"'), `'Жж'`,
+  'an empty fallback list disables fallback runs');
+check('fallback-ascii', py(`f = m.FontFallback.of(m.detect_fonts({"body": "Brew Test Sans"}))
+s = "<b>plain</b> ASCII &amp; markup"
+print(f.apply(s, "BrewTestSans") is s)`), 'True', 'pure-ASCII markup is returned as is');
+
+// --- Mapped font files ------------------------------------------------------------------------
+
+const SANS = JSON.stringify(join(FONTS, 'BrewTestSans.ttf'));
+check('mmap-shared', py(`import mmap
+a, b = m.map_font_file(${SANS}), m.map_font_file(${SANS})
+print(a is b, isinstance(a, mmap.mmap), a[:4] == open(${SANS}, "rb").read(4))`), 'True True True',
+  'a font file is mapped once per process and reads like the file');
+writeFileSync(join(FONTS, 'Empty.ttf'), '');
+check('mmap-empty', py(`print(repr(m.map_font_file(${JSON.stringify(join(FONTS, 'Empty.ttf'))})))`), "b''",
+  'a file that cannot be mapped is read instead');
+if (process.platform === 'linux') {
+  check('font-memory', py(`data = m.map_font_file(${SANS}); data[0]
+r = m.font_memory()
+print(r["files"], r["rss"] > 0, r["rss"] == r["shared"] + r["private"])
+m.print_font_memory({"pid": 7, "files": 1, "rss": 8, "pss": 4, "shared": 8, "private": 0})`),
+  '1 True True\nFONT_MEMORY=pid=7 files=1 rss=8KB pss=4KB shared=8KB private=0KB',
+  'smaps attributes the touched pages of mapped font files; the status line carries the report');
+}
+rmSync(join(FONTS, 'Empty.ttf'));
+
+// --- Index persistence ------------------------------------------------------------------------
+
+py('m.font_index()');
+const INDEX = join(CACHE, 'index.json');
+check('index-written', existsSync(INDEX), true, 'the index is persisted in the font cache directory');
+const data = JSON.parse(readFileSync(INDEX, 'utf8'));
+check('index-skips', Object.keys(data.files).some((p) => p.endsWith('notes.txt') || p.endsWith('Broken.ttf')), false,
+  'non-font and unreadable files are not indexed');
+// a tampered record is served while the directories are unchanged: proof the scan was skipped
+// (rewritten from Python: JSON.parse would round the nanosecond mtimes)
+py(`import json
+data = json.load(open(${JSON.stringify(INDEX)}))
+data["files"][${JSON.stringify(join(FONTS, 'BrewTestMono.ttf'))}]["faces"][0]["family"] = "Renamed Mono"
+json.dump(data, open(${JSON.stringify(INDEX)}, "w"))`);
+check('index-trusted', detect('{"code": "Renamed Mono"}', ['code']), 'BrewTestMono',
+  'an unchanged tree is resolved from the index without rescanning');
+makeFont('BrewTestSerif.ttf', 'Brew Test Serif', 'Regular', 400, 0x40);
+check('index-refreshed', detect('{"body": "Brew Test Serif"}', ['body']), 'BrewTestSerif',
+  'a new file changes the directory mtime and the index is rebuilt');
+check('profile-fonts', py(`import os, shutil
+cfg = m.load_config()
+a = m.RenderProfile.of(cfg)
+saved = os.path.join(${JSON.stringify(BASE)}, "profile.pickle")
+a.save(saved)
+same = m.RenderProfile.of(cfg)
+shutil.copy(${JSON.stringify(join(FONTS, 'BrewTestSans.ttf'))}, ${JSON.stringify(join(FONTS, 'BrewTestExtra.ttf'))})
+b = m.RenderProfile.of(cfg)
+print(same is a, b is not a, m.RenderProfile.of(cfg) is b, m.RenderProfile.load(saved))`), 'True True True None',
+  'a cached or saved profile is rebuilt once a font is installed, so long-lived workers see it');
+
+// --- Atomic cache writes ----------------------------------------------------------------------
+
+const ATOMIC = JSON.stringify(join(BASE, 'atomic'));
+check('atomic-cleanup', py(`import os
+os.makedirs(${ATOMIC})
+target = os.path.join(${ATOMIC}, "data.json")
+m._write_json_atomic(target, {"a": 1})
+try:
+    m._write_json_atomic(target, {"a": object()})
+except TypeError:
+    pass
+print(sorted(os.listdir(${ATOMIC})), open(target).read())`), `['data.json'] {"a": 1}`,
+  'a failed write removes its temp file and leaves the previous file in place');
+
+if (spawnSync('python3', ['-c', 'import reportlab']).status === 0) {
+  const faceCache = py(`import os, pickle
+os.environ.pop("MD_TO_PDF_FONT_DIRS")  # a real system font: the fixtures do not parse
+source = next((p for p in m.FontIndex.scan(None).files if p.lower().endswith(".ttf")), None)
+if source is None:
+    print("skip")
+else:
+    real_dump = pickle.dump
+    def failing_dump(*args, **kwargs):
+        raise pickle.PicklingError("cannot pickle this face")
+    pickle.dump = failing_dump
+    stored = m.load_ttfont("StoreFails", source)
+    pickle.dump = real_dump
+    leftovers = [f for f in os.listdir(${JSON.stringify(CACHE)}) if f.startswith(".md-to-pdf-")]
+    entry = m._font_cache_entry(m.font_cache_dir(), source, None)
+    entry.write_bytes(pickle.dumps({"unitsPerEm": "not a number"}))
+    restored = m.load_ttfont("RestoreFails", source)
+    print(stored.face.name == restored.face.name, leftovers, restored.fontName)`);
+  if (faceCache !== 'skip') {
+    check('face-cache-fallback', faceCache, 'True [] RestoreFails',
+      'a face that fails to store or restore is parsed normally, and no temp file is left');
+  }
+}
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
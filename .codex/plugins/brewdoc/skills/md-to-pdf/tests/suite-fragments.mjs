@@ -0,0 +1,129 @@
+#!/usr/bin/env node
+/**
+ * suite-fragments.mjs — the reportlab engine's paragraph fragment cache:
+ * `FragmentCache.paragraph()` parses each (markup, style) pair once and builds
+ * later Paragraphs from the stored fragments, `inline_markup()` memoizes its
+ * markup in the same bounded LRU (the shared `LRUCache`), and `render()` reports
+ * `fragment_hits` / `fragment_misses` in its timings, which manifest records
+ * carry while the status block stays at its contract lines. Cached and uncached
+ * renders give the same PDF.
+ *
+ * Engine-dependent: every check but the LRUCache one needs reportlab; without
+ * it only that check runs.
+ *
+ * Self-contained: besides test/test-all-elements.md, fixtures live under one
+ * mkdtemp base, removed at the end. Assertion policy: unconditional
+ * exact-equality checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, writeFileSync, rmSync } from 'node:fs';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+const SCRIPT = join(SCRIPTS, 'md_to_pdf.py');
+const ALL_ELEMENTS = join(HERE, '..', 'test', 'test-all-elements.md');
+const BASE = mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-f-'));
+const TABLE = '| Status | Done |\n|---|---|\n' + '| Yes | N/A |\n'.repeat(50);
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const py = (code) => spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+${code}
+`], { encoding: 'utf8', timeout: 60000, env: { ...process.env, MD_TO_PDF_BLOCK_CACHE: 'off' } });
+
+const helper = py(`
+cache = md_to_pdf.LRUCache(2)
+cache.put("a", 1); cache.put("b", None); cache.get("a"); cache.put("c", 3)
+print(list(cache.entries), cache.get("b", "gone"), cache.hits, cache.misses, len(cache))
+`);
+check('lru-helper', helper.stdout.trim(), "['a', 'c'] gone 1 1 2",
+  'a get() refreshes its key, the least recently used key is dropped, lookups are counted');
+
+if (spawnSync('python3', ['-c', 'import reportlab']).status === 0) {
+  const same = py(`
+import re
+text = open(${JSON.stringify(ALL_ELEMENTS)}, encoding="utf-8").read()
+def pdf():
+    data = md_to_pdf.render(text).pdf_bytes
+    return re.sub(rb"/(CreationDate|ModDate) \\(D:[^)]*\\)|/ID\\s*\\[[^\\]]*\\]", b"", data)
+cached = md_to_pdf._fragments
+first, second = pdf(), pdf()
+md_to_pdf._fragments = md_to_pdf.FragmentCache(max_entries=0)
+uncached = pdf()
+print(first == uncached, second == uncached, cached.hits > 0, len(md_to_pdf._fragments.entries))
+`);
+  check('same-pdf', same.stdout.trim(), 'True True True 0',
+    'cold, warm and disabled fragment caches render byte-identical PDFs');
+
+  const counts = py(`
+text = "| Status | Done |\\n|---|---|\\n" + "| Yes | N/A |\\n" * 50
+first = md_to_pdf.render(text).timings
+second = md_to_pdf.render(text).timings
+print(first["fragment_hits"], first["fragment_misses"], second["fragment_hits"], second["fragment_misses"])
+`);
+  check('timings', counts.stdout.trim(), '98 4 102 0',
+    'repeated cells parse once per style; a second render parses nothing');
+
+  const lru = py(`
+style = md_to_pdf.RenderProfile.of(md_to_pdf.load_config()).prepare_reportlab().styles["Normal"]
+cache = md_to_pdf.FragmentCache(max_entries=2)
+a = cache.paragraph("<b>a</b>", style)
+a.wrap(100, 100)
+a.frags[0].text = "laid out"
+cache.paragraph("b", style)
+a2 = cache.paragraph("<b>a</b>", style)
+cache.paragraph("c", style)
+print(a2.text == a.text, a2.frags[0].text, a2.frags[0] is not a.frags[0], hasattr(a2.frags[0], "_fkind"),
+      sorted(k[0] for k in cache.entries), cache.hits, cache.misses)
+`);
+  check('lru', lru.stdout.trim(), "True a True False ['<b>a</b>', 'c'] 1 3",
+    'a hit gets fresh clones no earlier layout touched; the least recently used pair is dropped at the bound');
+
+  const markup = py(`
+profile = md_to_pdf.RenderProfile.of(md_to_pdf.load_config()).prepare_reportlab()
+style = profile.styles["TableCell"]
+first = md_to_pdf.inline_markup("**Yes** \`ok\`", style)
+print(md_to_pdf.inline_markup("**Yes** \`ok\`", style) is first, first == md_to_pdf.safe_xml("**Yes** \`ok\`"))
+`);
+  check('markup', markup.stdout.trim(), 'True True', 'repeated inline text skips safe_xml and returns the memoized markup');
+
+  writeFileSync(join(BASE, 'a.md'), TABLE);
+  writeFileSync(join(BASE, 'b.md'), TABLE);
+  const cli = spawnSync('python3', [SCRIPT, 'a.md'], { cwd: BASE, encoding: 'utf8', timeout: 60000 });
+  check('cli-lines', cli.stdout.split('\n').filter(Boolean).map((l) => l.split('=')[0]).join(' '),
+    'STATUS OUTPUT PAGES SIZE ENGINE', 'a single conversion prints only the five contract lines');
+  writeFileSync(join(BASE, 'jobs.ndjson'), '{"input": "a.md"}\n{"input": "b.md"}\n');
+  const manifest = spawnSync('python3', [SCRIPT, '--manifest', 'jobs.ndjson', '--out-dir', 'out', '--jobs', '1'],
+    { cwd: BASE, encoding: 'utf8', timeout: 60000 });
+  check('manifest-records', manifest.stdout.trim().split('\n').map((l) => JSON.parse(l))
+    .map((r) => `${r.fragment_hits}/${r.fragment_misses}`).join(' '),
+    '98/4 98/4', 'each manifest record carries the fragment counters of its render');
+}
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
@@ -0,0 +1,92 @@
+#!/usr/bin/env node
+/**
+ * suite-manifest.mjs — `md_to_pdf.py --manifest`: NDJSON jobs in, exactly one
+ * NDJSON result per job out, bad lines reported by line number without
+ * stopping the rest, and the exit code reflecting any failure.
+ *
+ * Engine-independent: every job here is rejected or fails before an engine
+ * renders it, so the suite runs without reportlab or weasyprint installed.
+ *
+ * Self-contained: fixtures live under one mkdtemp base, removed at the end.
+ * Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, writeFileSync, rmSync, realpathSync } from 'node:fs';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPT = join(HERE, '..', 'scripts', 'md_to_pdf.py');
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-m-')));
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function deepEqual(a, b) {
+  if (a === b) return true;
+  if (Array.isArray(a) && Array.isArray(b)) {
+    return a.length === b.length && a.every((v, i) => deepEqual(v, b[i]));
+  }
+  return false;
+}
+
+function check(name, actual, expected, message) {
+  if (deepEqual(actual, expected)) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const MANIFEST = [
+  JSON.stringify({ input: 'gone.md', engine: 'reportlab', overrides: { page: { size: 'Letter' } } }),
+  '',
+  'not json',
+  JSON.stringify({ input: 'x.md', colour: 'red' }),
+  JSON.stringify({ input: 'x.md', engine: 'latex' }),
+  JSON.stringify({ input: 'x.md', overrides: 'Letter' }),
+  JSON.stringify({ output: 'y.pdf' }),
+].join('\n');
+writeFileSync(join(BASE, 'jobs.ndjson'), `${MANIFEST}\n`);
+
+const run = (...args) => spawnSync('python3', [SCRIPT, ...args], {
+  cwd: BASE, encoding: 'utf8', timeout: 60000, input: `${MANIFEST}\n`,
+});
+const parse = (out) => out.split('\n').filter((l) => l !== '').map((l) => JSON.parse(l));
+
+const file = run('--manifest', 'jobs.ndjson');
+const records = parse(file.stdout);
+check('exit', file.status, 1, 'a manifest with failed jobs exits 1');
+check('one-per-job', records.length, 6, 'one result line per non-blank manifest line');
+
+const rejected = records.filter((r) => 'line' in r).map((r) => `${r.line}:${r.error}`).sort();
+check('rejections', rejected.map((r) => r.replace(/^(\d+:invalid JSON):.*$/, '$1')), [
+  '3:invalid JSON',
+  '4:unknown manifest keys: colour',
+  '5:unknown engine: latex',
+  '6:"overrides" must be an object',
+  '7:a manifest line must be an object with an "input" path',
+], 'each bad line is reported with its line number and reason');
+
+const job = records.find((r) => r.input === 'gone.md');
+check('job-fields', job && Object.keys(job), ['input', 'status', 'error', 'duration_ms', 'warnings'],
+  'a failed job carries status, error, duration and its own warnings');
+check('job-error', job && job.error, 'File not found: gone.md', 'the job error is attributed to that job');
+
+const stdin = run('--manifest', '-');
+check('stdin', parse(stdin.stdout).length, 6, '"-" reads the manifest from stdin');
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
@@ -0,0 +1,141 @@
+#!/usr/bin/env node
+/**
+ * suite-markdown.mjs — the weasyprint engine's Markdown front end:
+ * `markdown_extensions()` prunes extensions whose syntax a document lacks,
+ * `markdown_to_html()` reuses one reset markdown.Markdown per extension set
+ * and thread, and neither changes the HTML `markdown.markdown()` produces with
+ * the full extension list. Unlabelled code blocks get their language from
+ * `CodeLanguages` (hints, signatures, then a budgeted `guess_lexer`).
+ *
+ * Engine-independent: only the `markdown` package is needed (weasyprint
+ * itself is never imported); without it the suite checks nothing and passes.
+ * The detection checks also need pygments.
+ *
+ * Self-contained: no fixtures. Assertion policy: unconditional exact-equality
+ * checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { join, dirname } from 'node:path';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+const ALL_ELEMENTS = join(HERE, '..', 'test', 'test-all-elements.md');
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const py = (code) => spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+${code}
+`], { encoding: 'utf8', timeout: 60000 });
+
+if (spawnSync('python3', ['-c', 'import markdown']).status === 0) {
+  const pruned = py(`
+for text in ["# Plain\\n\\nJust *text*.\\n", "| a |\\n|---|\\n| 1 |\\n\\n\`\`\`\\nx\\n\`\`\`\\n",
+             "Term\\n:   definition\\n\\nNote[^1]\\n\\n[^1]: the note\\n", "para\\n\\n    indented code\\n"]:
+    print(" ".join(md_to_pdf.markdown_extensions(text)))
+`);
+  check('pruning', pruned.stdout.trim(), [
+    'toc sane_lists smarty',
+    'tables fenced_code codehilite toc sane_lists smarty',
+    'footnotes toc def_list sane_lists smarty',
+    'codehilite toc sane_lists smarty',
+  ].join('\n'), 'only extensions whose syntax occurs are loaded; indented code keeps codehilite');
+
+  const same = py(`
+import markdown
+full = dict(extensions=list(md_to_pdf.MARKDOWN_EXTENSIONS), extension_configs=md_to_pdf.MARKDOWN_EXTENSION_CONFIGS)
+docs = [open(${JSON.stringify(ALL_ELEMENTS)}, encoding="utf-8").read(), "# Plain\\n\\nJust *text* -- 'quoted'.\\n",
+        "Note[^a]\\n\\n[^a]: first\\n", "Other[^a]\\n\\n[^a]: second\\n"]
+print(all(md_to_pdf.markdown_to_html(d) == markdown.markdown(d, **full) for d in docs + docs))
+`);
+  check('same-html', same.stdout.trim(), 'True',
+    'pruned, reused instances give the HTML of a fresh full pipeline, footnotes reset between documents');
+
+  const reused = py(`
+a = md_to_pdf.markdown_to_html("# One\\n")
+inst = dict(md_to_pdf._markdown_local.instances)
+b = md_to_pdf.markdown_to_html("# Two\\n")
+print(len(inst), list(md_to_pdf._markdown_local.instances.values())[0] is list(inst.values())[0])
+`);
+  check('reused', reused.stdout.trim(), '1 True', 'documents with the same extension set share one Markdown instance');
+}
+
+if (spawnSync('python3', ['-c', 'import markdown, pygments']).status === 0) {
+  const detect = py(`
+samples = ["#!/usr/bin/env python3\\nprint(1)\\n", "#!/bin/sh\\nls\\n", "# file: deploy/app.yml\\nx: 1\\n",
+           "// Dockerfile\\n", "$ npm install\\n", "{\\n  \\"a\\": 1\\n}\\n", "SELECT id\\nFROM users;\\n",
+           "package main\\n\\nfunc main() {}\\n", "name: ci\\non:\\n  push:\\n", "[tool.x]\\nname = 1\\n",
+           "just some words\\n"]
+print(" ".join(str(md_to_pdf.code_hint_language(c) or md_to_pdf.code_signature_language(c)) for c in samples))
+`);
+  check('detect', detect.stdout.trim(),
+    'python bash yaml docker console json sql go yaml toml None',
+    'shebangs, first-line file names and the signature table name the language without pygments');
+
+  const labels = py(`
+import re
+src = open(${JSON.stringify(ALL_ELEMENTS)}, encoding="utf-8").read()
+bare = re.sub(r"^\`\`\`\\w+$", "\`\`\`", src, flags=re.M)
+print(bare != src, md_to_pdf.markdown_to_html(bare) == md_to_pdf.markdown_to_html(src))
+`);
+  check('unlabelled', labels.stdout.trim(), 'True True',
+    'test-all-elements.md with its fence languages removed highlights exactly as labelled');
+
+  const budget = py(`
+langs = md_to_pdf.CodeLanguages(guess_budget_ms=0)
+off = langs.detect("x <- c(1, 2)\\nplot(x)\\n"), langs.guesses
+langs = md_to_pdf.CodeLanguages(guess_budget_ms=1)
+langs.spent_ms = 1.0
+spent = langs.detect("x <- c(1, 2)\\n"), langs.guesses
+langs.reset()
+print(langs.spent_ms, end=" ")
+langs = md_to_pdf.CodeLanguages(guess_budget_ms=None)
+langs.detect("x <- c(1, 2)\\n")
+langs.detect("x <- c(1, 2)\\n")
+print(off, spent, langs.guesses, len(md_to_pdf._guessed_langs))
+`);
+  check('budget', budget.stdout.trim(), '0.0 (None, 0) (None, 0) 2 1',
+    'guess_budget_ms=0 never guesses, a spent budget stops guessing until reset(), guesses are memoized by content');
+
+  const bench = py(`
+import re, time, markdown
+src = open(${JSON.stringify(ALL_ELEMENTS)}, encoding="utf-8").read()
+bare = re.sub(r"^\`\`\`\\w+$", "\`\`\`", src, flags=re.M)
+guessing = dict(extensions=list(md_to_pdf.MARKDOWN_EXTENSIONS),
+                extension_configs={"codehilite": {"css_class": "highlight", "guess_lang": True}})
+def best(convert, runs=15):
+    convert()
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter(); convert(); times.append(time.perf_counter() - started)
+    return min(times) * 1000
+old, new = best(lambda: markdown.markdown(bare, **guessing)), best(lambda: md_to_pdf.markdown_to_html(bare))
+print(new < old, f"{old:.1f}", f"{new:.1f}")
+`);
+  const [faster, guessMs, detectMs] = bench.stdout.trim().split(' ');
+  check('bench', faster, 'True',
+    `unlabelled test-all-elements.md: codehilite guess_lang ${guessMs} ms, CodeLanguages ${detectMs} ms`);
+}
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
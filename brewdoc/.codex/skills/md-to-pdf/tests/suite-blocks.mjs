@@ -0,0 +1,192 @@
+#!/usr/bin/env node
+/**
+ * suite-blocks.mjs — the reportlab engine's block tokenizer: `parse_blocks()`
+ * turns Markdown into a compact `__slots__` block AST (heading, paragraph,
+ * list, table, code, quote, image, rule), and `blocks_to_story()` renders that
+ * AST into flowables without modifying it, so one parse can be cached, pickled
+ * and rendered again. `split_blocks()` cuts a document into chunks and
+ * `BlockCache` keeps each chunk's blocks and markup by content hash, in memory
+ * and (opt-in) merged into $MD_TO_PDF_BLOCK_CACHE at exit, so an edit re-parses
+ * only what changed.
+ *
+ * Engine-independent for the AST and split checks (md_to_pdf imports without
+ * reportlab); the rendering and cache checks need reportlab, the code-cache
+ * check markdown and pygments, and are skipped without them.
+ *
+ * Self-contained: no fixtures. Assertion policy: unconditional exact-equality
+ * checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, rmSync } from 'node:fs';
+import { tmpdir } from 'node:os';
+import { join, dirname } from 'node:path';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+const ALL_ELEMENTS = join(HERE, '..', 'test', 'test-all-elements.md');
+const CACHE = mkdtempSync(join(tmpdir(), 'md-to-pdf-blocks-'));
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const py = (code, cache = CACHE) => {
+  const env = { ...process.env, MD_TO_PDF_BLOCK_CACHE: cache, XDG_CACHE_HOME: join(CACHE, 'xdg') };
+  if (cache === null) delete env.MD_TO_PDF_BLOCK_CACHE;
+  return spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+${code}
+`], { encoding: 'utf8', timeout: 60000, env });
+};
+
+const DOC = [
+  '# Title', '', 'Intro *line*', 'second line', '', '## Section', '##### deep', '',
+  '- one', '* two', '- [ ] todo', '- [X] done', '3. three', '---', '***', '',
+  '> quoted', '>', '> more', '', '| a | b |', '|---|:-:|', '| 1 |', '',
+  '```python', 'print(1)   ', '```', '![alt](img.png)', '![alt](img.png) trailing', '|---|',
+].join('\\n');
+
+const ast = py(`
+for block in md_to_pdf.parse_blocks("${DOC}"):
+    print(repr(block))
+`);
+check('ast', ast.stdout.trim(), [
+  "HeadingBlock(1, 'Title')",
+  "ParagraphBlock('Intro *line*')",
+  "ParagraphBlock('second line')",
+  "HeadingBlock(2, 'Section')",
+  "ParagraphBlock('##### deep')",
+  "ListBlock([('-', 'one'), ('-', 'two'), ('[ ]', 'todo'), ('[x]', 'done'), ('3.', 'three')])",
+  'RuleBlock()',
+  'RuleBlock()',
+  "QuoteBlock('quoted  more')",
+  "TableBlock([['a', 'b'], ['1']])",
+  "CodeBlock('print(1)', 'python')",
+  "ImageBlock('alt', 'img.png')",
+  "ParagraphBlock('![alt](img.png) trailing')",
+].join('\n'), 'one node per block; a separator-only table yields none; H5+ stays a paragraph');
+
+const pickled = py(`
+import pickle
+blocks = md_to_pdf.parse_blocks("${DOC}")
+again = pickle.loads(pickle.dumps(blocks))
+print(again == blocks, all(not hasattr(b, "__dict__") for b in blocks), md_to_pdf.RuleBlock() != md_to_pdf.ParagraphBlock("---"))
+`);
+check('pickle', pickled.stdout.trim(), 'True True True', 'blocks are dict-free, compare by fields and survive a pickle round trip');
+
+const split = py(`
+print(md_to_pdf.split_blocks("# A\\n\\n\\npara\\nline\\n\\n\`\`\`\\nx\\n\\ny\\n\`\`\`\\n\\n- z\\n"))
+`);
+check('split', split.stdout.trim(), "['# A', 'para\\nline', '\`\`\`\\nx\\n\\ny\\n\`\`\`', '- z']",
+  'chunks break at blank lines, never inside a fence');
+
+if (spawnSync('python3', ['-c', 'import reportlab']).status === 0) {
+  const story = py(`
+from pathlib import Path
+profile = md_to_pdf.RenderProfile.of(md_to_pdf.load_config()).prepare_reportlab()
+blocks = md_to_pdf.parse_blocks("| a | b | c |\\n|---|---|---|\\n| 1 |\\n\\n- item\\n\\n2. two\\n")
+before = repr(blocks)
+args = (profile.styles, profile.font_info, profile.colors, 400.0, Path("."), profile.table_styles)
+first = md_to_pdf.blocks_to_story(blocks, *args)
+second = md_to_pdf.blocks_to_story(blocks, *args)
+print(repr(blocks) == before, [type(f).__name__ for f in first] == [type(f).__name__ for f in second],
+      [f.text for f in first if type(f).__name__ == "Paragraph"])
+`);
+  check('story', story.stdout.trim(),
+    "True True ['\u2022 item', '<b>2.</b> two']",
+    'rendering leaves the blocks untouched (short table rows are padded on a copy) and is repeatable');
+
+  const phases = py(`
+print(sorted(md_to_pdf.render("# T\\n\\ntext\\n").timings))
+`);
+  check('timings', phases.stdout.trim(), "['fragment_hits', 'fragment_misses', 'layout', 'parse', 'setup', 'story', 'total']",
+    'tokenizing (parse) and flowable building (story) are timed separately');
+
+  const STORY = `
+from pathlib import Path
+text = open(${JSON.stringify(ALL_ELEMENTS)}, encoding="utf-8").read()
+profile = md_to_pdf.RenderProfile.of(md_to_pdf.load_config()).prepare_reportlab()
+args = (profile.styles, profile.font_info, profile.colors, 400.0, Path("."), profile.table_styles)
+def texts(story):
+    return [(type(f).__name__, getattr(f, "text", None)) for f in story]
+cache = md_to_pdf.BlockCache.of(profile.block_cache_name())
+`;
+  const same = py(`${STORY}
+blocks, markups = md_to_pdf.cached_blocks(text, profile)
+print(blocks == md_to_pdf.parse_blocks(text),
+      texts(md_to_pdf.blocks_to_story(blocks, *args, markups=markups)) == texts(md_to_pdf.md_to_story(text, *args)),
+      cache.misses > 0)
+`);
+  check('cached-story', same.stdout.trim(), 'True True True',
+    'chunk-by-chunk parsing gives the blocks and paragraphs of a whole-text parse');
+
+  const persisted = py(`${STORY}
+md_to_pdf.cached_blocks(text.replace("Table", "Tabel", 1), profile)
+print(cache.hits > 0, cache.misses)
+`);
+  check('persisted', persisted.stdout.trim(), 'True 1',
+    'a second process reads the cache the first saved at exit and re-parses only the edited chunk');
+
+  const merged = py(`${STORY}
+on_disk = set(md_to_pdf.BlockCache(cache.path).entries)
+stamp = cache.path.stat().st_mtime_ns
+md_to_pdf.cached_blocks("# only in this process", profile)
+unchanged = cache.path.stat().st_mtime_ns == stamp
+md_to_pdf.BlockCache.save_all()
+again = set(md_to_pdf.BlockCache(cache.path).entries)
+print(unchanged, md_to_pdf.BlockCache.key("# only in this process") in again, on_disk <= again)
+`);
+  check('merged', merged.stdout.trim(), 'True True True',
+    'a render leaves the file alone; the exit flush merges, keeping what other processes wrote');
+
+  const memory = py(`${STORY}
+import os
+md_to_pdf.render(text)
+md_to_pdf.BlockCache.save_all()
+print(cache.path, cache.misses > 0, os.path.exists(os.path.join(os.environ["XDG_CACHE_HOME"], "md-to-pdf", "blocks")))
+`, null);
+  check('memory', memory.stdout.trim(), 'None True False',
+    'without $MD_TO_PDF_BLOCK_CACHE the cache stays in memory and render() writes no block files');
+
+  const off = py(`${STORY}
+md_to_pdf.cached_blocks(text, profile)
+print(cache.path, cache.misses > 0)
+`, 'off');
+  check('off', off.stdout.trim(), 'None True', 'MD_TO_PDF_BLOCK_CACHE=off keeps the cache in memory only');
+}
+
+if (spawnSync('python3', ['-c', 'import markdown, pygments']).status === 0) {
+  const code = py(`
+text = open(${JSON.stringify(ALL_ELEMENTS)}, encoding="utf-8").read()
+first = md_to_pdf.markdown_to_html(text)
+cache = md_to_pdf.BlockCache.of("weasyprint-code")
+misses = cache.misses
+cache.hits = 0
+print(md_to_pdf.markdown_to_html(text) == first, cache.hits > 0, cache.misses == misses)
+`);
+  check('code-cache', code.stdout.trim(), 'True True True',
+    'highlighted fenced code is reused by content hash and the HTML is unchanged');
+}
+
+rmSync(CACHE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
@@ -0,0 +1,117 @@
+#!/usr/bin/env node
+/**
+ * suite-daemon.mjs — `md_to_pdf.py --serve` / `--client`: the warm daemon answers
+ * in the same STATUS= contract as an in-process run, and a client with no daemon
+ * converts in-process instead of failing.
+ *
+ * Engine-independent: every job here fails validation before an engine loads, so
+ * neither reportlab nor weasyprint needs to be installed. A daemon-served failure
+ * names the ABSOLUTE input path (the client sends absolute paths over the wire),
+ * which is how the two code paths are told apart.
+ *
+ * Self-contained: fixtures and the socket live under one mkdtemp base, removed at
+ * the end. Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawn, spawnSync } from 'node:child_process';
+import { mkdtempSync, existsSync, rmSync, realpathSync, statSync } from 'node:fs';
+import { createServer } from 'node:net';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPT = join(HERE, '..', 'scripts', 'md_to_pdf.py');
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-d-')));
+const SOCK = join(BASE, 'd.sock');
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const convert = (...args) => spawnSync('python3', [SCRIPT, ...args], { cwd: BASE, encoding: 'utf8', timeout: 30000 });
+const sleep = (ms) => new Promise((r) => setTimeout(r, ms));
+
+async function waitFor(pred, ms) {
+  for (let waited = 0; waited < ms; waited += 50) {
+    if (pred()) return true;
+    await sleep(50);
+  }
+  return pred();
+}
+
+// --- a plain conversion never pays for the server stacks ---------------------
+const SERVER_MODULES = ['asyncio', 'concurrent.futures', 'http.server', 'mmap', 'pickle', 'queue', 'selectors', 'socketserver'];
+const probe = spawnSync('python3', ['-c', [
+  'import sys',
+  `sys.path.insert(0, ${JSON.stringify(dirname(SCRIPT))})`,
+  'import md_to_pdf',
+  `print(",".join(m for m in ${JSON.stringify(SERVER_MODULES)} if m in sys.modules))`,
+].join('\n')], { cwd: BASE, encoding: 'utf8', timeout: 30000 });
+check('cold-imports', probe.stdout, '\n',
+  'importing the script loads none of the daemon, HTTP, spool or async modules');
+
+// --- no daemon: in-process fallback ----------------------------------------
+const cold = convert('missing.md', '--client', '--socket', SOCK);
+check('fallback-status', cold.status, 1, 'a missing input still exits 1 with no daemon listening');
+check('fallback-stdout', cold.stdout, 'STATUS=FAILED\n', 'the fallback prints the STATUS=FAILED contract line');
+check('fallback-relative', cold.stderr, 'File not found: missing.md\n',
+  'the in-process run reports the path as given');
+
+// --- daemon ------------------------------------------------------------------
+const daemon = spawn('python3', [SCRIPT, '--serve', '--socket', SOCK], { cwd: BASE, stdio: ['ignore', 'pipe', 'pipe'] });
+let banner = '';
+daemon.stdout.on('data', (d) => { banner += d; });
+const up = await waitFor(() => banner.includes('SOCKET='), 15000);
+check('serve-banner', up && banner, `STATUS=SERVING\nSOCKET=${SOCK}\n`, 'the daemon announces its socket');
+check('socket-mode', statSync(SOCK).mode & 0o777, 0o600, 'the socket is bound owner-only, never world-connectable');
+
+const warm = convert('missing.md', '--client', '--socket', SOCK);
+check('served-status', warm.status, 1, 'a daemon-served failure exits 1');
+check('served-stdout', warm.stdout, 'STATUS=FAILED\n', 'the daemon reply keeps the STATUS=FAILED contract');
+check('served-absolute', warm.stderr, `File not found: ${join(BASE, 'missing.md')}\n`,
+  'the daemon resolved the relative input against the client cwd');
+
+const second = convert('--serve', '--socket', SOCK);
+check('second-serve', second.stdout, 'STATUS=FAILED\n', 'a second daemon refuses a live socket');
+
+daemon.kill('SIGTERM');
+const gone = await waitFor(() => !existsSync(SOCK), 5000);
+check('socket-removed', gone, true, 'SIGTERM removes the socket file');
+
+const after = convert('missing.md', '--client', '--socket', SOCK);
+check('fallback-after', after.stderr, 'File not found: missing.md\n', 'a stopped daemon means in-process again');
+
+// --- a reply cut off mid-line (worker killed mid-write) falls back in-process ---
+const TRUNC = join(BASE, 't.sock');
+const fake = createServer((conn) => conn.end('{"status": "OK", "outp\n'));
+await new Promise((r) => fake.listen(TRUNC, r));
+const cut = await new Promise((r) => {
+  const child = spawn('python3', [SCRIPT, 'missing.md', '--client', '--socket', TRUNC], { cwd: BASE });
+  let stderr = '';
+  child.stderr.on('data', (d) => { stderr += d; });
+  child.on('close', (status) => r({ status, stderr }));
+});
+fake.close();
+check('truncated-reply', `${cut.status} ${cut.stderr}`, '1 File not found: missing.md\n',
+  'an unparseable daemon reply converts in-process instead of raising');
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
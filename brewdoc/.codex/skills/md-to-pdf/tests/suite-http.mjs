@@ -0,0 +1,168 @@
+#!/usr/bin/env node
+/**
+ * suite-http.mjs — `md_to_pdf.py --http HOST:PORT`: request validation with
+ * JSON errors and a body-size cap, images confined to the image root, and the
+ * RenderQueue behind it -- identical concurrent requests share one render, and
+ * a full queue refuses work instead of growing.
+ *
+ * Engine-independent: the HTTP checks only send requests that are rejected
+ * before a render, the image checks call the path resolver directly, and the
+ * queue checks replace RenderQueue.render with a stub through `python3 -c`.
+ *
+ * Self-contained: the server binds port 0 and is killed at the end; image
+ * fixtures live under one mkdtemp base, removed at the end.
+ * Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawn, spawnSync } from 'node:child_process';
+import { mkdtempSync, mkdirSync, writeFileSync, symlinkSync, rmSync, realpathSync } from 'node:fs';
+import { connect } from 'node:net';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+const SCRIPT = join(SCRIPTS, 'md_to_pdf.py');
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const sleep = (ms) => new Promise((r) => setTimeout(r, ms));
+
+async function waitFor(pred, ms) {
+  for (let waited = 0; waited < ms; waited += 50) {
+    if (pred()) return true;
+    await sleep(50);
+  }
+  return pred();
+}
+
+// --- server -------------------------------------------------------------------
+const server = spawn('python3', [SCRIPT, '--http', '127.0.0.1:0', '--max-body-kb', '1'], { stdio: ['ignore', 'pipe', 'pipe'] });
+let banner = '';
+server.stdout.on('data', (d) => { banner += d; });
+const up = await waitFor(() => banner.includes('URL='), 15000);
+check('banner', up && /^STATUS=SERVING\nURL=http:\/\/127\.0\.0\.1:\d+\/render\n$/.test(banner), true,
+  'the server announces its URL');
+const url = (banner.match(/URL=(\S+)/) || [])[1];
+
+async function post(body, path = url) {
+  const res = await fetch(path, { method: 'POST', body });
+  return { code: res.status, type: res.headers.get('content-type'), json: await res.json() };
+}
+
+const notJson = await post('# plain markdown');
+check('invalid-code', notJson.code, 400, 'a body that is not JSON is a 400');
+check('invalid-type', notJson.type, 'application/json', 'errors come back as JSON');
+check('invalid-error', notJson.json.error.startsWith('invalid JSON:'), true, 'the error names the problem');
+check('no-markdown', (await post('{"config": {}}')).json.error,
+  'the body must be a JSON object with a "markdown" string', 'markdown is required');
+check('unknown-key', (await post('{"markdown": "x", "colour": "red"}')).json.error,
+  'unknown request keys: colour', 'unknown keys are rejected');
+check('bad-engine', (await post('{"markdown": "x", "engine": "latex"}')).json.error,
+  'unknown engine: latex', 'engines are validated');
+check('bad-config', (await post('{"markdown": "x", "config": "Letter"}')).json.error,
+  '"config" must be an object', 'config must be an object');
+check('not-found', (await post('{"markdown": "x"}', url.replace('/render', '/nope'))).code, 404,
+  'other paths are a 404');
+
+const big = await post(JSON.stringify({ markdown: 'x'.repeat(2000) }));
+check('too-large', `${big.code} ${big.json.error}`, '413 request body over 1024 bytes',
+  'a body over --max-body-kb is refused unread');
+
+// fetch() always sends a valid length, so the bad header goes over a raw socket
+function rawStatus(length) {
+  const { hostname, port } = new URL(url);
+  return new Promise((resolve) => {
+    let reply = '';
+    const sock = connect(Number(port), hostname, () => sock.write(
+      `POST /render HTTP/1.1\r\nHost: x\r\nContent-Length: ${length}\r\n\r\n`));
+    sock.on('data', (d) => { reply += d; });
+    sock.on('end', () => resolve(reply.split(' ')[1]));
+  });
+}
+check('negative-length', await rawStatus('-5'), '400', 'a negative Content-Length is a 400');
+check('bad-length', await rawStatus('lots'), '400', 'a non-numeric Content-Length is a 400');
+server.kill('SIGTERM');
+
+// --- images: confined to the image root under HTTP --------------------------
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-h-')));
+mkdirSync(join(BASE, 'root', 'img'), { recursive: true });
+writeFileSync(join(BASE, 'root', 'img', 'in.png'), 'png');
+writeFileSync(join(BASE, 'out.png'), 'png');
+symlinkSync(join(BASE, 'out.png'), join(BASE, 'root', 'link.png'));
+const imageRun = spawnSync('python3', ['-c', `
+import sys
+from pathlib import Path
+sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+
+base = Path(${JSON.stringify(BASE)})
+root = base / "root"
+md = "![a](img/in.png) ![b](../out.png) ![c](%s) ![d](link.png)" % (base / "out.png")
+print(len(md_to_pdf.referenced_images(md, root)))
+md_to_pdf._image_root.set(root)
+print(" ".join(Path(p).name for p in md_to_pdf.referenced_images(md, root)))
+`], { encoding: 'utf8', timeout: 30000 });
+const [unconfined, confined] = imageRun.stdout.trim().split('\n');
+check('images-unconfined', unconfined, '4', 'outside HTTP every local image the document names is read');
+check('images-confined', confined, 'in.png', 'under an image root absolute, ".." and symlinked sources are dropped');
+rmSync(BASE, { recursive: true, force: true });
+
+// --- coalescing and back-pressure -------------------------------------------
+const queueRun = spawnSync('python3', ['-c', `
+import sys, time, threading, queue
+sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+
+renders = []
+release = threading.Event()
+
+class Stub(md_to_pdf.RenderQueue):
+    def render(self, request):
+        renders.append(request["markdown"])
+        release.wait(10)
+        return {"status": "OK", "pages": 1, "warnings": []}
+
+rq = Stub(None, workers=1, depth=1)
+a, a_shared = rq.submit({"markdown": "same"})
+time.sleep(0.2)                          # the worker picks it up, so the queue is empty again
+b, b_shared = rq.submit({"markdown": "same"})
+c, _ = rq.submit({"markdown": "other"})  # fills the one queue slot
+try:
+    rq.submit({"markdown": "third"})
+    full = "accepted"
+except queue.Full:
+    full = "full"
+release.set()
+print(a is b, a_shared, b_shared, full)
+print(a.result(5)["status"], c.result(5)["status"], ",".join(renders))
+time.sleep(0.1)
+d, d_shared = rq.submit({"markdown": "same"})
+print(d is a, d_shared)
+`], { encoding: 'utf8', timeout: 60000 });
+const [shared, outcome, later] = queueRun.stdout.trim().split('\n');
+check('coalesced', shared, 'True False True full',
+  'an identical request joins the in-flight render; a full queue raises queue.Full');
+check('rendered-once', outcome, 'OK OK same,other', 'each distinct request rendered exactly once');
+check('not-sticky', later, 'False False', 'a finished render is not reused -- coalescing is for in-flight work only');
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
@@ -0,0 +1,72 @@
+#!/usr/bin/env node
+/**
+ * suite-stream.mjs — `md_to_pdf.py - -`: stdin in, PDF out on stdout, and the
+ * status contract moved off stdout (to stderr, or to --status-fd) so the PDF
+ * stream is never corrupted.
+ *
+ * Engine-independent: every conversion here fails before an engine renders
+ * (missing input, undecodable stdin), which is exactly where a stray status
+ * line on stdout would break a pipeline.
+ *
+ * Self-contained: runs in one mkdtemp base, removed at the end.
+ * Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { mkdtempSync, readFileSync, rmSync, realpathSync, existsSync } from 'node:fs';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPT = join(HERE, '..', 'scripts', 'md_to_pdf.py');
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-p-')));
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const run = (args, input, stdio) => spawnSync('python3', [SCRIPT, ...args], {
+  cwd: BASE, encoding: 'utf8', timeout: 60000, input, stdio,
+});
+
+const missing = run(['missing.md', '-']);
+check('missing-exit', missing.status, 1, 'a failed stream conversion exits 1');
+check('missing-stdout', missing.stdout, '', 'nothing but PDF bytes may reach stdout');
+check('missing-stderr', missing.stderr, 'STATUS=FAILED\nFile not found: missing.md\n',
+  'with the PDF on stdout the status lines go to stderr');
+
+const badStdin = run(['-', '-'], Buffer.from([0x23, 0x20, 0xff, 0xfe, 0x0a]));
+check('stdin-exit', badStdin.status, 1, 'undecodable stdin fails cleanly');
+check('stdin-stdout', badStdin.stdout, '', 'a failure leaves stdout empty');
+check('stdin-status', badStdin.stderr.split('\n')[0], 'STATUS=FAILED', 'the failure is reported in the contract');
+
+const lone = run(['-'], Buffer.from([0xff]));
+check('lone-dash', lone.stderr.split('\n')[0], 'STATUS=FAILED', 'a single "-" also streams to stdout');
+
+const fd = spawnSync('bash', ['-c', `python3 "${SCRIPT}" missing.md out.pdf --status-fd 3 3>status.txt`], {
+  cwd: BASE, encoding: 'utf8', timeout: 60000,
+});
+check('fd-stdout', fd.stdout, '', '--status-fd takes the status lines off stdout');
+check('fd-file', readFileSync(join(BASE, 'status.txt'), 'utf8'), 'STATUS=FAILED\n', 'the status lines land on the given fd');
+check('fd-no-output', existsSync(join(BASE, 'out.pdf')), false, 'no output file is left behind on failure');
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
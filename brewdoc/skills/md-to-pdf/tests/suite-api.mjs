@@ -0,0 +1,181 @@
+#!/usr/bin/env node
+/**
+ * suite-api.mjs — the importable API: `render()` returns a RenderResult of
+ * (pdf_bytes, pages, warnings, timings) and rejects bad arguments before any
+ * engine loads; `convert_async()` / AsyncRenderer bound concurrency, carry
+ * exceptions back from the forked worker, and kill it on cancellation or
+ * timeout; a worker forked while other threads hold module locks does not hang;
+ * RenderProfile is cached per merged config and survives a save/load round trip.
+ *
+ * Engine-independent: argument validation and the result shape are checked
+ * through `python3 -c` with md_to_pdf imported; the async checks swap
+ * md_to_pdf.render for a sleeping stub, which forked workers inherit.
+ *
+ * Self-contained: no fixtures. Assertion policy: unconditional exact-equality
+ * checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import { join, dirname } from 'node:path';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const py = (code) => spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+${code}
+`], { encoding: 'utf8', timeout: 60000 });
+
+const shape = py('print(" ".join(md_to_pdf.RenderResult._fields))');
+check('fields', shape.stdout.trim(), 'pdf_bytes pages warnings timings', 'RenderResult carries bytes, pages, warnings and timings');
+
+const engine = py(`
+try:
+    md_to_pdf.render("# x", engine="latex")
+except ValueError as exc:
+    print(exc)
+`);
+check('engine', engine.stdout.trim(), 'unknown engine: latex', 'an unknown engine raises ValueError');
+
+const limited = py(`
+import asyncio, time
+def slow(md_text, **options):
+    time.sleep(0.3)
+    return md_to_pdf.RenderResult(b"%PDF", 1, [md_text], {})
+md_to_pdf.render = slow
+
+async def main():
+    for mode in ("process", "thread"):
+        renderer = md_to_pdf.AsyncRenderer(limit=2, mode=mode)
+        started = time.monotonic()
+        done = await asyncio.gather(*(renderer.render(f"doc{i}") for i in range(4)))
+        renderer.close()
+        print(mode, [r.warnings[0] for r in done], round(time.monotonic() - started, 1) >= 0.6)
+asyncio.run(main())
+`);
+check('limit', limited.stdout.trim(),
+  "process ['doc0', 'doc1', 'doc2', 'doc3'] True\nthread ['doc0', 'doc1', 'doc2', 'doc3'] True",
+  'both modes return every result and run at most `limit` renders at once');
+
+const cancelled = py(`
+import asyncio, os, time
+md_to_pdf.render = lambda md_text, **options: time.sleep(30)
+
+async def main():
+    task = asyncio.create_task(md_to_pdf.convert_async("# x"))
+    await asyncio.sleep(0.3)
+    started = time.monotonic()
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        print("cancelled", time.monotonic() - started < 2)
+    try:
+        os.waitpid(-1, os.WNOHANG)
+        print("child left")
+    except ChildProcessError:
+        print("no child")
+asyncio.run(main())
+`);
+check('cancel', cancelled.stdout.trim(), 'cancelled True\nno child', 'cancelling the task kills and reaps the worker');
+
+const locked = py(`
+import asyncio, threading, time
+held, release = threading.Event(), threading.Event()
+def hold():
+    with md_to_pdf._FONT_LOCK, md_to_pdf._fragments._lock, md_to_pdf.BlockCache._LOCK:
+        held.set()
+        release.wait()
+threading.Thread(target=hold, daemon=True).start()
+held.wait()
+
+async def main():
+    started = time.monotonic()
+    result = await md_to_pdf.AsyncRenderer(limit=1, timeout=30).render("# x\\n\\n| a |\\n|---|\\n| 1 |\\n")
+    print(result.pdf_bytes[:5], time.monotonic() - started < 20)
+asyncio.run(main())
+release.set()
+`);
+check('fork-locks', locked.stdout.trim(), "b'%PDF-' True",
+  'a render forked while another thread holds the font and cache locks still completes');
+
+const timedOut = py(`
+import asyncio, os, time
+md_to_pdf.render = lambda md_text, **options: time.sleep(30)
+
+async def main():
+    started = time.monotonic()
+    try:
+        await md_to_pdf.AsyncRenderer(timeout=0.5).render("# x")
+    except TimeoutError as exc:
+        print(exc, time.monotonic() - started < 5)
+    try:
+        os.waitpid(-1, os.WNOHANG)
+        print("child left")
+    except ChildProcessError:
+        print("no child")
+asyncio.run(main())
+`);
+check('timeout', timedOut.stdout.trim(), 'render worker killed after 0.5s True\nno child',
+  'a worker running past the timeout is killed and reaped, and the caller gets TimeoutError');
+
+const raised = py(`
+import asyncio
+try:
+    asyncio.run(md_to_pdf.convert_async("# x", engine="latex"))
+except ValueError as exc:
+    print(exc)
+try:
+    md_to_pdf.AsyncRenderer(mode="fibers")
+except ValueError as exc:
+    print(exc)
+`);
+check('raises', raised.stdout.trim(), 'unknown engine: latex\nunknown mode: fibers',
+  "the worker's exception is re-raised in the caller");
+
+const profiles = py(`
+import os, tempfile
+cfg = md_to_pdf.load_config()
+a = md_to_pdf.RenderProfile.of(cfg)
+print(a is md_to_pdf.RenderProfile.of(md_to_pdf.load_config()), a is md_to_pdf.RenderProfile.of(a),
+      a is md_to_pdf.RenderProfile.of({**cfg, "page": {"size": "Letter"}}))
+for n in range(40):
+    md_to_pdf.RenderProfile.of({"n": n})
+print(len(md_to_pdf.RenderProfile._cache), a is md_to_pdf.RenderProfile.of(cfg))
+print(a.override_css is a.override_css, "size: A4;" in a.override_css)
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "profile.pickle")
+    a.save(path)
+    b = md_to_pdf.RenderProfile.load(path)
+    print(b is not a, b.key == a.key, b.override_css == a.override_css)
+    b.version = "stale"
+    b.save(path)
+    print(md_to_pdf.RenderProfile.load(path), md_to_pdf.RenderProfile.load(os.path.join(tmp, "absent")))
+`);
+check('profile-cache', profiles.stdout.trim().split('\n').join(' | '),
+  'True True False | 32 False | True True | True True True | None None',
+  'one profile per merged config, LRU-bounded, reused CSS, and save/load refusing stale pickles');
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
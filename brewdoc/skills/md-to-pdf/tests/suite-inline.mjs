@@ -0,0 +1,108 @@
+#!/usr/bin/env node
+/**
+ * suite-inline.mjs — the reportlab engine's inline Markdown: `safe_xml()`
+ * turns **bold**, *italic*, ***both***, `code` and [links](url) into reportlab
+ * paragraph markup in one linear scan. Code spans keep their contents literal,
+ * emphasis nests inside link text, tags always nest, and lines full of
+ * unmatched `*`, `` ` `` or `[` cost time proportional to their length.
+ *
+ * Engine-independent: safe_xml is pure Python; the markup-validity check
+ * parses with reportlab's Paragraph and is skipped without it.
+ *
+ * Self-contained: no fixtures. Assertion policy: unconditional exact-equality
+ * checks with a description; the bound check compares a 8x longer input's time
+ * against 24x (linear scales ~8x, the old backtracking regexes ~64x).
+ */
+import { spawnSync } from 'node:child_process';
+import { join, dirname } from 'node:path';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function check(name, actual, expected, message) {
+  if (actual === expected) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const py = (code) => spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+${code}
+`], { encoding: 'utf8', timeout: 120000 });
+
+const CODE = '<font face="Courier-Bold" color="#c53030">';
+const CASES = [
+  ['a < b & c', 'a &lt; b &amp; c', 'escapes'],
+  ['**b** *i* ***bi***', '<b>b</b> <i>i</i> <b><i>bi</i></b>', 'emphasis'],
+  ['**Label:** value', '<b>Label:</b> value', 'bold-colon'],
+  ['`a*b*c` and `***`', `${CODE}a*b*c</font> and ${CODE}***</font>`, 'code spans keep stars literal'],
+  ['`` `code` ``', `${CODE}\`code\`</font>`, 'double-backtick span holding backticks'],
+  ['[c *d*](http://x?a=1&b="2")', '<a href="http://x?a=1&amp;b=&quot;2&quot;" color="blue"><u>c <i>d</i></u></a>',
+    'emphasis in link text, escaped href'],
+  ['[anchor](#sec)', '<b>anchor</b>', 'internal anchors are bold text'],
+  ['*a [b](u) c*', '<i>a <a href="u" color="blue"><u>b</u></a> c</i>', 'a link inside emphasis'],
+  ['[a *b](u) c*', '<a href="u" color="blue"><u>a *b</u></a> c*', 'emphasis does not cross a link boundary'],
+  ['2 * 3 * 4', '2 * 3 * 4', 'space-flanked stars stay literal'],
+  ['*a **b* c**', '<i>a <i><i>b</i> c</i></i>', 'crossed runs still nest'],
+  ['[x] (y) `z', '[x] (y) `z', 'unmatched openers stay literal'],
+];
+
+const cases = py(`
+import json
+for text in json.loads(${JSON.stringify(JSON.stringify(CASES.map((c) => c[0])))}):
+    print(md_to_pdf.safe_xml(text))
+`);
+const got = cases.stdout.split('\n');
+CASES.forEach(([, expected, name], i) => check(`markup: ${name}`, got[i], expected, name));
+
+if (spawnSync('python3', ['-c', 'import reportlab']).status === 0) {
+  const valid = py(`
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph
+style = getSampleStyleSheet()["Normal"]
+bad = 0
+for text in ["*a **b* c**", "****x****", "\`*T\`, \`*U\`", "**a *b** c*", "***a** b*", "[*a](u)*", "*\`*\`*"]:
+    try:
+        Paragraph(md_to_pdf.safe_xml(text), style)
+    except ValueError:
+        bad += 1
+print(bad)
+`);
+  check('valid', valid.stdout.trim(), '0', 'crossed and overlapping delimiters still give markup reportlab parses');
+}
+
+const bound = py(`
+import time
+cases = {"stars": "*a ", "brackets": "[a ", "backticks": "\`a ", "link-opens": "[a](", "mixed": "**x *y [z \` "}
+def best(text):
+    times = []
+    for _ in range(3):
+        started = time.perf_counter(); md_to_pdf.safe_xml(text); times.append(time.perf_counter() - started)
+    return min(times)
+for name, unit in cases.items():
+    small, large = best(unit * 1500), best(unit * 12000)
+    print(name, large < small * 24, f"{small * 1000:.2f}ms->{large * 1000:.2f}ms")
+`);
+for (const line of bound.stdout.trim().split('\n')) {
+  const [name, linear, times] = line.split(' ');
+  check(`linear: ${name}`, linear, 'True', `8x the input, ${times}`);
+}
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);
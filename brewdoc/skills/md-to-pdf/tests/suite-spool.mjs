@@ -0,0 +1,153 @@
+#!/usr/bin/env node
+/**
+ * suite-spool.mjs — `md_to_pdf.py --spool DIR`: job files claimed from
+ * incoming/ by rename, a status file per job in done/ or failed/, stale
+ * leases requeued with an attempt count, jobs that keep losing their
+ * worker failed once out of attempts, a move onto a taken name failed
+ * instead of replacing the file there, and an unreadable lease reported as
+ * a job error.
+ *
+ * Engine-independent: every job here is rejected or fails before an engine
+ * renders it, and the lease mechanics run through `python3 -c` directly.
+ *
+ * Self-contained: fixtures live under one mkdtemp base, removed at the end.
+ * Assertion policy: unconditional exact-equality checks with a description.
+ */
+import { spawnSync } from 'node:child_process';
+import {
+  mkdtempSync, mkdirSync, writeFileSync, readFileSync, readdirSync, rmSync, realpathSync, utimesSync,
+} from 'node:fs';
+import { join, dirname } from 'node:path';
+import { tmpdir } from 'node:os';
+import { fileURLToPath } from 'node:url';
+
+const HERE = dirname(fileURLToPath(import.meta.url));
+const SCRIPTS = join(HERE, '..', 'scripts');
+const SCRIPT = join(SCRIPTS, 'md_to_pdf.py');
+const BASE = realpathSync(mkdtempSync(join(tmpdir(), 'brewdoc-mdpdf-s-')));
+const SPOOL = join(BASE, 'spool');
+const HOUR_AGO = new Date(Date.now() - 3600 * 1000);
+
+let passed = 0;
+let failed = 0;
+const results = [];
+
+function deepEqual(a, b) {
+  if (a === b) return true;
+  if (Array.isArray(a) && Array.isArray(b)) {
+    return a.length === b.length && a.every((v, i) => deepEqual(v, b[i]));
+  }
+  return false;
+}
+
+function check(name, actual, expected, message) {
+  if (deepEqual(actual, expected)) {
+    passed++;
+    results.push(`  PASS  ${name}  (${message})`);
+  } else {
+    failed++;
+    results.push(
+      `  FAIL  ${name}  (${message} | actual=${JSON.stringify(actual)} expected=${JSON.stringify(expected)})`,
+    );
+  }
+}
+
+const ls = (sub) => readdirSync(join(SPOOL, sub)).sort();
+const status = (sub, name) => JSON.parse(readFileSync(join(SPOOL, sub, `${name}.json`), 'utf8'));
+const worker = () => spawnSync('python3', [SCRIPT, '--spool', SPOOL, '--spool-drain', '--lease-timeout', '60'], {
+  cwd: BASE, encoding: 'utf8', timeout: 60000,
+});
+
+// --- rejected and failing jobs -------------------------------------------
+for (const sub of ['incoming', 'claimed']) mkdirSync(join(SPOOL, sub), { recursive: true });
+writeFileSync(join(SPOOL, 'incoming', 'gone.json'), JSON.stringify({ input: 'docs/gone.md' }));
+writeFileSync(join(SPOOL, 'incoming', 'broken.json'), 'not json');
+writeFileSync(join(SPOOL, 'incoming', 'odd.json'), JSON.stringify({ input: 'x.md', colour: 'red' }));
+writeFileSync(join(SPOOL, 'incoming', '.partial.json'), '{"inp');
+writeFileSync(join(SPOOL, 'incoming', 'notes.txt'), 'not a job');
+
+const first = worker();
+check('drain-exit', first.status, 0, '--spool-drain exits 0 once nothing is left to claim');
+check('stream', first.stdout.trim().split('\n').map((l) => JSON.parse(l).job).sort(), ['broken', 'gone', 'odd'],
+  'one NDJSON result line per claimed job');
+check('dirs', ['claimed', 'done', 'failed', 'incoming'].every((d) => readdirSync(SPOOL).includes(d)), true,
+  'the worker creates the spool layout');
+check('failed', ls('failed'), ['broken.json', 'gone.json', 'odd.json'], 'each failed job gets a status file');
+check('claimed-empty', ls('claimed'), [], 'leases are released after the status file is written');
+check('foreign', ls('incoming'), ['.partial.json', 'notes.txt'], 'dot-files and non-JSON files are never claimed');
+
+const gone = status('failed', 'gone');
+check('relative', gone.error, `File not found: ${join(SPOOL, 'docs', 'gone.md')}`,
+  'relative job paths resolve against the spool directory');
+check('request-input', gone.request.input, 'docs/gone.md', 'the original request is stored verbatim');
+check('broken', status('failed', 'broken').error.startsWith('invalid JSON:'), true, 'bad JSON is reported, not retried');
+check('odd', status('failed', 'odd').error, 'unknown manifest keys: colour', 'job files follow the manifest schema');
+
+// --- stale leases ---------------------------------------------------------
+writeFileSync(join(SPOOL, 'claimed', 'slow.json'), JSON.stringify({ input: 'slow.md' }));
+writeFileSync(join(SPOOL, 'claimed', 'cursed@3.json'), JSON.stringify({ input: 'cursed.md' }));
+writeFileSync(join(SPOOL, 'claimed', 'live.json'), JSON.stringify({ input: 'live.md' }));
+utimesSync(join(SPOOL, 'claimed', 'slow.json'), HOUR_AGO, HOUR_AGO);
+utimesSync(join(SPOOL, 'claimed', 'cursed@3.json'), HOUR_AGO, HOUR_AGO);
+
+const reclaim = spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import os, md_to_pdf
+spool = md_to_pdf.Spool(${JSON.stringify(SPOOL)}, lease_seconds=60, max_attempts=3)
+print(spool.reclaim_stale())
+print(" ".join(sorted(os.listdir(spool.incoming))))
+print(" ".join(p.name for p in spool.claim(5)))
+print(spool.claim(5))
+`], { encoding: 'utf8', timeout: 60000 });
+const [count, incoming, claimed, again] = reclaim.stdout.trim().split('\n');
+check('reclaimed', count, '2', 'only leases older than the timeout are reclaimed');
+check('requeued', incoming, '.partial.json notes.txt slow@2.json', 'a stale lease returns to incoming/ with its attempt count');
+check('exhausted', status('failed', 'cursed').error, 'lease expired 3 times; the job keeps losing its worker',
+  'a job out of attempts is failed instead of requeued');
+check('live', ls('claimed').includes('live.json'), true, 'a fresh lease is left with its worker');
+check('claim', claimed, 'slow@2.json', 'a claim renames the job file into claimed/');
+check('claim-once', again, '[]', 'a claimed job cannot be claimed twice');
+
+// --- name collisions --------------------------------------------------------
+writeFileSync(join(SPOOL, 'claimed', 'dup.json'), JSON.stringify({ input: 'first.md' }));
+writeFileSync(join(SPOOL, 'incoming', 'dup.json'), JSON.stringify({ input: 'second.md' }));
+writeFileSync(join(SPOOL, 'claimed', 'again.json'), JSON.stringify({ input: 'stale.md' }));
+writeFileSync(join(SPOOL, 'incoming', 'again@2.json'), JSON.stringify({ input: 'queued.md' }));
+utimesSync(join(SPOOL, 'claimed', 'again.json'), HOUR_AGO, HOUR_AGO);
+utimesSync(join(SPOOL, 'incoming', 'again@2.json'), HOUR_AGO, HOUR_AGO);
+
+const collide = spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+spool = md_to_pdf.Spool(${JSON.stringify(SPOOL)}, lease_seconds=60, max_attempts=3)
+print(spool.reclaim_stale())
+print(" ".join(p.name for p in spool.claim(5)))
+`], { encoding: 'utf8', timeout: 60000 });
+const read = (sub, name) => JSON.parse(readFileSync(join(SPOOL, sub, name), 'utf8')).input;
+check('requeue-collision', status('failed', 'again').error, 'incoming/again@2.json already exists; not replacing it',
+  'a stale lease whose retry name is taken fails instead of overwriting the queued job');
+check('claim-collision', status('failed', 'dup').error, 'claimed/dup.json already exists; not replacing it',
+  'a job whose name is still leased fails instead of overwriting the lease');
+check('collision-kept', [read('claimed', 'dup.json'), read('claimed', 'again@2.json')], ['first.md', 'queued.md'],
+  'the files already holding those names are untouched, and the queued retry is still claimed');
+check('collision-counts', collide.stdout.trim(), '1\nagain@2.json', 'a failed requeue still counts as reclaimed');
+
+// --- a lease that cannot be read ---------------------------------------------
+const vanished = spawnSync('python3', ['-c', `
+import sys; sys.path.insert(0, ${JSON.stringify(SCRIPTS)})
+import md_to_pdf
+spool = md_to_pdf.Spool(${JSON.stringify(SPOOL)}, lease_seconds=60, max_attempts=3)
+record, job, error = spool.job_for(spool.claimed / "vanished.json", None)
+print(record, job, error.split(":")[0])
+`], { encoding: 'utf8', timeout: 60000 });
+check('unreadable', vanished.stdout.trim(), 'None None unreadable job',
+  'a lease gone or unreadable since the claim becomes a job error instead of raising');
+
+rmSync(BASE, { recursive: true, force: true });
+
+console.log(results.join('\n'));
+console.log('\n| Result | Value |');
+console.log('|--------|-------|');
+console.log(`| passed | ${passed} |`);
+console.log(`| failed | ${failed} |`);
+process.exit(failed === 0 ? 0 : 1);